@@ -3,10 +3,18 @@ from datetime import datetime
 
 import streamlit as st
 
-from modules.infos import obter_resumo_empresa
-from modules.cotacao import obter_cotacao_atual
-from modules.noticia import buscar_noticias_rss
+from config import Config
+from modules.cache import CacheMemoria, relatorio_completo
+from modules.entidade import resolver_entidade
+from modules.coleta import coletar_dados
+from modules.cotacao import ttl_cotacao
+from modules.groq_client import obter_cliente
+from modules.ingestao import iniciar_ingestao
+from modules.disjuntor import estados_disjuntores
+from modules.metricas import ColetorSpans, iniciar_servidor_metricas
 from modules.gemini import GeminiProcessor
+from modules.prazo import com_prazo
+from modules.relatorio import descrever_faltando, gerar_relatorio_em_stream
 
 # CSS para mudar a cor da borda do input
 st.markdown("""
@@ -30,6 +38,33 @@ st.markdown("""
 # --------------------------
 st.set_page_config(page_title="Relatório Investment Banking", layout="wide")
 
+# Worker de ingestão de notícias (um por processo, sobrevive aos reruns)
+iniciar_ingestao()
+
+# /metrics no formato Prometheus, se METRICAS_PORTA estiver definida
+iniciar_servidor_metricas()
+
+# --------------------------
+# Recursos compartilhados entre sessões
+# --------------------------
+@st.cache_resource
+def obter_processor():
+	"""Cliente Gemini único do processo (não é recriado a cada clique)."""
+	return GeminiProcessor()
+
+@st.cache_resource
+def obter_cliente_groq():
+	"""Sessão HTTP da Groq (pool de conexões) compartilhada por todos os usuários."""
+	return obter_cliente()
+
+@st.cache_resource
+def obter_cache_app():
+	"""Dados coletados e relatórios prontos, com TTL e limite de memória."""
+	return CacheMemoria(max_bytes=int(Config.APP_CACHE_MAX_MB * 1024 * 1024), ttl=Config.APP_CACHE_TTL)
+
+obter_cliente_groq()
+cache_app = obter_cache_app()
+
 # --------------------------
 # Utilitários
 # --------------------------
@@ -60,20 +95,27 @@ def safe_metric(label, value, delta=None):
 	else:
 		st.metric(label, value_fmt)
 
-def build_report_layout(dados_json, dados_brutos):
-	"""Desenha o relatório executivo formatado."""
+def _dados_acao(dados_json, dados_brutos):
+	"""Preço, variação e volume: do relatório da IA ou, na falta, dos dados coletados."""
+	acao = dados_json.get("acao") or {}
+	cotacao = dados_brutos.get("cotacao", {})
+	# Campos nulos no esquema também caem para a cotação coletada
+	preco = acao.get("preco_atual") if acao.get("preco_atual") is not None else cotacao.get("preco_atual")
+	variacao = acao.get("variacao") if acao.get("variacao") is not None else cotacao.get("variacao_percentual")
+	volume = acao.get("volume") if acao.get("volume") is not None else cotacao.get("volume")
+	return preco, variacao, volume
+
+def render_titulo(dados_json, dados_brutos):
 	st.title(f"📋 Relatório Executivo — {dados_json.get('nome_oficial', dados_brutos['empresa'])}")
 	st.caption(f"Gerado em {datetime.now().strftime('%d/%m/%Y %H:%M')}")
 
+def render_cabecalho(dados_json, dados_brutos):
 	# Cabeçalho principal
 	with st.container():
 		col1, col2, col3, col4 = st.columns([2, 1, 1, 1])
 		col1.markdown(f"**Ticker:** `{dados_json.get('ticker', dados_brutos.get('cotacao', {}).get('ticker', '—'))}`")
 		col2.markdown(f"**Setor:** {dados_json.get('resumo', {}).get('setor', '—')}")
-		acao = dados_json.get("acao", {})
-		preco = acao.get("preco_atual", dados_brutos.get("cotacao", {}).get("preco_atual"))
-		variacao = acao.get("variacao", dados_brutos.get("cotacao", {}).get("variacao_percentual"))
-		volume = acao.get("volume", dados_brutos.get("cotacao", {}).get("volume"))
+		preco, variacao, volume = _dados_acao(dados_json, dados_brutos)
 
 		col3.metric("Preço", f"R$ {format_number(preco) if preco is not None else '—'}")
 		if isinstance(variacao, (int, float)):
@@ -87,6 +129,7 @@ def build_report_layout(dados_json, dados_brutos):
 
 	st.markdown("---")
 
+def render_sobre(dados_json, dados_brutos):
 	# Sobre a empresa
 	st.subheader("🏢 Sobre a empresa")
 	desc = dados_json.get("resumo", {}).get("descricao") or dados_brutos.get("info", {}).get("descricao")
@@ -100,8 +143,10 @@ def build_report_layout(dados_json, dados_brutos):
 
 	st.markdown("---")
 
+def render_cotacao(dados_json, dados_brutos):
 	# Cotação
 	st.subheader("💰 Cotação")
+	preco, variacao, volume = _dados_acao(dados_json, dados_brutos)
 	safe_metric("Preço atual", f"R$ {format_number(preco) if preco is not None else '—'}")
 	delta_text = None
 	if isinstance(variacao, (int, float)):
@@ -120,9 +165,18 @@ def build_report_layout(dados_json, dados_brutos):
 	else:
 		volume_fmt = "—"
 	safe_metric("Volume", volume_fmt)
+	cotacao_bruta = dados_brutos.get("cotacao", {})
+	if cotacao_bruta.get("origem") == "cache":
+		st.caption(f"Cotação em cache há {format_number(cotacao_bruta.get('defasagem_segundos', 0))} s")
+	elif cotacao_bruta.get("origem") == "contingencia":
+		st.warning(
+			f"Yahoo Finance indisponível: última cotação conhecida, de "
+			f"{format_number(cotacao_bruta.get('defasagem_segundos', 0) / 60)} min atrás."
+		)
 
 	st.markdown("---")
 
+def render_noticias(dados_json, dados_brutos):
 	# Notícias
 	st.subheader("📰 Notícias recentes")
 	noticias = dados_json.get("noticias", []) or dados_brutos.get("noticias", [])
@@ -141,6 +195,7 @@ def build_report_layout(dados_json, dados_brutos):
 	else:
 		st.info("Nenhuma notícia recente encontrada.")
 
+def render_analise(dados_json, dados_brutos):
 	# Análise rápida
 	analise = dados_json.get("analise_rapida")
 	if analise:
@@ -149,6 +204,13 @@ def build_report_layout(dados_json, dados_brutos):
 
 	st.markdown("---")
 
+def render_faltando(dados_json):
+	# Relatório parcial: seções que não ficaram prontas dentro do prazo
+	aviso = descrever_faltando(dados_json)
+	if aviso:
+		st.warning(f"⏱️ {aviso}")
+
+def render_json(dados_json):
 	# JSON com persistência
 	st.subheader("🧾 Visualizar e baixar JSON")
 	with st.expander("Ver JSON do relatório"):
@@ -163,6 +225,53 @@ def build_report_layout(dados_json, dados_brutos):
 		)
 		st.caption("Dica: você também pode copiar o conteúdo acima (Ctrl/Cmd + C).")
 
+# Partes do relatório, na ordem da página, e as seções do JSON que cada uma usa
+PARTES_RELATORIO = [
+	(render_titulo, {"nome_oficial"}),
+	(render_cabecalho, {"ticker", "resumo", "acao"}),
+	(render_sobre, {"resumo"}),
+	(render_cotacao, {"acao"}),
+	(render_noticias, {"noticias"}),
+	(render_analise, {"analise_rapida"})
+]
+
+def build_report_layout(dados_json, dados_brutos):
+	"""Desenha o relatório executivo formatado."""
+	for render, _ in PARTES_RELATORIO:
+		render(dados_json, dados_brutos)
+	render_faltando(dados_json)
+	render_json(dados_json)
+
+def build_report_layout_stream(secoes, dados_brutos):
+	"""
+	Desenha o relatório enquanto o Gemini gera: começa com os dados coletados
+	e redesenha cada parte quando a seção correspondente fica pronta.
+	Retorna o JSON completo (ou None se nenhuma seção chegou).
+	"""
+	dados_json = {}
+	espacos = []
+	for render, _ in PARTES_RELATORIO:
+		espaco = st.empty()
+		with espaco.container():
+			render(dados_json, dados_brutos)
+		espacos.append(espaco)
+
+	for secao, valor in secoes:
+		dados_json[secao] = valor
+		for (render, usadas), espaco in zip(PARTES_RELATORIO, espacos):
+			if secao in usadas:
+				with espaco.container():
+					render(dados_json, dados_brutos)
+
+	if not dados_json:
+		for espaco in espacos:
+			espaco.empty()
+		return None
+
+	render_faltando(dados_json)
+	render_json(dados_json)
+	return dados_json
+
 # --------------------------
 # Interface principal
 # --------------------------
@@ -172,41 +281,116 @@ st.write("By: Investment Banking")
 empresa = st.text_input("Digite o nome da empresa brasileira:", placeholder="Petrobras, Vale, Itaú, Minerva, Ambev, ...")
 gerar = st.button("Gerar relatório")
 
+def render_sidebar_cache():
+	"""Uso e taxa de acerto do cache compartilhado."""
+	stats = cache_app.estatisticas()
+	st.sidebar.subheader("🗄️ Cache compartilhado")
+	col1, col2 = st.sidebar.columns(2)
+	col1.metric("Hits", stats["hits"])
+	col2.metric("Misses", stats["misses"])
+	st.sidebar.metric("Taxa de acerto", f"{stats['taxa_acerto']:.0%}")
+	st.sidebar.progress(
+		min(stats["bytes"] / stats["max_bytes"], 1.0),
+		text=f"{stats['entradas']} entradas · {stats['bytes'] / 1024 / 1024:.1f} de {stats['max_bytes'] / 1024 / 1024:.0f} MB"
+	)
+
+def render_sidebar_servicos():
+	"""Serviços externos com o disjuntor aberto (respostas vindas das contingências)."""
+	fora = [nome for nome, estado in estados_disjuntores().items() if estado != "fechado"]
+	if fora:
+		st.sidebar.warning("⚠️ Fora do ar, usando contingência: " + ", ".join(sorted(fora)))
+
+def render_tempos(spans):
+	"""Duração de cada etapa e chamada externa do último relatório."""
+	with st.expander("⏱️ Tempos por etapa", expanded=True):
+		st.dataframe(
+			[
+				{
+					"etapa": s["span"],
+					"duracao_ms": s["duracao_ms"],
+					"cache": s.get("cache", ""),
+					"erro": s["erro"] or ""
+				}
+				for s in spans
+			]
+		)
+
+relatorio_exibido = False
 if gerar and empresa.strip():
-	with st.status("Iniciando...", expanded=True) as status:
-		st.write("🔎 Buscando dados da empresa...")
-		info = obter_resumo_empresa(empresa)
-		dados_coletados = {
-			"empresa": info["dados"]["nome"],
-			"info": {},
-			"cotacao": {},
-			"noticias": []
-		}
-		if info.get("status") == "sucesso":
-			dados_coletados["info"] = info["dados"]
-		else:
-			st.warning(info.get("mensagem", "Não foi possível obter informações da empresa."))
+	# Spans do relatório e prazo total (RELATORIO_PRAZO) para todas as etapas
+	with ColetorSpans() as coletor, com_prazo():
+		with st.spinner("Identificando a empresa..."):
+			entidade = resolver_entidade(empresa)
+		chave = entidade.simbolo
 
-		st.write("💹 Buscando cotação atual...")
-		cotacao = obter_cotacao_atual(dados_coletados["empresa"], dados_coletados["info"]["ticker"])
-		if cotacao.get("status") == "sucesso":
-			dados_coletados["cotacao"] = cotacao
+		# Relatório recente da mesma empresa (de qualquer sessão) é servido direto
+		em_cache = cache_app.obter(f"relatorio:{chave}")
+		if em_cache:
+			st.info("⚡ Relatório recente servido do cache compartilhado.")
+			dados_finais, dados_coletados = em_cache["dados_finais"], em_cache["dados_coletados"]
+			build_report_layout(dados_finais, dados_coletados)
+			relatorio_exibido = True
 		else:
-			st.warning(cotacao.get("mensagem", "Não foi possível obter cotação."))
+			with st.status("Iniciando...", expanded=True) as status:
+				st.write("🔎 Buscando dados da empresa, cotação e notícias em paralelo...")
 
-		st.write("📰 Buscando notícias recentes...")
-		noticias = buscar_noticias_rss(dados_coletados["info"]["ticker"])
-		dados_coletados["noticias"] = noticias or []
+				def exibir_etapa(etapa, resultado):
+					if etapa == "info":
+						if resultado.get("status") == "sucesso":
+							st.write("✅ Dados da empresa obtidos")
+						else:
+							st.warning(resultado.get("mensagem", "Não foi possível obter informações da empresa."))
+					elif etapa == "cotacao":
+						if resultado.get("status") == "sucesso":
+							st.write("💹 Cotação atual obtida")
+						else:
+							st.warning(resultado.get("mensagem", "Não foi possível obter cotação."))
+					else:
+						st.write("📰 Notícias recentes obtidas")
 
-		st.write("🧠 Gerando relatório com IA (Gemini)...")
-		try:
-			processor = GeminiProcessor()
-			dados_finais = processor.resumir_dados_com_json(empresa, dados_coletados)
-			status.update(label="Relatório gerado com sucesso!", state="complete")
-		except Exception as e:
-			status.update(label="Falha ao gerar relatório com IA", state="error")
-			st.error(f"Erro no processamento: {str(e)}")
-			dados_finais = None
+				def coletar():
+					dados = coletar_dados(entidade, ao_concluir=exibir_etapa)
+					dados["empresa"] = entidade.nome_oficial
+					return {"entidade": entidade, "dados": dados}
+
+				# Pedidos simultâneos da mesma empresa esperam pela primeira coleta, guardada
+				# pela validade da cotação; coletas parciais (etapa faltando, cotação de
+				# contingência) não são compartilhadas
+				coleta, do_cache = cache_app.obter_ou_calcular(
+					f"dados:{chave}", coletar, ttl=ttl_cotacao(),
+					guardar=lambda coleta: relatorio_completo(dados_coletados=coleta["dados"])
+				)
+				entidade, dados_coletados = coleta["entidade"], coleta["dados"]
+				if do_cache:
+					st.write("⚡ Dados coletados recentemente reaproveitados")
+
+				st.write("🧠 Gerando relatório com IA (Gemini)...")
+
+			# Fora do status: as seções aparecem na página conforme são geradas
+			try:
+				processor = obter_processor()
+				dados_finais = build_report_layout_stream(
+					gerar_relatorio_em_stream(processor, empresa, dados_coletados, entidade),
+					dados_coletados
+				)
+				if dados_finais and dados_finais.get("faltando"):
+					status.update(label="Relatório parcial (prazo esgotado ou etapa com falha)", state="complete", expanded=False)
+				elif dados_finais:
+					status.update(label="Relatório gerado com sucesso!", state="complete", expanded=False)
+					# Mesmas regras do cache de relatórios prontos da CLI
+					if relatorio_completo(dados_finais, dados_coletados):
+						cache_app.gravar(
+							f"relatorio:{chave}", {"dados_finais": dados_finais, "dados_coletados": dados_coletados}, ttl=ttl_cotacao()
+						)
+				else:
+					status.update(label="Falha ao gerar relatório com IA", state="error")
+			except Exception as e:
+				status.update(label="Falha ao gerar relatório com IA", state="error")
+				st.error(f"Erro no processamento: {str(e)}")
+				dados_finais = None
+			relatorio_exibido = dados_finais is not None
+
+	st.session_state["tempos"] = coletor.tempos()
 
 	# Persistência em session_state
 	st.session_state["dados_finais"] = dados_finais
@@ -214,7 +398,9 @@ if gerar and empresa.strip():
 
 # Exibição final (mesmo após rerun)
 if "dados_finais" in st.session_state and st.session_state["dados_finais"]:
-	build_report_layout(st.session_state["dados_finais"], st.session_state["dados_coletados"])
+	# Na execução que gerou o relatório ele já foi desenhado durante o streaming
+	if not relatorio_exibido:
+		build_report_layout(st.session_state["dados_finais"], st.session_state["dados_coletados"])
 elif "dados_coletados" in st.session_state:
 	st.subheader("📄 Dados coletados (sem IA)")
 	st.json(st.session_state["dados_coletados"])
@@ -222,4 +408,10 @@ elif "dados_coletados" in st.session_state:
 elif gerar and not empresa.strip():
 	st.warning("Informe o nome da empresa para continuar.")
 
+render_sidebar_cache()
+render_sidebar_servicos()
+
+if st.sidebar.checkbox("⏱️ Mostrar tempos", key="mostrar_tempos") and st.session_state.get("tempos"):
+	render_tempos(st.session_state["tempos"])
+
 st.caption("© Relatório gerado com o uso de IA. Uso para fins informativos.")
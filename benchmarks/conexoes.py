@@ -0,0 +1,74 @@
+"""
+Verificação do reuso de conexões do cliente da Groq.
+
+Envia N chamadas de `GroqClient.completar` ao servidor local
+(`benchmarks/stubs.py`) e conta as conexões TCP que chegaram: em
+sequência, todas devem usar uma única conexão (sessão keep-alive); com
+várias threads, no máximo uma por thread, dentro do pool. Sai com código 1
+se uma conexão nova for aberta a cada chamada, para ser usado em CI:
+
+	python -m benchmarks.conexoes --chamadas 20 --threads 4
+"""
+import argparse
+import json
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from benchmarks.pipeline import preparar_ambiente
+from benchmarks.stubs import ServidorStubs
+
+def medir(stubs, cliente, chamadas, threads=1):
+	"""
+	Conexões novas abertas por `chamadas` chamadas em `threads` threads.
+	"""
+	antes = len(stubs.conexoes["groq"])
+	prompts = [f"Retorne APENAS o nome popular da empresa {i}" for i in range(chamadas)]
+	with ThreadPoolExecutor(max_workers=threads) as executor:
+		respostas = list(executor.map(lambda p: cliente.completar(p, etapa="conexoes"), prompts))
+	if any(r is None for r in respostas):
+		raise RuntimeError("A Groq local não respondeu a todas as chamadas")
+	return len(stubs.conexoes["groq"]) - antes
+
+def main():
+	parser = argparse.ArgumentParser(description="Verificação do reuso de conexões da Groq")
+	parser.add_argument("--chamadas", type=int, default=20)
+	parser.add_argument("--threads", type=int, default=4)
+	parser.add_argument("--saida", help="arquivo JSON para gravar o resultado")
+	args = parser.parse_args()
+
+	with ServidorStubs() as stubs, tempfile.TemporaryDirectory() as pasta:
+		preparar_ambiente(stubs, pasta)
+		from config import Config
+		from modules.groq_client import GroqClient
+
+		cliente = GroqClient()
+		# No máximo uma conexão por chamada simultânea, e nunca além do pool
+		limite_paralelo = min(args.threads, Config.GROQ_CONCORRENCIA or args.threads, Config.GROQ_POOL_SIZE)
+		resultado = {
+			"chamadas": args.chamadas,
+			"sequencial": medir(stubs, cliente, args.chamadas),
+			# Cliente novo: as conexões do teste sequencial não contam aqui
+			"paralelo": medir(stubs, GroqClient(), args.chamadas, args.threads),
+			"threads": args.threads,
+			"limite_paralelo": limite_paralelo
+		}
+
+	print(f"sequencial: {resultado['sequencial']} conexão(ões) para {args.chamadas} chamadas")
+	print(f"paralelo:   {resultado['paralelo']} conexão(ões) para {args.chamadas} chamadas em {args.threads} threads")
+
+	falhas = []
+	if resultado["sequencial"] != 1:
+		falhas.append(f"chamadas em sequência abriram {resultado['sequencial']} conexões (esperado 1)")
+	if resultado["paralelo"] > limite_paralelo:
+		falhas.append(f"chamadas em paralelo abriram {resultado['paralelo']} conexões (máximo {limite_paralelo})")
+
+	if args.saida:
+		with open(args.saida, "w", encoding="utf-8") as f:
+			json.dump(dict(resultado, falhas=falhas), f, ensure_ascii=False, indent=2)
+
+	for falha in falhas:
+		print(f"[REGRESSÃO] {falha}")
+	sys.exit(1 if falhas else 0)
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,102 @@
+"""
+Benchmark do tempo de importação (início a frio da CLI).
+
+Mede, em processos novos, o tempo acumulado de importação de cada módulo
+(via `python -X importtime`) e confere que `main` não carrega as
+dependências pesadas. Sai com código 1 se o limite for ultrapassado ou se
+alguma dependência pesada for importada, para ser usado em CI:
+
+	python -m benchmarks.importacao --limite 0.5
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Módulos que não podem ser carregados só por abrir a CLI
+PESADOS = [
+	"yfinance", "pandas", "numpy", "feedparser", "requests", "bs4",
+	"langchain", "langchain_core", "langchain_google_genai", "pydantic"
+]
+
+# Módulo principal (entra no limite) e etapas medidas só para referência
+MODULOS = ["main", "modules.coleta", "modules.gemini"]
+
+def tempo_importacao(modulo):
+	"""
+	Tempo acumulado (s) de importação do módulo em um processo novo.
+	"""
+	resultado = subprocess.run(
+		[sys.executable, "-X", "importtime", "-c", f"import {modulo}"],
+		cwd=RAIZ, capture_output=True, text=True, check=True
+	)
+	for linha in resultado.stderr.splitlines():
+		# import time: self [us] | cumulative | imported package
+		partes = [p.strip() for p in linha.split("|")]
+		if len(partes) == 3 and partes[2] == modulo:
+			return int(partes[1]) / 1e6
+	raise RuntimeError(f"Importação de {modulo} não encontrada na saída do -X importtime")
+
+def pesados_carregados(modulo="main"):
+	"""
+	Dependências pesadas presentes em sys.modules após importar o módulo.
+	"""
+	codigo = (
+		f"import sys, json, {modulo}; "
+		f"print(json.dumps([m for m in {PESADOS!r} if m in sys.modules]))"
+	)
+	resultado = subprocess.run(
+		[sys.executable, "-c", codigo], cwd=RAIZ, capture_output=True, text=True, check=True
+	)
+	return json.loads(resultado.stdout)
+
+def medir(repeticoes=5):
+	"""
+	Mediana e mínimo do tempo de importação de cada módulo.
+	"""
+	medidas = {}
+	for modulo in MODULOS:
+		tempos = [tempo_importacao(modulo) for _ in range(repeticoes)]
+		medidas[modulo] = {
+			"mediana_s": round(statistics.median(tempos), 4),
+			"minimo_s": round(min(tempos), 4)
+		}
+	return medidas
+
+def main():
+	parser = argparse.ArgumentParser(description="Benchmark do tempo de importação da CLI")
+	parser.add_argument("--repeticoes", type=int, default=5)
+	parser.add_argument("--limite", type=float, default=0.5, help="tempo máximo (s) para importar main")
+	parser.add_argument("--saida", help="arquivo JSON para gravar o resultado")
+	args = parser.parse_args()
+
+	resultado = {
+		"python": sys.version.split()[0],
+		"modulos": medir(args.repeticoes),
+		"pesados_em_main": pesados_carregados(),
+		"limite_s": args.limite
+	}
+
+	for modulo, m in resultado["modulos"].items():
+		print(f"{modulo:<20} mediana {m['mediana_s']:.3f}s  mínimo {m['minimo_s']:.3f}s")
+
+	falhas = []
+	if resultado["modulos"]["main"]["mediana_s"] > args.limite:
+		falhas.append(f"import main levou {resultado['modulos']['main']['mediana_s']:.3f}s (limite {args.limite}s)")
+	if resultado["pesados_em_main"]:
+		falhas.append(f"main importa dependências pesadas: {', '.join(resultado['pesados_em_main'])}")
+
+	if args.saida:
+		with open(args.saida, "w", encoding="utf-8") as f:
+			json.dump(dict(resultado, falhas=falhas), f, ensure_ascii=False, indent=2)
+
+	for falha in falhas:
+		print(f"[REGRESSÃO] {falha}")
+	sys.exit(1 if falhas else 0)
+
+if __name__ == "__main__":
+	main()
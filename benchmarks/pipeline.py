@@ -0,0 +1,300 @@
+"""
+Benchmark ponta a ponta do pipeline, sem acesso à rede.
+
+Groq, Gemini, Yahoo Finance e os feeds RSS são substituídos por servidores
+locais (ver `benchmarks.stubs`) com latência, jitter e taxa de erro
+configuráveis. Para cada nível de concorrência, mede p50/p95/p99 de cada
+etapa (info, cotacao, noticias, gemini) e do relatório completo, além da
+vazão, e grava o resultado em JSON para comparação entre versões:
+
+	python -m benchmarks.pipeline --concorrencia 1,4,16 --requisicoes 32
+	python -m benchmarks.pipeline --comparar benchmarks/resultados/base.json
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from benchmarks.stubs import SERVICOS, PerfilServico, ServidorStubs
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+VERSAO_FORMATO = 1
+
+EMPRESAS = ["Petrobras", "Vale", "Itaú Unibanco", "Ambev", "WEG", "Localiza", "Bradesco", "Magazine Luiza"]
+ETAPAS = ["info", "cotacao", "noticias", "gemini", "ponta_a_ponta"]
+
+# Latências típicas observadas nos serviços reais (ms)
+PERFIL_PADRAO = {
+	"groq": {"latencia_ms": 150, "jitter_ms": 50},
+	"gemini": {"latencia_ms": 1200, "jitter_ms": 300},
+	"yahoo": {"latencia_ms": 120, "jitter_ms": 40},
+	"rss": {"latencia_ms": 200, "jitter_ms": 50}
+}
+
+def percentis(amostras):
+	"""
+	Resumo das durações (s): n, média, p50, p95, p99 e máximo, em ms.
+	"""
+	if not amostras:
+		return {"n": 0}
+	ms = sorted(a * 1000 for a in amostras)
+	if len(ms) == 1:
+		p50 = p95 = p99 = ms[0]
+	else:
+		q = statistics.quantiles(ms, n=100, method="inclusive")
+		p50, p95, p99 = q[49], q[94], q[98]
+	return {
+		"n": len(ms),
+		"media_ms": round(statistics.fmean(ms), 2),
+		"p50_ms": round(p50, 2),
+		"p95_ms": round(p95, 2),
+		"p99_ms": round(p99, 2),
+		"max_ms": round(ms[-1], 2)
+	}
+
+class Registro:
+	"""
+	Durações e erros por etapa, alimentados por várias threads.
+	"""
+
+	def __init__(self):
+		self._lock = threading.Lock()
+		self.duracoes = {e: [] for e in ETAPAS}
+		self.erros = {e: 0 for e in ETAPAS}
+
+	def adicionar(self, etapa, duracao, erro=False):
+		with self._lock:
+			self.duracoes[etapa].append(duracao)
+			self.erros[etapa] += int(erro)
+
+	def resumo(self):
+		return {e: dict(percentis(self.duracoes[e]), erros=self.erros[e]) for e in ETAPAS}
+
+_registro_atual = None
+
+def _cronometrar(funcao, etapa):
+	def medida(*args, **kwargs):
+		inicio = time.perf_counter()
+		erro = True
+		try:
+			resultado = funcao(*args, **kwargs)
+			erro = isinstance(resultado, dict) and resultado.get("status") == "erro"
+			return resultado
+		finally:
+			if _registro_atual:
+				_registro_atual.adicionar(etapa, time.perf_counter() - inicio, erro)
+	return medida
+
+def preparar_ambiente(stubs, pasta, com_cache=False):
+	"""
+	Aponta a configuração para os servidores locais; deve rodar antes de
+	importar os módulos do projeto.
+	"""
+	os.environ.update(stubs.variaveis_ambiente())
+	os.environ.update({
+		"CACHE_ATIVO": "1" if com_cache else "0",
+		"CACHE_DIR": pasta,
+		"NOTICIAS_DB": os.path.join(pasta, "noticias.sqlite3"),
+		"INGESTAO_INTERVALO": "86400"
+	})
+	# Sem limite de taxa no cliente, salvo se pedido (ex.: GEMINI_RPM=10 no ambiente)
+	for variavel in ("GROQ_RPM", "GROQ_TPM", "GEMINI_RPM", "GEMINI_TPM"):
+		os.environ.setdefault(variavel, "0")
+
+	from config import Config
+	Config.RSS_FEEDS = stubs.feeds()
+
+	# Mede as etapas como a coleta as chama
+	import modules.coleta as coleta
+	coleta.obter_resumo_empresa = _cronometrar(coleta.obter_resumo_empresa, "info")
+	coleta.obter_cotacao_atual = _cronometrar(coleta.obter_cotacao_atual, "cotacao")
+	coleta.buscar_noticias_rss = _cronometrar(coleta.buscar_noticias_rss, "noticias")
+
+def gerar_um(empresa, processor, registro):
+	from modules.coleta import coletar_dados
+	from modules.entidade import resolver_entidade
+	from modules.prazo import com_prazo
+	from modules.relatorio import SECOES_LLM, gerar_relatorio
+
+	inicio = time.perf_counter()
+	erro = True
+	try:
+		# Mesmo prazo por relatório da aplicação (RELATORIO_PRAZO)
+		with com_prazo():
+			entidade = resolver_entidade(empresa)
+			dados = coletar_dados(entidade)
+
+			inicio_gemini = time.perf_counter()
+			relatorio = gerar_relatorio(processor, empresa, dados, entidade) or {}
+			faltando = [s for s in SECOES_LLM if s not in relatorio]
+			registro.adicionar("gemini", time.perf_counter() - inicio_gemini, bool(faltando))
+
+		erro = bool(relatorio.get("faltando")) or not dados["cotacao"] or not dados["info"]
+	finally:
+		registro.adicionar("ponta_a_ponta", time.perf_counter() - inicio, erro)
+
+def medir_nivel(concorrencia, requisicoes, processor):
+	"""
+	Executa `requisicoes` relatórios com `concorrencia` simultâneos.
+	"""
+	global _registro_atual
+	registro = Registro()
+	_registro_atual = registro
+
+	empresas = [EMPRESAS[i % len(EMPRESAS)] for i in range(requisicoes)]
+	inicio = time.perf_counter()
+	with ThreadPoolExecutor(max_workers=concorrencia) as executor:
+		list(executor.map(lambda e: _sem_excecao(gerar_um, e, processor, registro), empresas))
+	duracao = time.perf_counter() - inicio
+
+	_registro_atual = None
+	return {
+		"concorrencia": concorrencia,
+		"requisicoes": requisicoes,
+		"duracao_s": round(duracao, 3),
+		"vazao_rps": round(requisicoes / duracao, 3),
+		"etapas": registro.resumo()
+	}
+
+def _sem_excecao(funcao, *args):
+	try:
+		funcao(*args)
+	except Exception as e:
+		print(f"[ERRO] {type(e).__name__}: {e}", file=sys.stderr)
+
+def carregar_perfis(arquivo=None, escala=1.0, taxa_erro=None):
+	"""
+	Perfis por serviço: padrão, sobrescritos pelo arquivo JSON, com as
+	latências multiplicadas por `escala` e, se informada, a mesma taxa de erro.
+	"""
+	perfis = {s: dict(PERFIL_PADRAO.get(s, {})) for s in SERVICOS}
+	if arquivo:
+		with open(arquivo, encoding="utf-8") as f:
+			for servico, valores in json.load(f).items():
+				perfis.setdefault(servico, {}).update(valores)
+
+	resultado = {}
+	for servico, valores in perfis.items():
+		resultado[servico] = PerfilServico(
+			latencia_ms=valores.get("latencia_ms", 0) * escala,
+			jitter_ms=valores.get("jitter_ms", 0) * escala,
+			taxa_erro=taxa_erro if taxa_erro is not None else valores.get("taxa_erro", 0.0),
+			limite_rpm=valores.get("limite_rpm", 0.0)
+		)
+	return resultado
+
+def _commit_atual():
+	try:
+		return subprocess.run(
+			["git", "rev-parse", "--short", "HEAD"], cwd=RAIZ, capture_output=True, text=True, check=True
+		).stdout.strip()
+	except (OSError, subprocess.CalledProcessError):
+		return None
+
+def comparar(atual, base, tolerancia):
+	"""
+	Compara o p95 de cada etapa e a vazão com um resultado anterior.
+	Retorna a lista de regressões acima da tolerância (fração, ex.: 0.1 = 10%).
+	"""
+	regressoes = []
+	niveis_base = {n["concorrencia"]: n for n in base["niveis"]}
+	for nivel in atual["niveis"]:
+		anterior = niveis_base.get(nivel["concorrencia"])
+		if not anterior:
+			continue
+		c = nivel["concorrencia"]
+		for etapa, m in nivel["etapas"].items():
+			p95_base = anterior["etapas"].get(etapa, {}).get("p95_ms")
+			if not p95_base or "p95_ms" not in m:
+				continue
+			delta = (m["p95_ms"] - p95_base) / p95_base
+			print(f"c={c:<3} {etapa:<14} p95 {p95_base:9.1f} -> {m['p95_ms']:9.1f} ms ({delta:+.1%})")
+			if delta > tolerancia:
+				regressoes.append(f"c={c} {etapa}: p95 {delta:+.1%}")
+
+		delta = (nivel["vazao_rps"] - anterior["vazao_rps"]) / anterior["vazao_rps"]
+		print(f"c={c:<3} {'vazao':<14}     {anterior['vazao_rps']:9.2f} -> {nivel['vazao_rps']:9.2f} rps ({delta:+.1%})")
+		if -delta > tolerancia:
+			regressoes.append(f"c={c} vazão: {delta:+.1%}")
+	return regressoes
+
+def main():
+	parser = argparse.ArgumentParser(description="Benchmark offline do pipeline com serviços locais")
+	parser.add_argument("--concorrencia", default="1,4,16", help="níveis separados por vírgula")
+	parser.add_argument("--requisicoes", type=int, default=32, help="relatórios por nível")
+	parser.add_argument("--perfil", help="JSON com latencia_ms/jitter_ms/taxa_erro/limite_rpm por serviço")
+	parser.add_argument("--escala", type=float, default=1.0, help="multiplica as latências (0 = só overhead local)")
+	parser.add_argument("--taxa-erro", type=float, help="taxa de erro aplicada a todos os serviços")
+	parser.add_argument("--com-cache", action="store_true", help="mantém os caches ativos (execução quente)")
+	parser.add_argument("--saida", help="arquivo JSON do resultado (padrão: benchmarks/resultados/)")
+	parser.add_argument("--comparar", help="resultado anterior para comparação")
+	parser.add_argument("--tolerancia", type=float, default=0.1, help="regressão aceita na comparação")
+	args = parser.parse_args()
+
+	perfis = carregar_perfis(args.perfil, args.escala, args.taxa_erro)
+	niveis = [int(n) for n in args.concorrencia.split(",") if n.strip()]
+
+	with ServidorStubs(perfis) as stubs, tempfile.TemporaryDirectory() as pasta:
+		preparar_ambiente(stubs, pasta, args.com_cache)
+
+		from modules.gemini import GeminiProcessor
+		from modules.ingestao import ingerir_feeds
+
+		inicio = time.perf_counter()
+		ingerir_feeds()
+		ingestao_s = time.perf_counter() - inicio
+
+		processor = GeminiProcessor()
+		_sem_excecao(gerar_um, EMPRESAS[0], processor, Registro())  # aquecimento
+
+		resultados = []
+		for concorrencia in niveis:
+			nivel = medir_nivel(concorrencia, args.requisicoes, processor)
+			resultados.append(nivel)
+			e2e = nivel["etapas"]["ponta_a_ponta"]
+			print(
+				f"c={concorrencia:<3} {nivel['vazao_rps']:7.2f} rps  "
+				f"p50 {e2e.get('p50_ms', 0):8.1f}  p95 {e2e.get('p95_ms', 0):8.1f}  "
+				f"p99 {e2e.get('p99_ms', 0):8.1f} ms  erros {e2e['erros']}"
+			)
+
+		resultado = {
+			"versao_formato": VERSAO_FORMATO,
+			"criado_em": datetime.now().isoformat(timespec="seconds"),
+			"commit": _commit_atual(),
+			"python": sys.version.split()[0],
+			"parametros": {
+				"requisicoes": args.requisicoes,
+				"com_cache": args.com_cache,
+				"perfis": {s: vars(p) for s, p in perfis.items()}
+			},
+			"ingestao_s": round(ingestao_s, 3),
+			"requisicoes_por_servico": dict(stubs.contagem),
+			"recusas_429": dict(stubs.recusas),
+			"niveis": resultados
+		}
+
+	saida = args.saida or os.path.join(
+		RAIZ, "benchmarks", "resultados", f"pipeline-{datetime.now():%Y%m%d-%H%M%S}.json"
+	)
+	os.makedirs(os.path.dirname(saida), exist_ok=True)
+	with open(saida, "w", encoding="utf-8") as f:
+		json.dump(resultado, f, ensure_ascii=False, indent=2)
+	print(f"Resultado gravado em {saida}")
+
+	if args.comparar:
+		with open(args.comparar, encoding="utf-8") as f:
+			regressoes = comparar(resultado, json.load(f), args.tolerancia)
+		for r in regressoes:
+			print(f"[REGRESSÃO] {r}")
+		sys.exit(1 if regressoes else 0)
+
+if __name__ == "__main__":
+	main()
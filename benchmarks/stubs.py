@@ -0,0 +1,290 @@
+"""
+Servidores locais que imitam Groq, Gemini, Yahoo Finance e os feeds RSS,
+com latência, variação (jitter) e taxa de erro configuráveis por serviço.
+
+Um único servidor HTTP atende todos os serviços, separados pelo prefixo:
+/groq, /gemini, /yahoo/chart/<símbolo>, /yahoo/resumo/<símbolo> e /rss/<fonte>.
+"""
+import json
+import random
+import re
+import threading
+import time
+from dataclasses import dataclass
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+SERVICOS = ["groq", "gemini", "yahoo", "rss"]
+
+# Empresas citadas nas manchetes geradas pelo feed local
+EMPRESAS_MANCHETES = ["Petrobras", "Vale", "Itaú", "Ambev", "WEG", "Localiza", "Bradesco", "Magazine Luiza"]
+MODELOS_MANCHETE = [
+	"{empresa} divulga resultado do trimestre acima do esperado",
+	"{empresa} anuncia novo programa de investimentos",
+	"Ações da {empresa} oscilam após relatório de analistas",
+	"{empresa} conclui emissão de debêntures",
+	"Ibovespa fecha em alta puxado por {empresa}"
+]
+
+@dataclass
+class PerfilServico:
+	latencia_ms: float = 0.0
+	jitter_ms: float = 0.0
+	taxa_erro: float = 0.0
+	limite_rpm: float = 0.0  # acima disso responde 429 com Retry-After (0 = sem limite)
+
+	def esperar(self, aleatorio):
+		atraso = aleatorio.gauss(self.latencia_ms, self.jitter_ms) if self.jitter_ms else self.latencia_ms
+		if atraso > 0:
+			time.sleep(atraso / 1000)
+
+class ServidorStubs:
+	"""
+	Servidor local dos serviços externos, executado em uma thread.
+
+	`perfis` mapeia o nome do serviço (groq, gemini, yahoo, rss) para um
+	PerfilServico; `contagem` registra as requisições recebidas por serviço
+	e `conexoes`, as conexões TCP (endereço e porta do cliente) que as trouxeram.
+	"""
+
+	def __init__(self, perfis=None, manchetes_por_feed=40, semente=42):
+		self.perfis = {s: PerfilServico() for s in SERVICOS}
+		self.perfis.update(perfis or {})
+		self.manchetes_por_feed = manchetes_por_feed
+		self.contagem = {s: 0 for s in SERVICOS}
+		self.conexoes = {s: set() for s in SERVICOS}
+		self.recusas = {s: 0 for s in SERVICOS}
+		self._janelas = {s: [] for s in SERVICOS}
+		self._aleatorio = random.Random(semente)
+		self._lock = threading.Lock()
+
+		servidor = self
+
+		class Handler(BaseHTTPRequestHandler):
+			protocol_version = "HTTP/1.1"
+
+			def do_GET(self):
+				servidor._atender(self)
+
+			def do_POST(self):
+				servidor._atender(self)
+
+			def log_message(self, *args):
+				pass
+
+		self.http = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+		self.http.daemon_threads = True
+		self.url = f"http://127.0.0.1:{self.http.server_address[1]}"
+		self._thread = threading.Thread(target=self.http.serve_forever, name="stubs", daemon=True)
+
+	def iniciar(self):
+		self._thread.start()
+		return self
+
+	def parar(self):
+		self.http.shutdown()
+		self.http.server_close()
+
+	def __enter__(self):
+		return self.iniciar()
+
+	def __exit__(self, *args):
+		self.parar()
+
+	def variaveis_ambiente(self):
+		"""
+		Variáveis que apontam o pipeline para os serviços locais.
+		"""
+		return {
+			"GROQ_URL": f"{self.url}/groq",
+			"GROQ_API_KEY": "stub",
+			"GOOGLE_API_KEY": "stub",
+			"GEMINI_BASE_URL": f"{self.url}/gemini",
+			"YAHOO_FONTE": "http",
+			"YAHOO_BASE_URL": f"{self.url}/yahoo/chart/",
+			"YAHOO_RESUMO_URL": f"{self.url}/yahoo/resumo/"
+		}
+
+	def feeds(self):
+		return {"InfoMoney": f"{self.url}/rss/infomoney", "Investing": f"{self.url}/rss/investing"}
+
+	# --------------------------
+	# Atendimento
+	# --------------------------
+	def _atender(self, req):
+		caminho = urlparse(req.path).path
+		servico = caminho.strip("/").split("/", 1)[0]
+		tamanho = int(req.headers.get("Content-Length") or 0)
+		corpo = req.rfile.read(tamanho) if tamanho else b""
+
+		perfil = self.perfis.get(servico)
+		if perfil is None:
+			return self._responder(req, 404, b"{}")
+
+		with self._lock:
+			self.contagem[servico] += 1
+			self.conexoes[servico].add(req.client_address)
+			retry_after = self._limitar(servico, perfil)
+			falhar = self._aleatorio.random() < perfil.taxa_erro
+			aleatorio = random.Random(self._aleatorio.random())
+
+		if retry_after is not None:
+			return self._responder(
+				req, 429, b'{"error": "stub: limite de taxa"}', cabecalhos={"Retry-After": str(retry_after)}
+			)
+		perfil.esperar(aleatorio)
+
+		if falhar:
+			return self._responder(req, 503, b'{"error": "stub: falha injetada"}')
+
+		if servico == "groq":
+			self._groq(req, corpo)
+		elif servico == "gemini":
+			self._gemini(req, caminho, corpo)
+		elif servico == "yahoo":
+			self._yahoo(req, caminho)
+		else:
+			self._rss(req, caminho)
+
+	def _limitar(self, servico, perfil):
+		# Janela deslizante de 60 s, como o limite por minuto dos provedores;
+		# devolve os segundos do Retry-After quando a requisição é recusada
+		if not perfil.limite_rpm:
+			return None
+		agora = time.monotonic()
+		janela = [t for t in self._janelas[servico] if agora - t < 60]
+		self._janelas[servico] = janela
+		if len(janela) >= perfil.limite_rpm:
+			self.recusas[servico] += 1
+			return max(1, int(60 - (agora - janela[0])) + 1)
+		janela.append(agora)
+		return None
+
+	def _responder(self, req, status, corpo, tipo="application/json", cabecalhos=None):
+		req.send_response(status)
+		req.send_header("Content-Type", tipo)
+		req.send_header("Content-Length", str(len(corpo)))
+		for chave, valor in (cabecalhos or {}).items():
+			req.send_header(chave, valor)
+		req.end_headers()
+		try:
+			req.wfile.write(corpo)
+		except (BrokenPipeError, ConnectionResetError):
+			# Cliente desistiu (ex.: prazo do relatório esgotado)
+			pass
+
+	def _groq(self, req, corpo):
+		prompt = json.loads(corpo or b"{}").get("messages", [{}])[0].get("content", "")
+		if "ticker da B3" in prompt:
+			resposta = "PETR4"
+		elif "nome popular" in prompt:
+			resposta = "Petrobras"
+		elif "lista numerada de empresas" in prompt:
+			resposta = json.dumps({"0": [0, 1]})
+		else:
+			# Filtro de notícias: devolve as duas primeiras manchetes
+			resposta = json.dumps(re.findall(r"\[(n\d+)\]", prompt)[:2])
+
+		self._responder(req, 200, json.dumps({
+			"choices": [{"message": {"role": "assistant", "content": resposta}}],
+			"usage": {"prompt_tokens": len(prompt) // 4, "completion_tokens": len(resposta) // 4}
+		}).encode("utf-8"))
+
+	def _gemini(self, req, caminho, corpo):
+		pedido = json.loads(corpo or b"{}")
+		config = pedido.get("generationConfig") or pedido.get("generation_config") or {}
+		esquema = config.get("responseJsonSchema") or config.get("response_json_schema") or {}
+		secoes = list((esquema.get("properties") or {}).keys())
+		texto = json.dumps(self._relatorio(secoes), ensure_ascii=False)
+
+		def parte(trecho):
+			return {
+				"candidates": [{"content": {"role": "model", "parts": [{"text": trecho}]}, "index": 0}],
+				"usageMetadata": {"promptTokenCount": 800, "candidatesTokenCount": len(trecho) // 4}
+			}
+
+		if "streamGenerateContent" in caminho:
+			# SSE em alguns pedaços, como a API real
+			passo = max(1, len(texto) // 5)
+			eventos = []
+			for i in range(0, len(texto), passo):
+				evento = parte(texto[i:i + passo])
+				if i + passo >= len(texto):
+					evento["candidates"][0]["finishReason"] = "STOP"
+				eventos.append(f"data: {json.dumps(evento, ensure_ascii=False)}\r\n\r\n")
+			return self._responder(req, 200, "".join(eventos).encode("utf-8"), "text/event-stream")
+
+		resposta = parte(texto)
+		resposta["candidates"][0]["finishReason"] = "STOP"
+		self._responder(req, 200, json.dumps(resposta, ensure_ascii=False).encode("utf-8"))
+
+	@staticmethod
+	def _relatorio(secoes):
+		relatorio = {
+			"nome_oficial": "Empresa Stub S.A.",
+			"ticker": "STUB3",
+			"resumo": {
+				"setor": "Energia",
+				"descricao": "Empresa fictícia usada no benchmark offline.",
+				"principais_produtos": ["Produto A", "Produto B"]
+			},
+			"noticias": [{"titulo": "Manchete de teste", "fonte": "InfoMoney", "resumo": "Sem impacto.", "link": "n1"}],
+			"acao": {"preco_atual": 10.0, "variacao": 1.5, "volume": 1000},
+			"analise_rapida": "Análise gerada pelo servidor local de benchmark."
+		}
+		return {s: v for s, v in relatorio.items() if not secoes or s in secoes}
+
+	def _yahoo(self, req, caminho):
+		partes = caminho.strip("/").split("/")
+		tipo, simbolo = partes[1], partes[-1]
+		if tipo == "chart":
+			instantes = self._pregoes(parse_qs(urlparse(req.path).query))
+			n = len(instantes)
+			dados = {"chart": {"result": [{
+				"meta": {"symbol": simbolo, "currency": "BRL"},
+				"timestamp": instantes,
+				"indicators": {"quote": [{
+					"open": [10.0] * n, "high": [10.5] * n, "low": [9.8] * n, "close": [10.2] * n, "volume": [1500000] * n
+				}]}
+			}], "error": None}}
+		else:
+			dados = {"quoteSummary": {"result": [{
+				"price": {"longName": f"{simbolo.split('.')[0]} S.A."},
+				"assetProfile": {
+					"sector": "Energy", "industry": "Oil & Gas", "website": "https://example.com",
+					"longBusinessSummary": "Empresa fictícia usada no benchmark offline.",
+					"country": "Brazil", "fullTimeEmployees": 1000
+				}
+			}], "error": None}}
+		self._responder(req, 200, json.dumps(dados).encode("utf-8"))
+
+	@staticmethod
+	def _pregoes(params):
+		# Um pregão por dia útil desde period1 (ou no range "Nd"/"Ny"), terminando agora
+		agora = int(time.time())
+		if "period1" in params:
+			inicio = int(params["period1"][0])
+		else:
+			faixa = params.get("range", ["1d"])[0]
+			inicio = agora - int(faixa[:-1]) * (365 if faixa.endswith("y") else 1) * 86400
+		dias = range(agora - 86400 * ((agora - inicio) // 86400), agora + 1, 86400)
+		return [d for d in dias if time.gmtime(d).tm_wday < 5] or [agora]
+
+	def _rss(self, req, caminho):
+		fonte = caminho.strip("/").split("/")[-1]
+		agora = time.time()
+		itens = []
+		for i in range(self.manchetes_por_feed):
+			empresa = EMPRESAS_MANCHETES[i % len(EMPRESAS_MANCHETES)]
+			titulo = MODELOS_MANCHETE[i % len(MODELOS_MANCHETE)].format(empresa=empresa)
+			itens.append(
+				f"<item><title>{titulo}</title>"
+				f"<link>{self.url}/noticia/{fonte}/{i}</link>"
+				f"<pubDate>{formatdate(agora - i * 600, usegmt=True)}</pubDate></item>"
+			)
+		xml = (
+			'<?xml version="1.0" encoding="UTF-8"?><rss version="2.0"><channel>'
+			f"<title>{fonte}</title>{''.join(itens)}</channel></rss>"
+		)
+		self._responder(req, 200, xml.encode("utf-8"), "application/rss+xml")
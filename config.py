@@ -6,12 +6,121 @@ load_dotenv()
 class Config:
     GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
     GROQ_API_KEY = os.getenv("GROQ_API_KEY")
+    GEMINI_BASE_URL = os.getenv("GEMINI_BASE_URL")  # gateway/servidor alternativo da API do Gemini
+    
+    # Cliente HTTP da Groq (sessão keep-alive compartilhada)
+    GROQ_URL = os.getenv("GROQ_URL", "https://api.groq.com/openai/v1/chat/completions")
+    GROQ_POOL_SIZE = int(os.getenv("GROQ_POOL_SIZE", "10"))
+    GROQ_TIMEOUT_CONEXAO = float(os.getenv("GROQ_TIMEOUT_CONEXAO", "5"))
+    GROQ_TIMEOUT_LEITURA = float(os.getenv("GROQ_TIMEOUT_LEITURA", "15"))
+    GROQ_MAX_CARACTERES_PROMPT = int(os.getenv("GROQ_MAX_CARACTERES_PROMPT", "12000"))
+    
+    # Limites de taxa por provedor (requisições e tokens por minuto; 0 = sem limite)
+    GROQ_RPM = int(os.getenv("GROQ_RPM", "30"))
+    GROQ_TPM = int(os.getenv("GROQ_TPM", "6000"))
+    GEMINI_RPM = int(os.getenv("GEMINI_RPM", "10"))
+    GEMINI_TPM = int(os.getenv("GEMINI_TPM", "250000"))
+    LIMITE_TENTATIVAS = int(os.getenv("LIMITE_TENTATIVAS", "4"))
+    LIMITE_BACKOFF_BASE = float(os.getenv("LIMITE_BACKOFF_BASE", "1"))  # segundos
+    LIMITE_BACKOFF_MAX = float(os.getenv("LIMITE_BACKOFF_MAX", "30"))
+    LIMITE_ESPERA_MAX = float(os.getenv("LIMITE_ESPERA_MAX", "120"))  # fila máxima antes de desistir
+    LIMITE_TOKENS_RESPOSTA = int(os.getenv("LIMITE_TOKENS_RESPOSTA", "800"))  # estimativa sem max_tokens
+
+    # Chamadas simultâneas por serviço externo (0 = sem limite)
+    GROQ_CONCORRENCIA = int(os.getenv("GROQ_CONCORRENCIA", "8"))
+    GEMINI_CONCORRENCIA = int(os.getenv("GEMINI_CONCORRENCIA", "4"))
+    YAHOO_CONCORRENCIA = int(os.getenv("YAHOO_CONCORRENCIA", "8"))
+    RSS_CONCORRENCIA = int(os.getenv("RSS_CONCORRENCIA", "4"))
+
+    # Disjuntores por serviço externo: falhas seguidas para abrir e tempo até a sondagem
+    DISJUNTOR_FALHAS = int(os.getenv("DISJUNTOR_FALHAS", "3"))
+    DISJUNTOR_TEMPO_ABERTO = float(os.getenv("DISJUNTOR_TEMPO_ABERTO", "30"))  # segundos
+
+    # Orçamento de tokens dos prompts (estimativa local antes de cada chamada)
+    TOKENS_ORCAMENTO_FILTRO = int(os.getenv("TOKENS_ORCAMENTO_FILTRO", "1500"))
+    TOKENS_ORCAMENTO_RELATORIO = int(os.getenv("TOKENS_ORCAMENTO_RELATORIO", "2500"))
+    TOKENS_MAX_MANCHETES = int(os.getenv("TOKENS_MAX_MANCHETES", "40"))
+    TOKENS_MAX_TITULO = int(os.getenv("TOKENS_MAX_TITULO", "160"))  # caracteres
     
     # URLs para consultas
     RSS_FEEDS = {
-        "infomoney": "https://www.infomoney.com.br/feed/",
-        "investing": "https://br.investing.com/rss/news_301.rss"
+        "InfoMoney": "https://www.infomoney.com.br/feed/",
+        "Investing": "https://br.investing.com/rss/news_301.rss"
     }
+    RSS_CACHE_TTL = int(os.getenv("RSS_CACHE_TTL", "300"))  # segundos
+    RSS_TIMEOUT = float(os.getenv("RSS_TIMEOUT", "10"))
+
     
     # Configurações Yahoo Finance
-    YAHOO_BASE_URL = "https://query1.finance.yahoo.com/v8/finance/chart/"
\ No newline at end of file
+    YAHOO_FONTE = os.getenv("YAHOO_FONTE", "yfinance")  # "yfinance" ou "http" (API direta, sem pandas)
+    YAHOO_BASE_URL = os.getenv("YAHOO_BASE_URL", "https://query1.finance.yahoo.com/v8/finance/chart/")
+    YAHOO_RESUMO_URL = os.getenv("YAHOO_RESUMO_URL", "https://query2.finance.yahoo.com/v10/finance/quoteSummary/")
+    YAHOO_TIMEOUT = float(os.getenv("YAHOO_TIMEOUT", "10"))
+    YAHOO_POOL_SIZE = int(os.getenv("YAHOO_POOL_SIZE", "10"))
+    COTACAO_TTL_PREGAO = int(os.getenv("COTACAO_TTL_PREGAO", "15"))  # segundos, com o mercado aberto
+    PREGAO_FECHAMENTO = os.getenv("PREGAO_FECHAMENTO", "")  # "HH:MM"; vazio = 17h ou 18h conforme o horário de verão dos EUA
+    PREGAO_TOLERANCIA_FECHAMENTO = int(os.getenv("PREGAO_TOLERANCIA_FECHAMENTO", "3600"))  # segundos após o fechamento com a validade do pregão
+
+    # Índice local de empresas da B3 (ticker;nome;aliases;setor)
+    B3_EMPRESAS_CSV = os.getenv(
+        "B3_EMPRESAS_CSV",
+        os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "empresas_b3.csv")
+    )
+
+    # Cache persistente das chamadas de LLM (SQLite)
+    CACHE_ATIVO = os.getenv("CACHE_ATIVO", "1") != "0"
+    CACHE_DIR = os.getenv("CACHE_DIR", ".cache")
+    CACHE_MAX_ENTRADAS = int(os.getenv("CACHE_MAX_ENTRADAS", "5000"))
+    CACHE_TTL = {  # segundos, por tipo de chamada
+        "ticker": 30 * 24 * 3600,
+        "nome_empresa": 30 * 24 * 3600,
+        "filtro_noticias": 3600,
+        "relatorio": 3600,
+        "secao_relatorio": 24 * 3600,
+        "cotacao_ultima": 7 * 24 * 3600  # contingência quando o Yahoo está fora do ar
+    }
+
+    # Cache em memória da versão web, compartilhado entre sessões
+    APP_CACHE_TTL = int(os.getenv("APP_CACHE_TTL", "300"))  # segundos
+    APP_CACHE_MAX_MB = float(os.getenv("APP_CACHE_MAX_MB", "64"))
+
+    # Prazo de cada relatório (segundos; 0 = sem prazo) e fração dele reservada à coleta
+    RELATORIO_PRAZO = float(os.getenv("RELATORIO_PRAZO", "8"))
+    PRAZO_FRACAO_COLETA = float(os.getenv("PRAZO_FRACAO_COLETA", "0.5"))
+
+    # Regeneração incremental do relatório: variação de preço (%) que refaz a análise
+    RELATORIO_LIMIAR_PRECO = float(os.getenv("RELATORIO_LIMIAR_PRECO", "2.0"))
+
+    # Base local de notícias (ingestão periódica dos feeds + busca FTS)
+    NOTICIAS_DB = os.getenv("NOTICIAS_DB", os.path.join(CACHE_DIR, "noticias.sqlite3"))
+    INGESTAO_INTERVALO = int(os.getenv("INGESTAO_INTERVALO", "300"))  # segundos
+    NOTICIAS_JANELA_HORAS = int(os.getenv("NOTICIAS_JANELA_HORAS", "72"))
+    NOTICIAS_MAX_CANDIDATAS = int(os.getenv("NOTICIAS_MAX_CANDIDATAS", "200"))
+    NOTICIAS_RETENCAO_DIAS = int(os.getenv("NOTICIAS_RETENCAO_DIAS", "90"))
+
+    # Histórico diário local (colunar, um memmap por coluna) e anos baixados na primeira sincronização
+    HISTORICO_DIR = os.getenv("HISTORICO_DIR", os.path.join(CACHE_DIR, "historico"))
+    HISTORICO_ANOS = int(os.getenv("HISTORICO_ANOS", "10"))
+    HISTORICO_DIAS_RECENTES = int(os.getenv("HISTORICO_DIAS_RECENTES", "7"))  # baixados na hora pela cotação
+    HISTORICO_COMPLETAR_WORKERS = int(os.getenv("HISTORICO_COMPLETAR_WORKERS", "2"))  # downloads do histórico completo em segundo plano (0 = não completa; a CLI usa 0)
+
+    # Coleta paralela (infos, cotação e notícias)
+    COLETA_MAX_WORKERS = int(os.getenv("COLETA_MAX_WORKERS", "4"))
+
+    # Spans e métricas: log JSON ("-" = stderr, ou caminho de arquivo) e porta do /metrics (0 = desligado)
+    METRICAS_LOG = os.getenv("METRICAS_LOG", "")
+    METRICAS_PORTA = int(os.getenv("METRICAS_PORTA", "0"))
+    METRICAS_HOST = os.getenv("METRICAS_HOST", "127.0.0.1")  # "0.0.0.0" para coletar de outra máquina
+
+    # Modo em lote da CLI (relatórios simultâneos)
+    LOTE_WORKERS = int(os.getenv("LOTE_WORKERS", "4"))
+    LOTE_PRAZO = float(os.getenv("LOTE_PRAZO", "0"))  # prazo de cada relatório (0 = sem prazo: espera na fila dos limites)
+    LOTE_BLOCO_NOTICIAS = int(os.getenv("LOTE_BLOCO_NOTICIAS", "10"))  # empresas com as notícias filtradas em uma só chamada à IA
+
+    # Serviço HTTP (python -m modules.servico)
+    SERVICO_HOST = os.getenv("SERVICO_HOST", "127.0.0.1")
+    SERVICO_PORTA = int(os.getenv("SERVICO_PORTA", "8080"))
+    SERVICO_WORKERS = int(os.getenv("SERVICO_WORKERS", "16"))  # threads das etapas bloqueantes
+    SERVICO_PRAZO_JOB = float(os.getenv("SERVICO_PRAZO_JOB", "120"))  # prazo dos relatórios assíncronos
+    SERVICO_JOBS_TTL = int(os.getenv("SERVICO_JOBS_TTL", "3600"))  # segundos que um job concluído fica consultável
+    SERVICO_MAX_JOBS = int(os.getenv("SERVICO_MAX_JOBS", "1000"))
@@ -1,13 +1,20 @@
 import sys
 import json
+import argparse
+import contextlib
 from datetime import datetime
-from modules.infos import obter_resumo_empresa
-from modules.noticia import buscar_noticias_rss
-from modules.cotacao import obter_cotacao_atual
-from modules.gemini import GeminiProcessor
+from config import Config
+from modules.cache import ler_relatorio_pronto, gravar_relatorio_pronto
+from modules.entidade import resolver_entidade
+from modules.prazo import com_prazo
+from modules.tokens import metricas_tokens
 from utils.display import *
 
-def main():
+# Coleta (yfinance/pandas/feedparser) e Gemini (LangChain) são importados
+# só dentro de gerar_relatorio, para que a CLI abra rápido e um relatório
+# em cache seja exibido sem carregá-los.
+
+def main(empresa=None):
     # Cabeçalho do sistema
     print_cabecalho("📊 PESQUISA AUTOMATIZADA DE EMPRESAS")
     print(f"{Fore.LIGHTBLACK_EX}Sistema de Análise Preliminar para Investment Banking\n")
@@ -20,9 +27,12 @@ def main():
     
     print(f"{Fore.CYAN}💡 Empresas sugeridas: {', '.join(empresas_sugeridas[:5])}...")
     
-    # Solicita nome da empresa
-    print(f"\n{Fore.WHITE}Digite o nome da empresa brasileira:")
-    empresa = input(f"{Fore.YELLOW}>>> {Fore.WHITE}").strip()
+    # Solicita nome da empresa (se não veio na linha de comando)
+    interativo = empresa is None
+    if interativo:
+        print(f"\n{Fore.WHITE}Digite o nome da empresa brasileira:")
+        empresa = input(f"{Fore.YELLOW}>>> {Fore.WHITE}")
+    empresa = empresa.strip()
     
     if not empresa:
         print_erro("Nome da empresa não fornecido")
@@ -30,44 +40,100 @@ def main():
     
     print_info(f"Iniciando pesquisa para: {empresa}")
     
-    # 1. Coleta dados brutos
-    dados_coletados = {
-        "empresa": empresa,
-        "info": {},
-        "cotacao": {},
-        "noticias": []
-    }
+    # Prazo do relatório inteiro (RELATORIO_PRAZO): o que não ficar pronto é sinalizado
+    with com_prazo():
+        # Resolve a empresa (ticker) uma única vez para todo o relatório
+        entidade = resolver_entidade(empresa)
+        print_info(f"Ticker identificado: {entidade.ticker}")
+        
+        # Relatório recente da mesma empresa: exibido direto do cache
+        em_cache = ler_relatorio_pronto(entidade.simbolo)
+        if em_cache:
+            print_info("⚡ Relatório recente encontrado no cache")
+            exibir_relatorio(em_cache["dados_finais"], em_cache["dados_coletados"])
+        else:
+            gerar_relatorio(empresa, entidade)
     
-    # Busca informações da empresa
-    print_secao("1. BUSCANDO INFORMAÇÕES DA EMPRESA")
-    info = obter_resumo_empresa(empresa)
-    if info['status'] == 'sucesso':
-        dados_coletados['info'] = info['dados']
-    
-    # Busca cotação
-    print_secao("2. BUSCANDO COTAÇÃO ATUAL")
-    cotacao = obter_cotacao_atual(empresa)
-    if cotacao['status'] == 'sucesso':
-        dados_coletados['cotacao'] = cotacao
-    
-    # Busca notícias
-    print_secao("3. BUSCANDO NOTÍCIAS RECENTES")
-    noticias = buscar_noticias_rss(empresa)
-    dados_coletados['noticias'] = noticias
+    # Finalização
+    print_cabecalho("✅ PESQUISA CONCLUÍDA")
+    print(f"\n{Fore.GREEN}Relatório gerado com sucesso!")
+    print(f"{Fore.LIGHTBLACK_EX}Data: {datetime.now().strftime('%d/%m/%Y %H:%M')}")
+    exibir_uso_tokens()
+    if interativo:
+        print(f"\n{Fore.WHITE}Pressione Enter para sair...")
+        input()
+
+def executar_lote_cli(args):
+    """Modo em lote: relatórios em JSONL, progresso e falhas no stderr"""
+    from modules.lote import ler_empresas, executar_lote
+    from modules.metricas import iniciar_servidor_metricas
+
+    empresas = ler_empresas(args.lote)
+    if not empresas:
+        print_erro("Nenhuma empresa informada no lote")
+        return 1
+
+    # /metrics durante o lote (com --processos, só as etapas do processo principal)
+    iniciar_servidor_metricas()
+
+    def progresso(feitos, total, resultado):
+        ticker = resultado.get("ticker") or resultado["empresa"]
+        print(f"[{feitos}/{total}] {ticker}: {resultado['status']} ({resultado.get('duracao_s', 0.0):.1f}s)", file=sys.stderr)
+
+    saida = open(args.saida, "w", encoding="utf-8") if args.saida else sys.stdout
+    try:
+        # Mensagens dos módulos vão para o stderr, para não misturar com o JSONL
+        with contextlib.redirect_stdout(sys.stderr):
+            resumo = executar_lote(empresas, saida, args.workers, args.processos, progresso, args.prazo)
+    finally:
+        if args.saida:
+            saida.close()
+
+    print(
+        f"Concluído em {resumo['duracao_s']:.1f}s: {resumo['sucesso']} sucesso, "
+        f"{resumo['parcial']} parcial, {resumo['erro']} erro (total {resumo['total']})",
+        file=sys.stderr
+    )
+    for falha in resumo["falhas"]:
+        print(f"  - {falha['empresa']} [{falha['status']}]: {falha['mensagem']}", file=sys.stderr)
+    return 1 if resumo["falhas"] else 0
+
+def ler_argumentos(argv=None):
+    parser = argparse.ArgumentParser(description="Pesquisa automatizada de empresas da B3")
+    parser.add_argument("empresa", nargs="?", help="nome ou ticker (sem ele, pergunta no terminal)")
+    parser.add_argument("--lote", metavar="ARQUIVO", help="arquivo com uma empresa por linha ('-' para stdin)")
+    parser.add_argument("--workers", type=int, help="relatórios simultâneos no modo em lote")
+    parser.add_argument("--processos", action="store_true", help="usa processos em vez de threads no lote")
+    parser.add_argument("--saida", metavar="ARQUIVO", help="arquivo JSONL de saída (padrão: stdout)")
+    parser.add_argument("--prazo", type=float, metavar="SEGUNDOS", help="prazo de cada relatório no lote (padrão: LOTE_PRAZO; 0 = sem prazo)")
+    return parser.parse_args(argv)
+
+def gerar_relatorio(empresa, entidade):
+    """Coleta os dados e gera o relatório com o Gemini, exibindo cada seção"""
+    from modules.coleta import coletar_dados
+    from modules.gemini import GeminiProcessor
+    from modules.relatorio import gerar_relatorio_em_stream
+
+    # 1. Coleta dados brutos (etapas em paralelo)
+    print_secao("1. COLETANDO INFORMAÇÕES, COTAÇÃO E NOTÍCIAS")
+    dados_coletados = coletar_dados(entidade, ao_concluir=exibir_etapa_concluida)
         
     # 2. Processa com Gemini
-    print_secao("4. GERANDO RELATÓRIO COM LANGCHAIN + GEMINI")
+    print_secao("2. GERANDO RELATÓRIO COM LANGCHAIN + GEMINI")
     
     try:
         processor = GeminiProcessor()
         print_info("🔍 Processando dados coletados...")
         
-        dados_finais = processor.resumir_dados_com_json(empresa, dados_coletados)
-
-        debug_estrutura_noticias(dados_finais)
+        # Seções em cache aparecem na hora; as que mudaram, assim que o Gemini as conclui
+        dados_finais = exibir_relatorio_em_stream(
+            gerar_relatorio_em_stream(processor, empresa, dados_coletados, entidade),
+            dados_coletados
+        )
         
         if dados_finais:
-            exibir_relatorio(dados_finais, dados_coletados)
+            debug_estrutura_noticias(dados_finais)
+            gravar_relatorio_pronto(entidade.simbolo, {"dados_finais": dados_finais, "dados_coletados": dados_coletados})
         else:
             print_erro("Não foi possível gerar o relatório com IA")
             exibir_dados_brutos(dados_coletados)
@@ -79,56 +145,102 @@ def main():
     except Exception as e:
         print_erro(f"Erro no processamento: {str(e)}")
         exibir_dados_brutos(dados_coletados)
-    
-    # Finalização
-    print_cabecalho("✅ PESQUISA CONCLUÍDA")
-    print(f"\n{Fore.GREEN}Relatório gerado com sucesso!")
-    print(f"{Fore.LIGHTBLACK_EX}Data: {datetime.now().strftime('%d/%m/%Y %H:%M')}")
-    print(f"\n{Fore.WHITE}Pressione Enter para sair...")
-    input()
+
+def exibir_uso_tokens():
+    """Tokens consumidos por etapa (prompt + resposta)"""
+    for etapa, m in metricas_tokens().items():
+        estimado = " (estimado)" if m["estimadas"] else ""
+        print(f"{Fore.LIGHTBLACK_EX}Tokens {etapa}: {m['tokens_prompt']} prompt + {m['tokens_resposta']} resposta em {m['chamadas']} chamada(s){estimado}")
+
+def exibir_etapa_concluida(etapa, resultado):
+    """Informa o término de cada etapa da coleta"""
+    nomes = {
+        "info": "Informações da empresa",
+        "cotacao": "Cotação atual",
+        "noticias": "Notícias recentes"
+    }
+    if isinstance(resultado, dict) and resultado.get('status') == 'erro':
+        print_erro(f"{nomes[etapa]}: {resultado.get('mensagem', 'falha na coleta')}")
+    else:
+        print_sucesso(f"{nomes[etapa]} obtidas")
 
 def exibir_relatorio(dados_json, dados_brutos):
     """Exibe o relatório formatado no terminal"""
-    print_cabecalho(f"📋 RELATÓRIO - {dados_json['nome_oficial']}")
-    
-    # Cabeçalho com ticker
-    print(f"\n{Fore.YELLOW}🏢 {dados_json['nome_oficial']}")
-    print(f"{Fore.CYAN}Ticker: {dados_json['ticker']}")
-    
-    # Informações da ação
-    print(f"\n{Fore.GREEN}💰 COTAÇÃO ATUAL")
-    print(f"{Fore.WHITE}Preço: {dados_json['acao']['preco_atual']}")
-    print(f"{Fore.WHITE}Variação: {dados_json['acao']['variacao']}")
-    print(f"{Fore.WHITE}Volume: {dados_json['acao']['volume']}")
-    
-    # Resumo da empresa
-    print(f"\n{Fore.GREEN}📊 SOBRE A EMPRESA")
-    print(f"{Fore.WHITE}Setor: {dados_json['resumo']['setor']}")
-    print(f"\n{Fore.CYAN}Descrição:")
-    print(f"{Fore.WHITE}{dados_json['resumo']['descricao']}")
-    
-    print(f"\n{Fore.CYAN}Principais produtos/serviços:")
-    for produto in dados_json['resumo']['principais_produtos']:
-        print(f"{Fore.WHITE}• {produto}")
-    
-    # Notícias
-    print(f"\n{Fore.GREEN}📰 NOTÍCIAS RECENTES")
-    for i, noticia in enumerate(dados_json['noticias'], 1):
-        print(f"\n{Fore.YELLOW}{i}. {noticia['titulo']}")
-        print(f"{Fore.LIGHTBLACK_EX}Fonte: {noticia['fonte']}")
-        print(f"{Fore.LIGHTBLACK_EX}Link: {noticia['link']}")
-        if 'resumo' in noticia:
-            print(f"{Fore.WHITE}{noticia['resumo']}")
-    
-    # Análise rápida
-    print(f"\n{Fore.GREEN}📈 ANÁLISE RÁPIDA")
-    print(f"{Fore.CYAN}{dados_json['analise_rapida']}")
-    
-    # Dados brutos de referência
+    for secao in ["nome_oficial", "ticker", "acao", "resumo", "noticias", "analise_rapida", "faltando"]:
+        if secao in dados_json:
+            exibir_secao(secao, dados_json[secao])
+    
+    exibir_referencia_bruta(dados_brutos)
+
+def exibir_relatorio_em_stream(secoes, dados_brutos):
+    """Exibe cada seção assim que ela chega e retorna o relatório completo"""
+    dados_json = {}
+    for secao, valor in secoes:
+        dados_json[secao] = valor
+        exibir_secao(secao, valor)
+    
+    if dados_json:
+        exibir_referencia_bruta(dados_brutos)
+    return dados_json or None
+
+def exibir_secao(secao, valor):
+    """Exibe uma seção do relatório"""
+    if secao == "nome_oficial":
+        print_cabecalho(f"📋 RELATÓRIO - {valor}")
+        print(f"\n{Fore.YELLOW}🏢 {valor}")
+    
+    elif secao == "ticker":
+        # Cabeçalho com ticker
+        print(f"{Fore.CYAN}Ticker: {valor}")
+    
+    elif secao == "acao":
+        # Informações da ação
+        print(f"\n{Fore.GREEN}💰 COTAÇÃO ATUAL")
+        print(f"{Fore.WHITE}Preço: {valor['preco_atual']}")
+        print(f"{Fore.WHITE}Variação: {valor['variacao']}")
+        print(f"{Fore.WHITE}Volume: {valor['volume']}")
+    
+    elif secao == "resumo":
+        # Resumo da empresa
+        print(f"\n{Fore.GREEN}📊 SOBRE A EMPRESA")
+        print(f"{Fore.WHITE}Setor: {valor['setor']}")
+        print(f"\n{Fore.CYAN}Descrição:")
+        print(f"{Fore.WHITE}{valor['descricao']}")
+        
+        print(f"\n{Fore.CYAN}Principais produtos/serviços:")
+        for produto in valor['principais_produtos']:
+            print(f"{Fore.WHITE}• {produto}")
+    
+    elif secao == "noticias":
+        # Notícias
+        print(f"\n{Fore.GREEN}📰 NOTÍCIAS RECENTES")
+        for i, noticia in enumerate(valor, 1):
+            print(f"\n{Fore.YELLOW}{i}. {noticia['titulo']}")
+            print(f"{Fore.LIGHTBLACK_EX}Fonte: {noticia['fonte']}")
+            print(f"{Fore.LIGHTBLACK_EX}Link: {noticia['link']}")
+            if 'resumo' in noticia:
+                print(f"{Fore.WHITE}{noticia['resumo']}")
+    
+    elif secao == "analise_rapida":
+        # Análise rápida
+        print(f"\n{Fore.GREEN}📈 ANÁLISE RÁPIDA")
+        print(f"{Fore.CYAN}{valor}")
+    
+    elif secao == "faltando":
+        # Relatório parcial (prazo esgotado ou etapa com falha)
+        from modules.relatorio import descrever_faltando
+        print(f"\n{Fore.YELLOW}⏱️ {descrever_faltando({secao: valor})}")
+
+def exibir_referencia_bruta(dados_brutos):
+    """Exibe os dados brutos de referência ao final do relatório"""
     print(f"\n{Fore.LIGHTBLACK_EX}{'═' * 60}")
     print(f"{Fore.LIGHTBLACK_EX}DADOS BRUTOS COLETADOS:")
     if dados_brutos['cotacao'].get('preco_atual'):
         print(f"{Fore.LIGHTBLACK_EX}Preço bruto: R$ {dados_brutos['cotacao']['preco_atual']:.2f}")
+        if dados_brutos['cotacao'].get('origem') == 'cache':
+            print(f"{Fore.LIGHTBLACK_EX}Cotação em cache há {dados_brutos['cotacao']['defasagem_segundos']:.0f}s")
+        elif dados_brutos['cotacao'].get('origem') == 'contingencia':
+            print(f"{Fore.YELLOW}Yahoo indisponível: última cotação conhecida, de {dados_brutos['cotacao']['defasagem_segundos'] / 60:.0f} min atrás")
     print(f"{Fore.LIGHTBLACK_EX}{'═' * 60}")
 
 
@@ -164,17 +276,25 @@ def debug_estrutura_noticias(dados_json):
         print(f"\n{Fore.CYAN}Primeira notícia (keys disponíveis):")
         for key, value in primeira.items():
             print(f"  {Fore.WHITE}{key}: {Fore.GREEN}{str(value)[:80]}...")
-    
-    # Verifica também se há outros campos possíveis para links
-    possiveis_campos_link = ['link', 'url', 'href', 'source_url', 'article_link']
-    for campo in possiveis_campos_link:
-        if campo in primeira:
-            print(f"\n{Fore.GREEN}✓ Campo '{campo}' encontrado: {primeira[campo][:80]}...")
+        
+        # Verifica também se há outros campos possíveis para links
+        # (relatório parcial pode vir sem notícias)
+        possiveis_campos_link = ['link', 'url', 'href', 'source_url', 'article_link']
+        for campo in possiveis_campos_link:
+            if campo in primeira:
+                print(f"\n{Fore.GREEN}✓ Campo '{campo}' encontrado: {primeira[campo][:80]}...")
 
 
 if __name__ == "__main__":
+    args = ler_argumentos()
+    # Execução única: não agenda o download do histórico completo, que seria
+    # interrompido na saída (fica para o serviço e o Streamlit)
+    Config.HISTORICO_COMPLETAR_WORKERS = 0
+    if args.lote:
+        sys.exit(executar_lote_cli(args))
+
     try:
-        main()
+        main(args.empresa)
     except KeyboardInterrupt:
         print(f"\n{Fore.YELLOW}⏹️ Operação cancelada pelo usuário.")
         sys.exit(0)
@@ -0,0 +1,325 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from config import Config
+
+class CacheDisco:
+	"""
+	Cache persistente em SQLite, compartilhado entre execuções e processos.
+
+	Cada entrada tem um tipo (ticker, nome_empresa, ...) com TTL próprio.
+	Ao passar de `max_entradas`, as menos acessadas recentemente são removidas (LRU).
+	"""
+
+	def __init__(self, caminho, max_entradas=5000, ttls=None):
+		self.caminho = caminho
+		self.max_entradas = max_entradas
+		self.ttls = ttls or {}
+		self.hits = {}
+		self.misses = {}
+		self._lock = threading.Lock()
+
+		pasta = os.path.dirname(caminho)
+		if pasta:
+			os.makedirs(pasta, exist_ok=True)
+
+		self._conexao = sqlite3.connect(caminho, check_same_thread=False, timeout=10)
+		self._conexao.execute("PRAGMA journal_mode=WAL")
+		self._conexao.execute("""
+			CREATE TABLE IF NOT EXISTS entradas (
+				chave TEXT PRIMARY KEY,
+				tipo TEXT NOT NULL,
+				valor TEXT NOT NULL,
+				criado_em REAL NOT NULL,
+				acessado_em REAL NOT NULL,
+				expira_em REAL
+			)
+		""")
+		self._conexao.execute("CREATE INDEX IF NOT EXISTS idx_acessado ON entradas (acessado_em)")
+		self._conexao.commit()
+
+	def obter_entrada(self, tipo, chave):
+		"""
+		Retorna (valor, criado_em) da entrada válida, ou None.
+		"""
+		agora = time.time()
+		chave = f"{tipo}:{chave}"
+		with self._lock:
+			linha = self._conexao.execute(
+				"SELECT valor, criado_em, expira_em FROM entradas WHERE chave = ?",
+				(chave,)
+			).fetchone()
+
+			if linha is None or (linha[2] is not None and linha[2] < agora):
+				self.misses[tipo] = self.misses.get(tipo, 0) + 1
+				return None
+
+			self._conexao.execute("UPDATE entradas SET acessado_em = ? WHERE chave = ?", (agora, chave))
+			self._conexao.commit()
+			self.hits[tipo] = self.hits.get(tipo, 0) + 1
+
+		return json.loads(linha[0]), linha[1]
+
+	def obter(self, tipo, chave):
+		"""
+		Retorna o valor armazenado, ou None se ausente/expirado.
+		"""
+		entrada = self.obter_entrada(tipo, chave)
+		return entrada[0] if entrada else None
+
+	def gravar(self, tipo, chave, valor, ttl=None):
+		"""
+		Grava o valor (serializável em JSON). Sem `ttl`, usa o TTL do tipo.
+		"""
+		agora = time.time()
+		ttl = ttl if ttl is not None else self.ttls.get(tipo)
+		expira_em = agora + ttl if ttl is not None else None
+
+		with self._lock:
+			self._conexao.execute(
+				"INSERT OR REPLACE INTO entradas VALUES (?, ?, ?, ?, ?, ?)",
+				(f"{tipo}:{chave}", tipo, json.dumps(valor, ensure_ascii=False), agora, agora, expira_em)
+			)
+			self._remover_excedentes(agora)
+			self._conexao.commit()
+
+	def _remover_excedentes(self, agora):
+		self._conexao.execute("DELETE FROM entradas WHERE expira_em IS NOT NULL AND expira_em < ?", (agora,))
+		total = self._conexao.execute("SELECT COUNT(*) FROM entradas").fetchone()[0]
+		if total > self.max_entradas:
+			self._conexao.execute(
+				"DELETE FROM entradas WHERE chave IN "
+				"(SELECT chave FROM entradas ORDER BY acessado_em LIMIT ?)",
+				(total - self.max_entradas,)
+			)
+
+	def limpar(self, tipo=None):
+		"""
+		Remove todas as entradas (ou apenas as do tipo informado).
+		"""
+		with self._lock:
+			if tipo:
+				self._conexao.execute("DELETE FROM entradas WHERE tipo = ?", (tipo,))
+			else:
+				self._conexao.execute("DELETE FROM entradas")
+			self._conexao.commit()
+
+	def estatisticas(self):
+		"""
+		Hits, misses e taxa de acerto por tipo, desde o início do processo.
+		"""
+		tipos = set(self.hits) | set(self.misses)
+		stats = {}
+		for tipo in sorted(tipos):
+			hits, misses = self.hits.get(tipo, 0), self.misses.get(tipo, 0)
+			stats[tipo] = {
+				"hits": hits,
+				"misses": misses,
+				"taxa_acerto": round(hits / (hits + misses), 3) if hits + misses else 0.0
+			}
+		return stats
+
+class CacheMemoria:
+	"""
+	Cache em memória compartilhado entre sessões (ex.: usuários do Streamlit).
+
+	Entradas expiram após `ttl` segundos e, ao passar de `max_bytes` (tamanho
+	estimado pela serialização em JSON), as menos usadas recentemente saem primeiro.
+	`obter_ou_calcular` faz chamadas simultâneas para a mesma chave esperarem
+	pelo primeiro cálculo em vez de repeti-lo.
+	"""
+
+	def __init__(self, max_bytes, ttl):
+		self.max_bytes = max_bytes
+		self.ttl = ttl
+		self.bytes = 0
+		self.hits = 0
+		self.misses = 0
+		self._entradas = OrderedDict()  # chave -> (valor, tamanho, expira_em)
+		self._lock = threading.Lock()
+		self._calculando = {}
+
+	def obter(self, chave):
+		with self._lock:
+			entrada = self._entradas.get(chave)
+			if entrada is None or entrada[2] < time.time():
+				if entrada is not None:
+					self._remover(chave)
+				self.misses += 1
+				return None
+			self._entradas.move_to_end(chave)
+			self.hits += 1
+			return entrada[0]
+
+	def gravar(self, chave, valor, ttl=None):
+		"""
+		Armazena o valor por `ttl` segundos (padrão: o do cache). Não guarda
+		com `ttl` zero ou negativo, nem valores maiores que o limite inteiro.
+		"""
+		ttl = self.ttl if ttl is None else ttl
+		if ttl <= 0:
+			return
+		tamanho = len(json.dumps(valor, ensure_ascii=False, default=str).encode("utf-8"))
+		if tamanho > self.max_bytes:
+			return
+		with self._lock:
+			if chave in self._entradas:
+				self._remover(chave)
+			self._entradas[chave] = (valor, tamanho, time.time() + ttl)
+			self.bytes += tamanho
+			while self.bytes > self.max_bytes:
+				self._remover(next(iter(self._entradas)))
+
+	def obter_ou_calcular(self, chave, calcular, ttl=None, guardar=None):
+		"""
+		Valor em cache ou o resultado de `calcular()`, guardado por `ttl`
+		segundos (padrão: o do cache). None não é armazenado, nem valores
+		para os quais `guardar(valor)` retornar False.
+		Retorna (valor, veio_do_cache).
+		"""
+		valor = self.obter(chave)
+		if valor is not None:
+			return valor, True
+
+		with self._lock:
+			lock_chave = self._calculando.setdefault(chave, threading.Lock())
+
+		with lock_chave:
+			# Outra sessão pode ter calculado enquanto esperávamos
+			with self._lock:
+				entrada = self._entradas.get(chave)
+				if entrada is not None and entrada[2] >= time.time():
+					return entrada[0], True
+			try:
+				valor = calcular()
+				if valor is not None and (guardar is None or guardar(valor)):
+					self.gravar(chave, valor, ttl=ttl)
+				return valor, False
+			finally:
+				with self._lock:
+					self._calculando.pop(chave, None)
+
+	def _remover(self, chave):
+		_, tamanho, _ = self._entradas.pop(chave)
+		self.bytes -= tamanho
+
+	def estatisticas(self):
+		with self._lock:
+			total = self.hits + self.misses
+			return {
+				"entradas": len(self._entradas),
+				"bytes": self.bytes,
+				"max_bytes": self.max_bytes,
+				"hits": self.hits,
+				"misses": self.misses,
+				"taxa_acerto": round(self.hits / total, 3) if total else 0.0
+			}
+
+def chave_llm(modelo, prompt, parametros=None):
+	"""
+	Chave determinística para uma chamada de LLM: modelo + hash do prompt + parâmetros.
+	"""
+	parametros = json.dumps(parametros or {}, sort_keys=True)
+	hash_prompt = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+	return f"{modelo}:{hash_prompt}:{hashlib.sha256(parametros.encode('utf-8')).hexdigest()[:16]}"
+
+_cache = None
+_lock_cache = threading.Lock()
+
+def obter_cache():
+	"""
+	Cache em disco compartilhado pelo processo.
+	"""
+	global _cache
+	if _cache is None:
+		with _lock_cache:
+			if _cache is None:
+				_cache = CacheDisco(
+					os.path.join(Config.CACHE_DIR, "cache.sqlite3"),
+					max_entradas=Config.CACHE_MAX_ENTRADAS,
+					ttls=Config.CACHE_TTL
+				)
+	return _cache
+
+def ler_llm(tipo, modelo, prompt, parametros):
+	"""
+	Resposta em cache para (modelo, prompt, parâmetros), ou None.
+	"""
+	if not Config.CACHE_ATIVO:
+		return None
+	try:
+		return obter_cache().obter(tipo, chave_llm(modelo, prompt, parametros))
+	except sqlite3.Error as e:
+		print(f"[ERRO] Cache indisponível: {e}")
+		return None
+
+def gravar_llm(tipo, modelo, prompt, parametros, valor):
+	"""
+	Armazena a resposta de uma chamada de LLM (valores None são ignorados).
+	"""
+	if not Config.CACHE_ATIVO or valor is None:
+		return
+	try:
+		obter_cache().gravar(tipo, chave_llm(modelo, prompt, parametros), valor)
+	except sqlite3.Error as e:
+		print(f"[ERRO] Não foi possível gravar no cache: {e}")
+
+def memoizar_llm(tipo, modelo, prompt, parametros, calcular, guardar=None):
+	"""
+	Devolve a resposta em cache para (modelo, prompt, parâmetros) ou chama `calcular()`.
+	Respostas vazias (None) não são armazenadas, para que falhas não fiquem em cache;
+	com `guardar(valor)`, só as que ele aprovar.
+	"""
+	from modules.metricas import span
+
+	with span(f"llm.{tipo}", modelo=modelo) as s:
+		valor = ler_llm(tipo, modelo, prompt, parametros)
+		if valor is not None:
+			s.anotar(cache="hit")
+			return valor
+
+		s.anotar(cache="miss")
+		valor = calcular()
+		if guardar is None or guardar(valor):
+			gravar_llm(tipo, modelo, prompt, parametros, valor)
+		return valor
+
+def ler_relatorio_pronto(simbolo):
+	"""
+	Relatório completo (relatório + dados coletados) ainda válido para o ticker, ou None.
+	"""
+	if not Config.CACHE_ATIVO:
+		return None
+	try:
+		return obter_cache().obter("relatorio_pronto", simbolo)
+	except sqlite3.Error as e:
+		print(f"[ERRO] Cache indisponível: {e}")
+		return None
+
+def relatorio_completo(dados_finais=None, dados_coletados=None):
+	"""
+	True se o relatório e/ou a coleta podem ir para um cache compartilhado:
+	nenhuma etapa faltando e cotação que não seja a de contingência.
+	"""
+	if (dados_finais or {}).get("faltando") or (dados_coletados or {}).get("faltando"):
+		return False
+	return ((dados_coletados or {}).get("cotacao") or {}).get("origem") != "contingencia"
+
+def gravar_relatorio_pronto(simbolo, relatorio):
+	"""
+	Guarda o relatório completo enquanto a cotação usada nele for válida.
+	Relatórios parciais ou montados com a cotação de contingência não são guardados.
+	"""
+	if not Config.CACHE_ATIVO:
+		return
+	if not relatorio_completo(relatorio.get("dados_finais"), relatorio.get("dados_coletados")):
+		return
+	from modules.cotacao import ttl_cotacao
+	try:
+		obter_cache().gravar("relatorio_pronto", simbolo, relatorio, ttl=ttl_cotacao())
+	except sqlite3.Error as e:
+		print(f"[ERRO] Não foi possível gravar no cache: {e}")
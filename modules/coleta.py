@@ -0,0 +1,89 @@
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as TempoEsgotado, as_completed
+from config import Config
+from modules.infos import obter_resumo_empresa
+from modules.cotacao import obter_cotacao_atual
+from modules.ingestao import atualizar_se_necessario, obter_armazem
+from modules.noticia import buscar_noticias_rss
+from modules.metricas import span, no_contexto
+from modules.prazo import com_prazo, prazo_atual, restante
+
+def coletar_dados(entidade, ao_concluir=None, noticias=None):
+	"""
+	Coleta informações, cotação e notícias da empresa em paralelo.
+
+	Recebe a entidade já resolvida (ver `modules.entidade`), de modo que
+	nenhuma etapa volta a consultar o ticker. A atualização da base de
+	notícias (só quando desatualizada) roda junto com as demais etapas e
+	só a busca das notícias espera por ela.
+	`ao_concluir(etapa, resultado)` é chamado na thread de quem chamou,
+	na ordem em que cada etapa termina.
+	Dentro de um prazo (ver `modules.prazo`), as etapas que não terminarem
+	a tempo ficam em `dados_coletados["faltando"]`.
+	`noticias` já filtradas (ex.: no lote, por bloco de empresas) dispensam a busca.
+	"""
+	dados_coletados = {
+		"empresa": entidade.nome,
+		"info": {},
+		"cotacao": {},
+		"noticias": []
+	}
+
+	# Com prazo, a coleta fica com uma fração do que resta; o resto é do relatório
+	externo = prazo_atual()
+	prazo_coleta = externo.restante() * Config.PRAZO_FRACAO_COLETA if externo else 0
+
+	executor = ThreadPoolExecutor(max_workers=Config.COLETA_MAX_WORKERS)
+	with span("coleta", simbolo=entidade.simbolo) as s, com_prazo(prazo_coleta):
+		futuro_base = executor.submit(no_contexto(atualizar_se_necessario))
+
+		def buscar_noticias():
+			if noticias is not None:
+				return noticias
+			# Sem tempo para esperar a atualização, busca na base como está
+			# (a busca recebe a base para não tentar atualizá-la de novo)
+			try:
+				armazem = futuro_base.result(timeout=restante())
+			except TempoEsgotado:
+				armazem = obter_armazem()
+			return buscar_noticias_rss(entidade.simbolo, entidade=entidade, armazem=armazem)
+
+		futuros = {
+			executor.submit(no_contexto(obter_resumo_empresa), entidade.nome, entidade): "info",
+			executor.submit(no_contexto(obter_cotacao_atual), entidade.nome, entidade=entidade): "cotacao",
+			executor.submit(no_contexto(buscar_noticias)): "noticias"
+		}
+
+		try:
+			for futuro in as_completed(futuros, timeout=restante()):
+				etapa = futuros[futuro]
+				try:
+					resultado = futuro.result()
+				except Exception as e:
+					resultado = {
+						"status": "erro",
+						"mensagem": f"Erro na etapa {etapa}: {str(e)}"
+					}
+
+				if etapa == "info" and resultado.get("status") == "sucesso":
+					dados_coletados["info"] = resultado["dados"]
+				elif etapa == "cotacao" and resultado.get("status") == "sucesso":
+					dados_coletados["cotacao"] = resultado
+				elif etapa == "noticias" and isinstance(resultado, list):
+					dados_coletados["noticias"] = resultado
+
+				if ao_concluir:
+					ao_concluir(etapa, resultado)
+
+		except TempoEsgotado:
+			# Prazo esgotado: o relatório segue com o que chegou
+			faltando = [etapa for futuro, etapa in futuros.items() if not futuro.done()]
+			dados_coletados["faltando"] = faltando
+			s.anotar(faltando=faltando)
+			s.falhar("PrazoEsgotado")
+			for etapa in faltando:
+				if ao_concluir:
+					ao_concluir(etapa, {"status": "erro", "mensagem": f"Tempo esgotado na etapa {etapa}"})
+
+	# Etapas atrasadas terminam em segundo plano, sem segurar o relatório
+	executor.shutdown(wait=False)
+	return dados_coletados
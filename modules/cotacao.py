@@ -1,12 +1,24 @@
-import yfinance as yf
+import sqlite3
+import time
 from datetime import datetime
+from config import Config
+from modules.cache import obter_cache
+from modules.disjuntor import protegido
 from modules.infos import encontrar_ticker
+from modules.metricas import anotar, instrumentar, span
+from modules.pregao import logo_apos_fechamento, mercado_aberto, segundos_ate_abertura
 
-def obter_cotacao_atual(nome_empresa, ticker=""):
+@instrumentar("cotacao")
+def obter_cotacao_atual(nome_empresa, ticker="", entidade=None):
 	"""
-	Obtém a cotação atual da empresa
+	Obtém a cotação atual da empresa.
+	A cotação vem do cache quando ainda é válida para o estado do pregão;
+	`origem` e `defasagem_segundos` indicam de onde veio e há quanto tempo.
 	"""
 	try:
+		if entidade:
+			ticker = entidade.simbolo
+
 		if not ticker:
 			ticker = encontrar_ticker(nome_empresa)
 		
@@ -19,29 +31,38 @@ def obter_cotacao_atual(nome_empresa, ticker=""):
 			# Adiciona .SA para empresas brasileiras
 			ticker = ticker + ".SA"
 
-		empresa = yf.Ticker(ticker)
-			
-		# Obtém dados históricos recentes
-		hist = empresa.history(period="1d")
-		
-		if hist.empty:
+		cotacao = _cotacao_em_cache(ticker)
+		if cotacao:
+			return cotacao
+
+		try:
+			with span("yahoo.historico", simbolo=ticker, fonte=Config.YAHOO_FONTE):
+				dia = protegido("yahoo", _historico_dia, ticker)
+		except Exception as e:
+			# Yahoo fora do ar (ou disjuntor aberto): última cotação conhecida
+			return _ultima_cotacao(ticker) or {
+				"status": "erro",
+				"mensagem": f"Erro ao buscar cotação: {str(e)}"
+			}
+
+		if dia is None:
 			return {
 				"status": "erro",
 				"mensagem": f"Dados não disponíveis para {ticker}"
 			}
 		
 		# Informações da cotação
-		ultima_cotacao = hist['Close'].iloc[-1]
-		abertura = hist['Open'].iloc[-1]
-		maxima = hist['High'].iloc[-1]
-		minima = hist['Low'].iloc[-1]
-		volume = hist['Volume'].iloc[-1]
+		ultima_cotacao = dia['fechamento']
+		abertura = dia['abertura']
+		maxima = dia['maxima']
+		minima = dia['minima']
+		volume = dia['volume']
 		
 		# Calcula variação
 		variacao = ultima_cotacao - abertura
 		variacao_percentual = (variacao / abertura) * 100 if abertura != 0 else 0
 		
-		return {
+		return _guardar_cotacao({
 			"status": "sucesso",
 			"ticker": ticker,
 			"preco_atual": round(ultima_cotacao, 2),
@@ -53,10 +74,219 @@ def obter_cotacao_atual(nome_empresa, ticker=""):
 			"variacao_percentual": round(variacao_percentual, 2),
 			"moeda": "BRL",
 			"data_consulta": datetime.now().strftime("%d/%m/%Y %H:%M")
-		}
+		})
 		
 	except Exception as e:
 		return {
 			"status": "erro",
 			"mensagem": f"Erro ao buscar cotação: {str(e)}"
-		}
\ No newline at end of file
+		}
+
+@instrumentar("cotacao_lote")
+def obter_cotacoes_em_lote(tickers):
+	"""
+	Obtém a cotação atual de vários tickers com um único download.
+	Retorna {ticker: cotação}, cada uma no mesmo formato de `obter_cotacao_atual`.
+	"""
+	simbolos = list(dict.fromkeys(t if t.upper().endswith(".SA") else t + ".SA" for t in tickers))
+
+	# Só baixa o que não estiver válido no cache
+	cotacoes = {}
+	for simbolo in simbolos:
+		cotacao = _cotacao_em_cache(simbolo)
+		if cotacao:
+			cotacoes[simbolo] = cotacao
+	simbolos = [s for s in simbolos if s not in cotacoes]
+	if not simbolos:
+		return cotacoes
+
+	import numpy as np
+	import pandas as pd
+	import yfinance as yf
+
+	try:
+		with span("yahoo.download", simbolos=len(simbolos)):
+			hist = protegido(
+				"yahoo", yf.download, simbolos, period="1d", group_by="column",
+				auto_adjust=False, progress=False, threads=True
+			)
+	except Exception as e:
+		cotacoes.update({
+			s: _ultima_cotacao(s) or {"status": "erro", "mensagem": f"Erro ao buscar cotação: {str(e)}"}
+			for s in simbolos
+		})
+		return cotacoes
+
+	if hist.empty:
+		cotacoes.update({s: {"status": "erro", "mensagem": f"Dados não disponíveis para {s}"} for s in simbolos})
+		return cotacoes
+
+	# Versões antigas do yfinance não usam MultiIndex para um único ticker
+	if not isinstance(hist.columns, pd.MultiIndex):
+		hist.columns = pd.MultiIndex.from_product([hist.columns, simbolos])
+
+	# Última linha válida de cada ticker: linhas = campos, colunas = tickers
+	ultimo = hist.ffill().iloc[-1].unstack(level=0).reindex(simbolos)
+
+	# Cálculos vetorizados para todos os tickers de uma vez
+	abertura = ultimo["Open"]
+	fechamento = ultimo["Close"]
+	variacao = fechamento - abertura
+	variacao_percentual = (variacao / abertura.replace(0, np.nan) * 100).fillna(0.0)
+
+	tabela = pd.DataFrame({
+		"preco_atual": fechamento,
+		"abertura": abertura,
+		"maxima": ultimo["High"],
+		"minima": ultimo["Low"],
+		"variacao": variacao,
+		"variacao_percentual": variacao_percentual
+	}).round(2)
+	volumes = ultimo["Volume"].fillna(0).astype("int64")
+
+	data_consulta = datetime.now().strftime("%d/%m/%Y %H:%M")
+	for simbolo, linha in tabela.iterrows():
+		if pd.isna(linha["preco_atual"]):
+			cotacoes[simbolo] = {
+				"status": "erro",
+				"mensagem": f"Dados não disponíveis para {simbolo}"
+			}
+			continue
+
+		cotacoes[simbolo] = _guardar_cotacao({
+			"status": "sucesso",
+			"ticker": simbolo,
+			"preco_atual": float(linha["preco_atual"]),
+			"abertura": float(linha["abertura"]),
+			"maxima": float(linha["maxima"]),
+			"minima": float(linha["minima"]),
+			"volume": int(volumes[simbolo]),
+			"variacao": float(linha["variacao"]),
+			"variacao_percentual": float(linha["variacao_percentual"]),
+			"moeda": "BRL",
+			"data_consulta": data_consulta
+		})
+
+	return cotacoes
+
+
+def _historico_dia(simbolo):
+	"""
+	Último pregão do símbolo (abertura, maxima, minima, fechamento, volume), ou None.
+	Só os dias recentes são baixados na hora; o histórico completo, se
+	faltar, é baixado em segundo plano.
+	"""
+	from modules.historico import obter_armazem
+	return obter_armazem().ultima_barra_recente(simbolo)
+
+@instrumentar("historico")
+def obter_historico(ticker, inicio=None, fim=None, entidade=None):
+	"""
+	Histórico diário (OHLCV) do ticker entre `inicio` e `fim` (date ou
+	"AAAA-MM-DD", inclusive), lido do histórico local. Só consulta o Yahoo
+	para acrescentar as barras que faltam, e se ele falhar, serve o que
+	já estiver gravado. `dados` traz uma np.ndarray por coluna.
+	"""
+	simbolo = entidade.simbolo if entidade else (ticker if ticker.upper().endswith(".SA") else ticker + ".SA")
+
+	from modules.historico import obter_armazem
+	armazem = obter_armazem()
+	try:
+		if not armazem.em_dia(simbolo):
+			with span("yahoo.historico", simbolo=simbolo, fonte=Config.YAHOO_FONTE):
+				protegido("yahoo", armazem.sincronizar, simbolo)
+	except Exception as e:
+		if not armazem.linhas(simbolo):
+			return {
+				"status": "erro",
+				"mensagem": f"Erro ao buscar histórico: {str(e)}"
+			}
+		print(f"[AVISO] Histórico de {simbolo} não atualizado ({e}), usando o local")
+
+	dados = armazem.ler(simbolo, inicio, fim)
+	anotar(barras=len(dados["data"]))
+	if not len(dados["data"]):
+		return {
+			"status": "erro",
+			"mensagem": f"Histórico não disponível para {simbolo} no período"
+		}
+	return {"status": "sucesso", "ticker": simbolo, "dados": dados}
+
+def obter_historicos(tickers, inicio=None, fim=None):
+	"""
+	Histórico de vários tickers ({ticker: resultado de `obter_historico`}).
+	Os que estão em dia são lidos direto do disco; os demais são
+	sincronizados em paralelo, dentro do limite de chamadas ao Yahoo.
+	"""
+	from concurrent.futures import ThreadPoolExecutor
+	from modules.historico import obter_armazem
+	from modules.metricas import no_contexto
+
+	simbolos = list(dict.fromkeys(t if t.upper().endswith(".SA") else t + ".SA" for t in tickers))
+	armazem = obter_armazem()
+	pendentes = [s for s in simbolos if not armazem.em_dia(s)]
+	historicos = {}
+	if pendentes:
+		with ThreadPoolExecutor(max_workers=min(len(pendentes), Config.YAHOO_CONCORRENCIA or 8)) as executor:
+			futuros = {s: executor.submit(no_contexto(obter_historico), s, inicio, fim) for s in pendentes}
+		historicos.update({s: f.result() for s, f in futuros.items()})
+
+	return {s: historicos.get(s) or obter_historico(s, inicio, fim) for s in simbolos}
+
+def ttl_cotacao():
+	"""
+	Validade de uma cotação recém-obtida: poucos segundos durante o pregão
+	e logo após o fechamento (leilão e atraso do Yahoo); fora dele (noite,
+	fim de semana, feriado), até a próxima abertura.
+	"""
+	if mercado_aberto() or logo_apos_fechamento():
+		return Config.COTACAO_TTL_PREGAO
+	return max(segundos_ate_abertura(), Config.COTACAO_TTL_PREGAO)
+
+def _cotacao_em_cache(simbolo):
+	if not Config.CACHE_ATIVO:
+		return None
+	try:
+		entrada = obter_cache().obter_entrada("cotacao", simbolo)
+	except sqlite3.Error as e:
+		print(f"[ERRO] Cache indisponível: {e}")
+		return None
+	if not entrada:
+		anotar(cache="miss")
+		return None
+
+	anotar(cache="hit")
+	cotacao, criado_em = entrada
+	cotacao["origem"] = "cache"
+	cotacao["defasagem_segundos"] = round(time.time() - criado_em, 1)
+	return cotacao
+
+def _ultima_cotacao(simbolo):
+	# Última cotação obtida (mesmo vencida), para quando o Yahoo não responde
+	if not Config.CACHE_ATIVO:
+		return None
+	try:
+		entrada = obter_cache().obter_entrada("cotacao_ultima", simbolo)
+	except sqlite3.Error as e:
+		print(f"[ERRO] Cache indisponível: {e}")
+		return None
+	if not entrada:
+		return None
+
+	anotar(contingencia=True)
+	cotacao, criado_em = entrada
+	cotacao["origem"] = "contingencia"
+	cotacao["defasagem_segundos"] = round(time.time() - criado_em, 1)
+	return cotacao
+
+def _guardar_cotacao(cotacao):
+	if Config.CACHE_ATIVO:
+		try:
+			obter_cache().gravar("cotacao", cotacao["ticker"], cotacao, ttl=ttl_cotacao())
+			obter_cache().gravar("cotacao_ultima", cotacao["ticker"], cotacao)
+		except sqlite3.Error as e:
+			print(f"[ERRO] Não foi possível gravar no cache: {e}")
+
+	cotacao["origem"] = "yahoo"
+	cotacao["defasagem_segundos"] = 0.0
+	return cotacao
@@ -0,0 +1,139 @@
+import threading
+import time
+from config import Config
+from modules.metricas import anotar
+
+FECHADO = "fechado"
+ABERTO = "aberto"
+MEIO_ABERTO = "meio_aberto"
+
+class DisjuntorAberto(Exception):
+	"""
+	Chamada recusada na hora: o serviço falhou seguidamente e ainda não
+	passou o tempo da próxima sondagem.
+	"""
+
+	def __init__(self, nome, restante):
+		super().__init__(f"{nome} indisponível (nova tentativa em {restante:.0f}s)")
+		self.nome = nome
+		self.restante = restante
+
+class Disjuntor:
+	"""
+	Disjuntor de um serviço externo (Groq, Gemini, Yahoo, cada feed RSS).
+
+	Abre após `falhas` falhas seguidas (erros de conexão, timeouts, 5xx) e,
+	enquanto aberto, recusa as chamadas sem esperar pelo serviço. Passado
+	`tempo_aberto`, deixa passar uma única chamada de sondagem: se ela
+	funcionar o disjuntor fecha, senão volta a abrir.
+	"""
+
+	def __init__(self, nome, falhas=None, tempo_aberto=None):
+		self.nome = nome
+		self.limite_falhas = falhas or Config.DISJUNTOR_FALHAS
+		self.tempo_aberto = tempo_aberto or Config.DISJUNTOR_TEMPO_ABERTO
+		self.estado = FECHADO
+		self.falhas = 0
+		self.aberto_ate = 0.0
+		self._lock = threading.Lock()
+
+	def verificar(self):
+		"""
+		Levanta DisjuntorAberto se a chamada não deve ser feita agora.
+		"""
+		with self._lock:
+			if self.estado == FECHADO:
+				return
+			agora = time.monotonic()
+			if agora >= self.aberto_ate:
+				# Esta chamada é a sondagem; as demais continuam recusadas até
+				# ela terminar (ou até outro `tempo_aberto`, se ela se perder)
+				self.estado = MEIO_ABERTO
+				self.aberto_ate = agora + self.tempo_aberto
+				anotar(disjuntor="sondagem")
+				return
+			restante = max(0.0, self.aberto_ate - agora)
+
+		anotar(disjuntor=ABERTO)
+		raise DisjuntorAberto(self.nome, restante)
+
+	def sucesso(self):
+		with self._lock:
+			if self.estado != FECHADO:
+				print(f"[INFO] {self.nome} respondeu de novo, disjuntor fechado")
+			self.estado = FECHADO
+			self.falhas = 0
+
+	def falha(self):
+		with self._lock:
+			self.falhas += 1
+			if self.estado == MEIO_ABERTO or self.falhas >= self.limite_falhas:
+				if self.estado != ABERTO:
+					print(f"[AVISO] {self.nome} falhou {self.falhas}x, disjuntor aberto por {self.tempo_aberto:.0f}s")
+				self.estado = ABERTO
+				self.aberto_ate = time.monotonic() + self.tempo_aberto
+
+def conta_como_falha(excecao):
+	"""
+	Erros que indicam serviço fora do ar. Respostas 4xx (exceto 408) mostram
+	que o serviço responde; 429 fica com o limitador de taxa.
+	"""
+	from modules.limites import classificar_erro
+
+	_, codigo, _ = classificar_erro(excecao)
+	return not (codigo and 400 <= codigo < 500 and codigo != 408)
+
+def registrar_erro(disjuntor, excecao):
+	"""
+	Conta o erro de uma chamada no disjuntor: falha se o serviço parece
+	fora do ar, sucesso se ele respondeu (4xx). Se o prazo do relatório
+	cortou a chamada, não se sabe nada do serviço e nada é registrado
+	(um sucesso zeraria as falhas de um serviço travado).
+	"""
+	from modules.prazo import PrazoEsgotado, prazo_esgotado
+
+	if isinstance(excecao, PrazoEsgotado) or prazo_esgotado():
+		return
+	if conta_como_falha(excecao):
+		disjuntor.falha()
+	else:
+		disjuntor.sucesso()
+
+_disjuntores = {}
+_lock = threading.Lock()
+
+def obter_disjuntor(nome):
+	"""
+	Disjuntor do serviço ("groq", "gemini", "yahoo", "rss:<fonte>"), compartilhado pelo processo.
+	"""
+	with _lock:
+		if nome not in _disjuntores:
+			_disjuntores[nome] = Disjuntor(nome)
+		return _disjuntores[nome]
+
+def protegido(nome, funcao, *args, **kwargs):
+	"""
+	Executa `funcao` sob o disjuntor `nome`: recusa na hora (DisjuntorAberto)
+	se ele estiver aberto e registra o sucesso ou a falha da chamada.
+	A chamada ocupa uma das vagas do serviço ("rss" para todos os feeds).
+	"""
+	from modules.limites import obter_vagas
+
+	disjuntor = obter_disjuntor(nome)
+	with obter_vagas(nome.split(":")[0]).ocupar():
+		disjuntor.verificar()
+		try:
+			resultado = funcao(*args, **kwargs)
+		except Exception as e:
+			registrar_erro(disjuntor, e)
+			raise
+	disjuntor.sucesso()
+	return resultado
+
+def estados_disjuntores():
+	"""
+	{nome: estado} de todos os disjuntores já usados.
+	"""
+	with _lock:
+		disjuntores = list(_disjuntores.values())
+	return {d.nome: d.estado for d in disjuntores}
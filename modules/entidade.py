@@ -0,0 +1,30 @@
+from dataclasses import dataclass
+from modules.infos import encontrar_ticker
+from modules.metricas import span
+
+@dataclass
+class EntidadeEmpresa:
+	"""
+	Empresa já resolvida, compartilhada por todas as etapas de um relatório.
+	"""
+	nome: str
+	ticker: str
+	simbolo: str
+	nome_oficial: str = ""
+
+def resolver_entidade(nome_empresa):
+	"""
+	Resolve nome, ticker e símbolo (.SA) da empresa uma única vez.
+	O nome oficial é preenchido depois, quando as informações chegam.
+	"""
+	nome_empresa = nome_empresa.strip()
+	with span("ticker", empresa=nome_empresa) as s:
+		ticker = encontrar_ticker(nome_empresa)
+		s.anotar(ticker=ticker)
+
+	return EntidadeEmpresa(
+		nome=nome_empresa,
+		ticker=ticker,
+		simbolo=ticker + ".SA",
+		nome_oficial=nome_empresa
+	)
@@ -0,0 +1,92 @@
+import json
+from typing import List, Optional
+from pydantic import BaseModel, Field, TypeAdapter, ValidationError
+from utils.json_incremental import ParserJsonIncremental
+
+class ResumoEmpresa(BaseModel):
+	setor: str = Field("", description="Setor de atuação")
+	descricao: str = Field("", description="Descrição da empresa em até 5 frases")
+	principais_produtos: List[str] = Field(default_factory=list, description="Principais produtos ou serviços")
+
+class NoticiaRelatorio(BaseModel):
+	titulo: str
+	fonte: str = ""
+	resumo: str = Field("", description="Resumo de uma frase sobre o impacto na empresa")
+	link: str = ""
+
+class AcaoRelatorio(BaseModel):
+	preco_atual: Optional[float] = Field(None, description="Preço atual em R$")
+	variacao: Optional[float] = Field(None, description="Variação percentual do dia")
+	volume: Optional[int] = Field(None, description="Volume negociado")
+
+class RelatorioEmpresa(BaseModel):
+	"""
+	Estrutura do relatório gerado pelo Gemini.
+	"""
+	nome_oficial: str
+	ticker: str
+	resumo: ResumoEmpresa
+	noticias: List[NoticiaRelatorio] = Field(default_factory=list)
+	acao: AcaoRelatorio
+	analise_rapida: str = Field("", description="Análise rápida para Investment Banking")
+
+SECOES = list(RelatorioEmpresa.model_fields)
+
+_validadores = {
+	secao: TypeAdapter(campo.annotation)
+	for secao, campo in RelatorioEmpresa.model_fields.items()
+}
+
+def esquema_json(secoes=None):
+	"""
+	JSON Schema do relatório, opcionalmente restrito a algumas seções.
+	"""
+	esquema = RelatorioEmpresa.model_json_schema()
+	if secoes:
+		esquema["properties"] = {s: v for s, v in esquema["properties"].items() if s in secoes}
+		esquema["required"] = [s for s in esquema.get("required", []) if s in secoes]
+		usados = json.dumps(esquema["properties"])
+		esquema["$defs"] = {
+			nome: d for nome, d in esquema.get("$defs", {}).items()
+			if f"#/$defs/{nome}" in usados
+		}
+	return esquema
+
+def validar_secao(secao, valor):
+	"""
+	Valida uma seção do relatório contra o esquema.
+	Retorna o valor normalizado (tipos nativos) ou None se for inválido.
+	"""
+	validador = _validadores.get(secao)
+	if validador is None:
+		return None
+	try:
+		return validador.dump_python(validador.validate_python(valor), mode="json")
+	except ValidationError:
+		return None
+
+def reparar_relatorio(texto):
+	"""
+	Aproveita as seções válidas de uma resposta JSON malformada ou truncada.
+	Retorna o dicionário com as seções recuperadas, ou None se nenhuma for válida.
+	"""
+	texto = texto.replace("```json", "").replace("```", "").strip()
+
+	try:
+		bruto = json.loads(texto)
+	except json.JSONDecodeError:
+		parser = ParserJsonIncremental()
+		parser.alimentar(texto)
+		bruto = parser.campos
+
+	if not isinstance(bruto, dict):
+		return None
+
+	relatorio = {}
+	for secao in SECOES:
+		if secao in bruto:
+			valor = validar_secao(secao, bruto[secao])
+			if valor is not None:
+				relatorio[secao] = valor
+
+	return relatorio or None
@@ -0,0 +1,127 @@
+import calendar
+import threading
+import time
+from datetime import datetime
+from config import Config
+from modules.disjuntor import protegido
+from modules.metricas import span
+from modules.prazo import limitar_timeout
+
+class LeitorFeeds:
+	"""
+	Leitor dos feeds RSS de `Config.RSS_FEEDS` com GET condicional
+	(ETag / Last-Modified) e cache das entradas já processadas.
+
+	Relatórios simultâneos compartilham o mesmo download: só uma thread
+	por feed consulta o site quando o cache expira; as demais aguardam.
+	"""
+
+	def __init__(self, feeds=None, ttl=None, timeout=None):
+		self.feeds = feeds or Config.RSS_FEEDS
+		self.ttl = ttl if ttl is not None else Config.RSS_CACHE_TTL
+		self.timeout = timeout if timeout is not None else Config.RSS_TIMEOUT
+		import requests  # importado sob demanda (início rápido da CLI)
+		self.session = requests.Session()
+		self._estado = {fonte: {"entradas": [], "atualizado_em": 0.0} for fonte in self.feeds}
+		self._locks = {fonte: threading.Lock() for fonte in self.feeds}
+
+	def obter_entradas(self, fonte):
+		"""
+		Entradas do feed (titulo, link, fonte, data), do cache se ainda válidas.
+		"""
+		estado = self._estado[fonte]
+		if time.time() - estado["atualizado_em"] < self.ttl:
+			return estado["entradas"]
+
+		with self._locks[fonte]:
+			# Outra thread pode ter atualizado enquanto esperávamos
+			if time.time() - estado["atualizado_em"] < self.ttl:
+				return estado["entradas"]
+			try:
+				protegido(f"rss:{fonte}", self._atualizar, fonte, estado)
+			except Exception as e:
+				# Sem conteúdo anterior não há o que servir; com ele, serve o último válido
+				if not estado["entradas"]:
+					raise
+				print(f"[ERRO] Falha ao atualizar {fonte}, usando última versão: {e}")
+
+		return estado["entradas"]
+
+	def obter_todas(self):
+		"""
+		Entradas de todos os feeds, na ordem de `Config.RSS_FEEDS`.
+		"""
+		return self.ler_todas()[0]
+
+	def ler_todas(self):
+		"""
+		(entradas de todos os feeds, quantos feeds estão em dia). Um feed
+		que falhou, mesmo servindo a última versão, não conta como em dia.
+		"""
+		entradas, em_dia = [], 0
+		for fonte in self.feeds:
+			try:
+				entradas.extend(self.obter_entradas(fonte))
+			except Exception as e:
+				print(f"[ERRO] Não foi possível acessar {fonte}: {e}")
+			if time.time() - self._estado[fonte]["atualizado_em"] < self.ttl:
+				em_dia += 1
+		return entradas, em_dia
+
+	def _atualizar(self, fonte, estado):
+		cabecalhos = {}
+		if estado.get("etag"):
+			cabecalhos["If-None-Match"] = estado["etag"]
+		if estado.get("modificado"):
+			cabecalhos["If-Modified-Since"] = estado["modificado"]
+
+		with span("rss", fonte=fonte) as s:
+			response = self.session.get(self.feeds[fonte], headers=cabecalhos, timeout=limitar_timeout(self.timeout))
+			s.anotar(status_http=response.status_code, bytes_recebidos=len(response.content))
+
+			# 304: o conteúdo não mudou, basta renovar a validade do cache
+			if response.status_code == 304:
+				estado["atualizado_em"] = time.time()
+				s.anotar(cache="hit")
+				return
+
+			s.anotar(cache="miss")
+			response.raise_for_status()
+
+		with span("rss.parse", fonte=fonte) as s:
+			import feedparser
+			feed = feedparser.parse(response.content)
+			s.anotar(entradas=len(feed.entries))
+
+		estado["entradas"] = [
+			{
+				"titulo": entry.title,
+				"link": entry.link,
+				"fonte": fonte,
+				"data": getattr(entry, "published", datetime.now().strftime("%d/%m/%Y")),
+				"publicado_em": _timestamp(entry)
+			}
+			for entry in feed.entries
+		]
+		estado["etag"] = response.headers.get("ETag")
+		estado["modificado"] = response.headers.get("Last-Modified")
+		estado["atualizado_em"] = time.time()
+
+def _timestamp(entry):
+	# published_parsed vem em UTC; sem data, considera o momento da leitura
+	data = getattr(entry, "published_parsed", None) or getattr(entry, "updated_parsed", None)
+	return float(calendar.timegm(data)) if data else time.time()
+
+_leitor = None
+_lock = threading.Lock()
+
+def obter_leitor():
+	"""
+	Leitor de feeds compartilhado pelo processo.
+	"""
+	global _leitor
+	if _leitor is None:
+		with _lock:
+			if _leitor is None:
+				_leitor = LeitorFeeds()
+	return _leitor
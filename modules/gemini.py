@@ -1,94 +1,256 @@
-import json
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain_core.prompts import PromptTemplate
+import time
 from config import Config
+from modules.cache import memoizar_llm, ler_llm, gravar_llm
+from modules.disjuntor import obter_disjuntor
+from modules.esquema import SECOES, esquema_json, reparar_relatorio, validar_secao
+from modules.limites import executar_com_limite, obter_limitador, obter_vagas, registrar_falha
+from modules.metricas import registrar_medida, span
+from modules.tokens import compactar_noticias, estimar_tokens, registrar_tokens
+from utils.json_incremental import ParserJsonIncremental
+
+MODEL = "gemini-2.5-flash"
+TEMPERATURE = 0.3
 
 class GeminiProcessor:
     def __init__(self):
         if not Config.GOOGLE_API_KEY:
             raise ValueError("GOOGLE_API_KEY não encontrada. Configure no arquivo .env")
+
+        # LangChain/Gemini são pesados: importados só quando o processador é criado
+        from langchain_google_genai import ChatGoogleGenerativeAI
         
+        opcionais = {"base_url": Config.GEMINI_BASE_URL} if Config.GEMINI_BASE_URL else {}
         self.llm = ChatGoogleGenerativeAI(
-            model="gemini-2.5-flash",
+            model=MODEL,
             api_key=Config.GOOGLE_API_KEY,
-            temperature=0.3
+            temperature=TEMPERATURE,
+            max_retries=0,  # novas tentativas ficam com modules.limites (limite compartilhado)
+            **opcionais
         )
-    
-    def resumir_dados_com_json(self, empresa, dados_coletados):
-        try:
-            prompt = PromptTemplate(
-                input_variables=["empresa", "dados_coletados"],
-                template="""
-Você é um analista financeiro especializado em Investment Banking. 
-Forneça informações ATUALIZADAS sobre a empresa: {empresa}
 
-Use estas informações coletadas como referência:
-{dados_coletados}
+        self._llms_json = {}
 
-Retorne APENAS o seguinte JSON válido:
-
-{{
-    "nome_oficial": "",
-    "ticker": "",
-    "resumo": {{
-        "setor": "",
-        "descricao": "",
-        "principais_produtos": []
-    }},
-    "noticias": [
-        {{
-            "titulo": "",
-            "fonte": "",
-            "resumo": ""
-			"link": ""
-        }}
-    ],
-    "acao": {{
-        "preco_atual": "",
-        "variacao": "",
-        "volume": ""
-    }},
-    "analise_rapida": ""
-}}
-"""
+    def _llm_json(self, secoes=None):
+        # Saída estruturada nativa: o modelo responde JSON no formato do esquema.
+        # O bind (em vez de with_structured_output) mantém o streaming em texto,
+        # que o parser incremental consome seção a seção.
+        chave = tuple(secoes or ())
+        if chave not in self._llms_json:
+            self._llms_json[chave] = self.llm.bind(
+                response_mime_type="application/json",
+                response_json_schema=esquema_json(secoes)
             )
+        return self._llms_json[chave]
+    
+    def resumir_dados_com_json(self, empresa, dados_coletados, entidade=None, secoes=None):
+        """
+        Gera o relatório (ou só as `secoes` informadas) de uma vez.
+        """
+        try:
+            prompt_text, links = self._montar_prompt(empresa, dados_coletados, entidade, secoes)
 
-            # Renderiza o prompt
-            prompt_text = prompt.format(
-                empresa=empresa,
-                dados_coletados=self._formatar_dados(dados_coletados)
+            # Relatórios idênticos (mesmo prompt) são servidos do cache, se completos
+            return memoizar_llm(
+                "relatorio", MODEL, prompt_text, {"temperature": TEMPERATURE},
+                lambda: self._gerar_json(prompt_text, links, secoes),
+                guardar=lambda relatorio: self._completo(relatorio, secoes)
             )
 
-            # Chama o modelo (API NOVA)
-            response = self.llm.invoke(prompt_text)
+        except Exception as e:
+            print(f"Erro no Gemini: {str(e)}")
+            return None
+
+    def resumir_dados_em_stream(self, empresa, dados_coletados, entidade=None, secoes=None):
+        """
+        Gera o relatório em streaming: produz (seção, valor) para cada campo
+        do JSON (nome_oficial, resumo, noticias, ...) assim que ele fica completo.
+        Com `secoes`, só essas seções são pedidas ao modelo.
+        """
+        try:
+            prompt_text, links = self._montar_prompt(empresa, dados_coletados, entidade, secoes)
+            parametros = {"temperature": TEMPERATURE}
 
-            resultado = response.content.strip()
+            em_cache = ler_llm("relatorio", MODEL, prompt_text, parametros)
+            if em_cache is not None:
+                registrar_medida("gemini", 0.0, modo="stream", cache="hit")
+                yield from em_cache.items()
+                return
 
-            # Remove blocos markdown
-            resultado = resultado.replace("```json", "").replace("```", "").strip()
+            # Medido à mão: um `with span(...)` ficaria aberto entre os yields
+            inicio = time.perf_counter()
+            parser = ParserJsonIncremental()
+            texto = ""
+            validas = {}
+            uso = {}
+            tokens = self._tokens_reserva(prompt_text)
+            try:
+                for chunk in self._abrir_stream(prompt_text, secoes, tokens):
+                    pedaco = self._texto(chunk)
+                    texto += pedaco
+                    for chave, n in (chunk.usage_metadata or {}).items():
+                        if isinstance(n, int):
+                            uso[chave] = uso.get(chave, 0) + n
+                    for secao, valor in parser.alimentar(pedaco):
+                        if secoes and secao not in secoes:
+                            continue
+                        valor = validar_secao(secao, valor)
+                        if valor is not None:
+                            validas[secao] = valor = self._restaurar_links(secao, valor, links)
+                            yield secao, valor
+            except Exception as e:
+                registrar_medida(
+                    "gemini", time.perf_counter() - inicio, type(e).__name__,
+                    modo="stream", cache="miss", bytes_recebidos=len(texto.encode("utf-8"))
+                )
+                raise
+
+            registrar_medida(
+                "gemini", time.perf_counter() - inicio, None if parser.terminado else "resposta_incompleta",
+                modo="stream", cache="miss", secoes=len(validas),
+                bytes_enviados=len(prompt_text.encode("utf-8")), bytes_recebidos=len(texto.encode("utf-8"))
+            )
+            registrar_tokens("relatorio", prompt_text, texto, uso)
+            obter_limitador("gemini").ajustar(tokens, uso.get("total_tokens"))
 
-            # Converte para JSON
-            return json.loads(resultado)
+            if parser.terminado:
+                # Seções descartadas na validação não podem ficar faltando no cache
+                if self._completo(validas, secoes):
+                    gravar_llm("relatorio", MODEL, prompt_text, parametros, validas)
+                return
+
+            # Resposta truncada/malformada: aproveita o que ainda não foi emitido
+            for secao, valor in (reparar_relatorio(texto) or {}).items():
+                if secao not in validas and (not secoes or secao in secoes):
+                    yield secao, self._restaurar_links(secao, valor, links)
 
         except Exception as e:
             print(f"Erro no Gemini: {str(e)}")
-            return None
-    
-    def _formatar_dados(self, dados):
-        out = f"""
-1. INFORMAÇÕES BÁSICAS:
-- Nome: {dados.get('info', {}).get('nome', 'N/A')}
-- Setor: {dados.get('info', {}).get('setor', 'N/A')}
-- Indústria: {dados.get('info', {}).get('industria', 'N/A')}
-
-2. COTAÇÃO:
-- Ticker: {dados.get('cotacao', {}).get('ticker', 'N/A')}
-- Preço: R$ {dados.get('cotacao', {}).get('preco_atual', 0):.2f}
-- Variação: {dados.get('cotacao', {}).get('variacao_percentual', 0):.2f}%
-
-3. NOTÍCIAS:
+
+    def _montar_prompt(self, empresa, dados_coletados, entidade=None, secoes=None):
+        if entidade:
+            empresa = f"{entidade.nome_oficial} ({entidade.ticker})"
+
+        from langchain_core.prompts import PromptTemplate
+
+        prompt = PromptTemplate(
+            input_variables=["empresa", "dados_coletados"],
+            template="""
+Você é um analista financeiro especializado em Investment Banking.
+Gere o relatório da empresa {empresa} no formato JSON do esquema,
+usando estas informações coletadas como referência:
+{dados_coletados}
+Em "noticias", use só as notícias listadas acima e, em "link", o id entre colchetes (ex.: n1).
 """
-        for n in dados.get("noticias", []):
-            out += f"- {n.get('titulo', '')} ({n.get('fonte', '')})[{n.get('link', '')}]\n"
+        )
+
+        # Notícias vão com ids curtos no lugar dos links (devolvidos depois);
+        # ficam de fora quando nenhuma seção pedida depende delas
+        com_noticias = not secoes or "noticias" in secoes or "analise_rapida" in secoes
+        dados_formatados, links = self._formatar_dados(dados_coletados, entidade, com_noticias)
+
+        # Renderiza o prompt
+        prompt_text = prompt.format(empresa=empresa, dados_coletados=dados_formatados)
+        if secoes:
+            prompt_text += f"Gere somente as seções: {', '.join(secoes)}.\n"
+        return prompt_text, links
+
+    @staticmethod
+    def _completo(relatorio, secoes=None):
+        # Todas as seções pedidas (ou todas as do esquema) presentes e válidas
+        return bool(relatorio) and all(s in relatorio for s in (secoes or SECOES))
+
+    @staticmethod
+    def _tokens_reserva(prompt_text):
+        # Reserva no limitador antes da chamada, corrigida depois com o uso real
+        return estimar_tokens(prompt_text) + Config.LIMITE_TOKENS_RESPOSTA
+
+    def _abrir_stream(self, prompt_text, secoes, tokens):
+        # Só a abertura do stream é repetida (429/5xx antes do primeiro pedaço);
+        # depois dele, repetir duplicaria as seções já emitidas
+        def abrir():
+            iterador = iter(self._llm_json(secoes).stream(prompt_text))
+            return next(iterador, None), iterador
+
+        # A vaga do Gemini fica ocupada até o fim do stream, não só na abertura
+        with obter_vagas("gemini").ocupar():
+            # O sucesso só conta com o stream completo: um Gemini que abre e
+            # cai no meio não pode zerar as falhas do disjuntor
+            primeiro, iterador = executar_com_limite("gemini", abrir, tokens, registrar_sucesso=False)
+            try:
+                if primeiro is not None:
+                    yield primeiro
+                yield from iterador
+            except Exception as e:
+                # Falhas no meio do stream também contam no disjuntor e no limitador
+                registrar_falha("gemini", e)
+                raise
+            obter_disjuntor("gemini").sucesso()
+
+    @staticmethod
+    def _texto(chunk):
+        # O conteúdo do chunk pode vir como texto ou como lista de partes
+        conteudo = chunk.content
+        if isinstance(conteudo, list):
+            return "".join(p if isinstance(p, str) else p.get("text", "") for p in conteudo)
+        return conteudo or ""
+    
+    def _gerar_json(self, prompt_text, links=None, secoes=None):
+        with span("gemini", modo="invoke", bytes_enviados=len(prompt_text.encode("utf-8"))) as s:
+            tokens = self._tokens_reserva(prompt_text)
+            response = executar_com_limite("gemini", lambda: self._llm_json(secoes).invoke(prompt_text), tokens)
+            texto = self._texto(response)
+            s.anotar(bytes_recebidos=len(texto.encode("utf-8")))
+        registrar_tokens("relatorio", prompt_text, texto, response.usage_metadata)
+        obter_limitador("gemini").ajustar(tokens, (response.usage_metadata or {}).get("total_tokens"))
+
+        # Valida cada seção contra o esquema; seções inválidas são descartadas
+        # em vez de perder o relatório inteiro (None só se nada for aproveitável)
+        relatorio = reparar_relatorio(texto)
+        if relatorio and secoes:
+            relatorio = {s: v for s, v in relatorio.items() if s in secoes} or None
+        if relatorio is None:
+            print("[ERRO] Resposta do Gemini sem nenhuma seção válida")
+            return None
+
+        return {s: self._restaurar_links(s, v, links) for s, v in relatorio.items()}
+
+    @staticmethod
+    def _restaurar_links(secao, valor, links):
+        # Troca os ids curtos (n1, n2, ...) pelos links originais das notícias
+        if secao != "noticias" or not links:
+            return valor
+        for noticia in valor:
+            original = links.get(str(noticia.get("link", "")).strip("[] "))
+            if original:
+                noticia["link"] = original.get("link", "")
+        return valor
+
+    def _formatar_dados(self, dados, entidade=None, com_noticias=True):
+        """
+        Texto com os dados coletados, limitado ao orçamento de tokens do relatório.
+        Retorna (texto, {id curto: notícia}).
+        """
+        info = dados.get('info') or {}
+        cotacao = dados.get('cotacao') or {}
+        nome = entidade.nome_oficial if entidade else info.get('nome', 'N/A')
+        ticker = entidade.simbolo if entidade else cotacao.get('ticker', 'N/A')
+
+        linhas = [
+            "1. INFORMAÇÕES BÁSICAS:",
+            f"- Nome: {nome}",
+            f"- Setor: {info.get('setor', 'N/A')}",
+            f"- Indústria: {info.get('industria', 'N/A')}",
+            "",
+            "2. COTAÇÃO:",
+            f"- Ticker: {ticker}",
+            f"- Preço: R$ {cotacao.get('preco_atual') or 0:.2f}",
+            f"- Variação: {cotacao.get('variacao_percentual') or 0:.2f}%"
+        ]
+        texto = "\n".join(linhas)
+        if not com_noticias:
+            return texto + "\n", {}
+        texto += "\n\n3. NOTÍCIAS:"
 
-        return out
+        orcamento = Config.TOKENS_ORCAMENTO_RELATORIO - estimar_tokens(texto)
+        manchetes, links = compactar_noticias(dados.get("noticias") or [], orcamento)
+        return texto + "\n" + "\n".join(manchetes) + "\n", links
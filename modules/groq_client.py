@@ -1,13 +1,112 @@
-import os
 import re
 import json
-import requests
+import threading
 from config import Config
+from modules.cache import memoizar_llm
+from modules.limites import ErroProvedor, executar_com_limite, ler_retry_after, obter_limitador
+from modules.metricas import span
+from modules.prazo import limitar_timeout
+from modules.tokens import (
+	compactar_noticias, estimar_tokens, registrar_tokens, restaurar_noticias, truncar
+)
 
 GROQ_API_KEY = Config.GROQ_API_KEY
-GROQ_URL = "https://api.groq.com/openai/v1/chat/completions"
+GROQ_URL = Config.GROQ_URL
 MODEL = "llama-3.3-70b-versatile"
 
+class GroqClient:
+	"""
+	Cliente HTTP da Groq com sessão keep-alive e pool de conexões,
+	compartilhado por todas as chamadas do processo. O reuso das conexões
+	é conferido contra o servidor local por `python -m benchmarks.conexoes`.
+	"""
+
+	def __init__(self, api_key=GROQ_API_KEY, url=GROQ_URL, modelo=MODEL,
+				 pool_size=Config.GROQ_POOL_SIZE,
+				 timeout=(Config.GROQ_TIMEOUT_CONEXAO, Config.GROQ_TIMEOUT_LEITURA)):
+		self.api_key = api_key
+		self.url = url
+		self.modelo = modelo
+		self.timeout = timeout
+
+		# requests só é importado quando o cliente é criado (início rápido da CLI)
+		import requests
+		from requests.adapters import HTTPAdapter
+
+		self.session = requests.Session()
+		adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+		self.session.mount("https://", adapter)
+		self.session.mount("http://", adapter)
+		self.session.headers.update({
+			"Authorization": f"Bearer {api_key}",
+			"Content-Type": "application/json"
+		})
+
+	def completar(self, prompt, temperature=0, max_tokens=None, etapa="groq"):
+		"""
+		Envia o prompt ao modelo e retorna o texto da resposta, ou None em caso de erro.
+		O uso de tokens informado pela API é registrado sob `etapa`.
+		"""
+		corpo = {
+			"model": self.modelo,
+			"messages": [{"role": "user", "content": prompt}],
+			"temperature": temperature
+		}
+		if max_tokens:
+			corpo["max_tokens"] = max_tokens
+
+		# Reserva do limitador: prompt estimado + teto da resposta (corrigido com o uso real)
+		tokens = estimar_tokens(prompt) + (max_tokens or Config.LIMITE_TOKENS_RESPOSTA)
+		try:
+			return executar_com_limite("groq", lambda: self._enviar(corpo, prompt, etapa, tokens), tokens)
+		except ErroProvedor as e:
+			print("Groq error:", e)
+			return None
+		except Exception as e:
+			print(f"Groq exception: {e}")
+			return None
+
+	def _enviar(self, corpo, prompt, etapa, tokens):
+		with span("groq", etapa=etapa, bytes_enviados=len(prompt.encode("utf-8"))) as s:
+			response = self.session.post(self.url, json=corpo, timeout=limitar_timeout(self.timeout))
+			s.anotar(status_http=response.status_code, bytes_recebidos=len(response.content))
+
+			if response.status_code != 200:
+				s.falhar(f"HTTP{response.status_code}")
+				raise ErroProvedor(
+					response.status_code, response.text, ler_retry_after(response.headers.get("Retry-After"))
+				)
+
+			dados = response.json()
+			uso = dados.get("usage") or {}
+			reais = uso.get("total_tokens") or (uso.get("prompt_tokens", 0) + uso.get("completion_tokens", 0))
+			obter_limitador("groq").ajustar(tokens, reais or None)
+
+			choices = dados.get("choices")
+			if not choices:
+				return None
+
+			conteudo = choices[0]["message"]["content"].strip()
+			registrar_tokens(etapa, prompt, conteudo, uso)
+			return conteudo
+
+	def fechar(self):
+		self.session.close()
+
+_cliente = None
+_lock = threading.Lock()
+
+def obter_cliente():
+	"""
+	Cliente Groq compartilhado pelo processo (criado na primeira chamada).
+	"""
+	global _cliente
+	if _cliente is None:
+		with _lock:
+			if _cliente is None:
+				_cliente = GroqClient()
+	return _cliente
+
 def obter_ticker_b3(nome_empresa):
 	"""
 	Usa IA da Groq para retornar o ticker correto da B3.
@@ -26,51 +125,31 @@ Regras:
 - Não explique nada
 - Se não souber, retorne "DESCONHECIDO"
 """
-	
-	try:
-		response = requests.post(
-			GROQ_URL,
-			headers={
-				"Authorization": f"Bearer {GROQ_API_KEY}",
-				"Content-Type": "application/json"
-			},
-			json={
-				"model": MODEL,
-				"messages": [{"role": "user", "content": prompt}],
-				"temperature": 0,
-				"max_tokens": 10
-			},
-			timeout=15
-		)
+	return memoizar_llm(
+		"ticker", MODEL, prompt, {"temperature": 0, "max_tokens": 10},
+		lambda: _consultar_ticker(prompt)
+	)
 
-		if response.status_code != 200:
-			print("Groq error:", response.text)
-			return None
-
-		data = response.json()
-		choices = data.get("choices")
-		if not choices:
-			return None
+def _consultar_ticker(prompt):
+	resposta = obter_cliente().completar(prompt, temperature=0, max_tokens=10, etapa="ticker")
+	if not resposta:
+		return None
 
-		ticker = choices[0]["message"]["content"].strip().upper()
+	ticker = resposta.upper()
 
-		if ticker == "DESCONHECIDO":
-			return None
+	if ticker == "DESCONHECIDO":
+		return None
 
-		# valida formato B3
-		if not re.match(r"^[A-Z]{4,5}\d{1,2}$", ticker):
-			return None
+	# valida formato B3
+	if not re.match(r"^[A-Z]{4,5}\d{1,2}$", ticker):
+		return None
 
-		return ticker
+	return ticker
 
-	except Exception as e:
-		print(f"Groq exception: {e}")
-		return None
-	
 def obter_nome_empresa(ticker):
 	"""
-	Usa IA da Groq para retornar o ticker correto da B3.
-	Retorna string (ex: PETR4) ou None.
+	Usa IA da Groq para retornar o nome popular da empresa a partir do ticker.
+	Retorna string (ex: Petrobras) ou None.
 	"""
 	if not GROQ_API_KEY:
 		return None
@@ -83,85 +162,142 @@ Regras:
 - O nome deve ser apenas uma palavra
 - Se não souber, retorne "DESCONHECIDO"
 """
-	
-	try:
-		response = requests.post(
-			GROQ_URL,
-			headers={
-				"Authorization": f"Bearer {GROQ_API_KEY}",
-				"Content-Type": "application/json"
-			},
-			json={
-				"model": MODEL,
-				"messages": [{"role": "user", "content": prompt}],
-				"temperature": 0,
-				"max_tokens": 10
-			},
-			timeout=15
-		)
+	return memoizar_llm(
+		"nome_empresa", MODEL, prompt, {"temperature": 0, "max_tokens": 10},
+		lambda: _consultar_nome_empresa(prompt)
+	)
 
-		if response.status_code != 200:
-			print("Groq error:", response.text)
-			return None
+def _consultar_nome_empresa(prompt):
+	nome_empresa = obter_cliente().completar(prompt, temperature=0, max_tokens=10, etapa="nome_empresa")
 
-		data = response.json()
-		choices = data.get("choices")
-		if not choices:
-			return None
+	if not nome_empresa or nome_empresa == "DESCONHECIDO":
+		return None
 
-		nome_empresa = choices[0]["message"]["content"].strip()
+	return nome_empresa
 
-		if nome_empresa == "DESCONHECIDO":
-			return None
 
-		return nome_empresa
+def filtrar_noticias_empresa(nome_empresa, noticias):
+	"""
+	Retorna as notícias com relação direta ou impacto potencial na empresa.
+
+	O modelo recebe só id curto, título e fonte de cada manchete (dentro do
+	orçamento de tokens) e responde com os ids, convertidos de volta nas notícias.
+	"""
+	cabecalho = f"""
+Você receberá uma lista de manchetes, cada uma com um id entre colchetes.
+Retorne os ids das manchetes que tenham relação direta ou impacto potencial na empresa "{nome_empresa}".
+
+Responda SOMENTE com um JSON válido no formato: ["n1", "n4"]
 
+Manchetes:
+"""
+	orcamento = Config.TOKENS_ORCAMENTO_FILTRO - estimar_tokens(cabecalho)
+	linhas, mapa = compactar_noticias(noticias, orcamento)
+	if not linhas:
+		return []
+
+	prompt = cabecalho + "\n".join(linhas)
+	ids = memoizar_llm(
+		"filtro_noticias", MODEL, prompt, {"temperature": 0},
+		lambda: _consultar_filtro(prompt)
+	)
+	return restaurar_noticias(ids, mapa)
+
+def _consultar_filtro(prompt):
+	content = obter_cliente().completar(prompt, temperature=0, etapa="filtro_noticias")
+	if content is None:
+		return None
+
+	try:
+		content = content.replace("```json", "").replace("```", "").strip()
+		ids = json.loads(content)
+		return ids if isinstance(ids, list) else None
 	except Exception as e:
-		print(f"Groq exception: {e}")
+		print(f"[ERRO GROQ] {e}")
 		return None
 
+def filtrar_noticias_empresas(nomes_empresas, noticias):
+	"""
+	Filtra um mesmo conjunto de notícias para várias empresas de uma vez.
+	Retorna uma lista com as notícias relevantes de cada empresa, na ordem
+	de `nomes_empresas` (nomes repetidos não se misturam).
+
+	As manchetes vão numeradas e a resposta traz só os números, então o
+	volume cresce com o número de manchetes e não com manchetes × empresas.
+	Se o prompt passar do limite, as manchetes são divididas em lotes.
+	"""
+	resultado = [[] for _ in nomes_empresas]
+	if not noticias or not nomes_empresas:
+		return resultado
 
-def filtrar_noticias_empresa(nome_empresa, noticias):
-	prompt = f"""
-Você receberá uma lista de notícias.
-Retorne APENAS as notícias que tenham relação direta ou impacto potencial na empresa "{nome_empresa}".
+	for inicio, lote in _dividir_noticias(nomes_empresas, noticias):
+		prompt = _prompt_lote(nomes_empresas, lote, inicio)
+		indices = memoizar_llm(
+			"filtro_noticias", MODEL, prompt, {"temperature": 0},
+			lambda prompt=prompt: _consultar_filtro_lote(prompt)
+		)
+		if not indices:
+			continue
+
+		for posicao in range(len(nomes_empresas)):
+			numeros = indices.get(str(posicao))
+			if not isinstance(numeros, list):
+				continue
+			for i in numeros:
+				# O modelo às vezes devolve os números como texto ("3")
+				try:
+					i = int(i)
+				except (TypeError, ValueError):
+					continue
+				if inicio <= i < inicio + len(lote):
+					resultado[posicao].append(noticias[i])
+
+	return resultado
+
+def _prompt_lote(nomes_empresas, noticias, inicio=0):
+	empresas = "\n".join(f'{i}: "{nome}"' for i, nome in enumerate(nomes_empresas))
+	manchetes = "\n".join(_manchete(inicio + i, n) for i, n in enumerate(noticias))
+	return f"""
+Você receberá uma lista numerada de empresas e uma lista numerada de manchetes.
+Para cada empresa, indique as manchetes que tenham relação direta ou impacto potencial nela.
 
 Responda SOMENTE com um JSON válido no formato:
-[
-  {{
-	"titulo": "...",
-	"link": "...",
-	"fonte": "...",
-	"data": "..."
-  }}
-]
-
-Lista de notícias:
-{json.dumps(noticias, ensure_ascii=False)}
+{{"0": [3, 7], "1": []}}
+(chave = número da empresa, valor = números das manchetes)
+
+Empresas:
+{empresas}
+
+Manchetes:
+{manchetes}
 """
 
-	try:
-		response = requests.post(
-			GROQ_URL,
-			headers={
-				"Authorization": f"Bearer {GROQ_API_KEY}",
-				"Content-Type": "application/json"
-			},
-			json={
-				"model": MODEL,
-				"messages": [
-					{"role": "user", "content": prompt}
-				],
-				"temperature": 0
-			},
-			timeout=15
-		)
+def _dividir_noticias(nomes_empresas, noticias):
+	"""
+	Gera (índice inicial, lote) de forma que cada prompt caiba no limite configurado.
+	"""
+	disponivel = Config.GROQ_MAX_CARACTERES_PROMPT - len(_prompt_lote(nomes_empresas, []))
+	inicio, usado = 0, 0
+	for i, n in enumerate(noticias):
+		tamanho = len(_manchete(i, n)) + 1
+		if i > inicio and usado + tamanho > disponivel:
+			yield inicio, noticias[inicio:i]
+			inicio, usado = i, 0
+		usado += tamanho
+	yield inicio, noticias[inicio:]
 
-		response.raise_for_status()
+def _manchete(i, noticia):
+	return f"{i}: {truncar(noticia.get('titulo', ''), Config.TOKENS_MAX_TITULO)} ({noticia.get('fonte', '')})"
 
-		content = response.json()["choices"][0]["message"]["content"]
-		return json.loads(content)
+def _consultar_filtro_lote(prompt):
+	content = obter_cliente().completar(prompt, temperature=0, etapa="filtro_noticias")
+	if content is None:
+		return None
 
+	try:
+		content = content.replace("```json", "").replace("```", "").strip()
+		indices = json.loads(content)
+		return indices if isinstance(indices, dict) else None
 	except Exception as e:
 		print(f"[ERRO GROQ] {e}")
-		return []
+		return None
@@ -0,0 +1,296 @@
+import contextlib
+import json
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+import numpy as np
+from config import Config
+from modules.disjuntor import protegido
+from modules.metricas import span
+from modules.prazo import limitar_timeout
+
+try:
+	import fcntl
+except ImportError:  # Windows: sem trava entre processos, só entre threads
+	fcntl = None
+
+# Uma coluna por arquivo binário (memmap); `data` é o dia do pregão
+COLUNAS = {
+	"data": np.dtype("datetime64[D]"),
+	"abertura": np.dtype("float64"),
+	"maxima": np.dtype("float64"),
+	"minima": np.dtype("float64"),
+	"fechamento": np.dtype("float64"),
+	"volume": np.dtype("int64")
+}
+
+class ArmazemHistorico:
+	"""
+	Histórico diário (OHLCV) dos símbolos em formato colunar: uma pasta por
+	símbolo com um arquivo por coluna, lido por memmap. Consultas por
+	intervalo usam busca binária nas datas e só leem as páginas do trecho.
+
+	A sincronização acrescenta apenas as barras posteriores à última
+	gravada (a última é regravada, pois o pregão pode estar em andamento).
+	`meta.json` guarda o número de linhas válidas: uma gravação interrompida
+	não corrompe o histórico, e o excesso é descartado na próxima.
+
+	Leituras e gravações de um símbolo passam por uma trava de arquivo
+	(compartilhada para ler, exclusiva para gravar), que vale também entre
+	processos (lote com --processos, serviço HTTP, Streamlit).
+	"""
+
+	def __init__(self, pasta):
+		self.pasta = pasta
+		self._locks = {}
+		self._sincronizando = {}
+		self._travas = {}
+		self._completando = set()
+		self._completador = None
+		self._lock = threading.Lock()
+
+	def _lock_simbolo(self, simbolo):
+		with self._lock:
+			return self._locks.setdefault(simbolo, threading.RLock())
+
+	def _lock_sincronizacao(self, simbolo):
+		with self._lock:
+			return self._sincronizando.setdefault(simbolo, threading.Lock())
+
+	@contextlib.contextmanager
+	def _travado(self, simbolo, exclusivo=False):
+		"""
+		Trava o símbolo para leitura (compartilhada) ou gravação (exclusiva).
+		Reentrante na thread: leituras dentro de uma gravação usam a trava dela.
+		"""
+		with self._lock_simbolo(simbolo):
+			pasta = os.path.dirname(self._caminho(simbolo, ".trava"))
+			if fcntl is None or simbolo in self._travas or (not exclusivo and not os.path.isdir(pasta)):
+				yield
+				return
+
+			os.makedirs(pasta, exist_ok=True)
+			with open(os.path.join(pasta, ".trava"), "a") as arquivo:
+				fcntl.flock(arquivo, fcntl.LOCK_EX if exclusivo else fcntl.LOCK_SH)
+				self._travas[simbolo] = arquivo
+				try:
+					yield
+				finally:
+					del self._travas[simbolo]
+					fcntl.flock(arquivo, fcntl.LOCK_UN)
+
+	def _caminho(self, simbolo, arquivo):
+		return os.path.join(self.pasta, re.sub(r"[^A-Z0-9._-]", "_", simbolo.upper()), arquivo)
+
+	def _meta(self, simbolo):
+		try:
+			with open(self._caminho(simbolo, "meta.json"), encoding="utf-8") as f:
+				return json.load(f)
+		except (OSError, ValueError):
+			return {"linhas": 0, "sincronizado_em": 0.0, "valido_ate": 0.0}
+
+	def _gravar_meta(self, simbolo, meta):
+		# Troca atômica: quem lê vê a versão anterior ou a nova, nunca metade
+		caminho = self._caminho(simbolo, "meta.json")
+		temporario = caminho + ".tmp"
+		with open(temporario, "w", encoding="utf-8") as f:
+			json.dump(meta, f)
+		os.replace(temporario, caminho)
+
+	def _coluna(self, simbolo, nome, linhas):
+		if not linhas:
+			return np.empty(0, dtype=COLUNAS[nome])
+		return np.memmap(self._caminho(simbolo, f"{nome}.bin"), dtype=COLUNAS[nome], mode="r", shape=(linhas,))
+
+	def linhas(self, simbolo):
+		return self._meta(simbolo)["linhas"]
+
+	def ler(self, simbolo, inicio=None, fim=None, colunas=None):
+		"""
+		Barras com data entre `inicio` e `fim` (inclusive; date ou "AAAA-MM-DD"),
+		como {coluna: np.ndarray}. Sem limites, o histórico inteiro.
+		"""
+		colunas = colunas or list(COLUNAS)
+		with self._travado(simbolo):
+			linhas = self.linhas(simbolo)
+			datas = self._coluna(simbolo, "data", linhas)
+			i = int(np.searchsorted(datas, np.datetime64(inicio, "D"), "left")) if inicio else 0
+			j = int(np.searchsorted(datas, np.datetime64(fim, "D"), "right")) if fim else linhas
+			# Cópia do trecho: o memmap é liberado e o resultado não muda com a próxima sincronização
+			return {nome: np.array(self._coluna(simbolo, nome, linhas)[i:j]) for nome in colunas}
+
+	def ultima_barra(self, simbolo):
+		"""
+		Última barra gravada {data, abertura, maxima, minima, fechamento, volume}, ou None.
+		"""
+		with self._travado(simbolo):
+			linhas = self.linhas(simbolo)
+			if not linhas:
+				return None
+			return {nome: self._coluna(simbolo, nome, linhas)[-1].item() for nome in COLUNAS}
+
+	def acrescentar(self, simbolo, colunas):
+		"""
+		Grava as barras de `colunas` posteriores à última já gravada (a do
+		mesmo dia é substituída). Retorna quantas barras foram gravadas.
+		"""
+		datas = np.asarray(colunas["data"], dtype=COLUNAS["data"])
+		if not len(datas):
+			return 0
+
+		# Em ordem de data, ficando com a última versão de cada dia
+		ordem = np.argsort(datas, kind="stable")
+		ordenadas = datas[ordem]
+		unicas = np.append(ordenadas[1:] != ordenadas[:-1], True)
+		ordem, ordenadas = ordem[unicas], ordenadas[unicas]
+
+		with self._travado(simbolo, exclusivo=True):
+			linhas = self.linhas(simbolo)
+			manter = linhas
+			if linhas:
+				ultima = self._coluna(simbolo, "data", linhas)[-1]
+				novas = ordenadas >= ultima
+				ordem, ordenadas = ordem[novas], ordenadas[novas]
+				if not len(ordem):
+					return 0
+				if ordenadas[0] == ultima:
+					manter = linhas - 1
+
+			os.makedirs(os.path.dirname(self._caminho(simbolo, "meta.json")), exist_ok=True)
+			for nome, dtype in COLUNAS.items():
+				valores = np.ascontiguousarray(np.asarray(colunas[nome], dtype=dtype)[ordem])
+				with open(self._caminho(simbolo, f"{nome}.bin"), "ab") as f:
+					f.truncate(manter * dtype.itemsize)
+					f.write(valores.tobytes())
+
+			meta = self._meta(simbolo)
+			meta["linhas"] = manter + len(ordem)
+			self._gravar_meta(simbolo, meta)
+		return len(ordem)
+
+	def sincronizar(self, simbolo, forcar=False):
+		"""
+		Traz do Yahoo as barras que faltam desde a última sincronização
+		(na primeira, os últimos Config.HISTORICO_ANOS anos). Sem `forcar`,
+		não consulta o Yahoo enquanto o histórico estiver em dia (mesma
+		validade da cotação: segundos no pregão, até a abertura fora dele).
+		Retorna quantas barras foram gravadas.
+		"""
+		from modules.cotacao import ttl_cotacao
+
+		# Uma sincronização por símbolo no processo; a trava de arquivo só
+		# é tomada para gravar, não durante o download
+		with self._lock_sincronizacao(simbolo):
+			# Outra thread pode ter sincronizado enquanto esperávamos
+			if not forcar and self._meta(simbolo)["valido_ate"] > time.time():
+				return 0
+
+			ultima = self.ultima_barra(simbolo)
+			inicio = ultima["data"] if ultima else None
+			with span("historico.sync", simbolo=simbolo, incremental=inicio is not None) as s:
+				colunas = _baixar(simbolo, inicio)
+				with self._travado(simbolo, exclusivo=True):
+					gravadas = self.acrescentar(simbolo, colunas)
+					meta = self._meta(simbolo)
+					meta.update(sincronizado_em=time.time(), valido_ate=time.time() + ttl_cotacao())
+					if meta["linhas"]:
+						self._gravar_meta(simbolo, meta)
+				s.anotar(barras=gravadas)
+			return gravadas
+
+	def ultima_barra_recente(self, simbolo):
+		"""
+		Último pregão do símbolo para a cotação atual, ou None. Com o histórico
+		recente (até Config.HISTORICO_DIAS_RECENTES dias), acrescenta só as
+		barras que faltam. Sem ele, baixa apenas esses dias e completa o
+		histórico em segundo plano (se habilitado): a cotação não espera anos
+		de barras.
+		"""
+		recente = date.today() - timedelta(days=Config.HISTORICO_DIAS_RECENTES)
+		ultima = self.ultima_barra(simbolo)
+		if ultima and ultima["data"] >= recente:
+			self.sincronizar(simbolo, forcar=True)
+			return self.ultima_barra(simbolo)
+
+		colunas = _baixar(simbolo, recente)
+		self.completar_em_segundo_plano(simbolo)
+		if not len(colunas["data"]):
+			return ultima
+		i = int(np.argmax(np.asarray(colunas["data"], dtype=COLUNAS["data"])))
+		return {nome: np.asarray(colunas[nome], dtype=dtype)[i].item() for nome, dtype in COLUNAS.items()}
+
+	def completar_em_segundo_plano(self, simbolo):
+		"""
+		Agenda a sincronização do histórico do símbolo (sem o prazo do
+		relatório) em um pool de Config.HISTORICO_COMPLETAR_WORKERS threads,
+		uma por símbolo: um lote grande não dispara centenas de downloads
+		disputando as vagas do Yahoo com as cotações. Com 0 (CLI, que termina
+		logo), não agenda nada.
+		"""
+		if not Config.HISTORICO_COMPLETAR_WORKERS:
+			return
+		with self._lock:
+			if simbolo in self._completando:
+				return
+			self._completando.add(simbolo)
+			if self._completador is None:
+				self._completador = ThreadPoolExecutor(
+					max_workers=Config.HISTORICO_COMPLETAR_WORKERS, thread_name_prefix="historico"
+				)
+
+		def completar():
+			try:
+				protegido("yahoo", self.sincronizar, simbolo, forcar=True)
+			except Exception as e:
+				print(f"[AVISO] Histórico de {simbolo} não baixado: {e}")
+			finally:
+				with self._lock:
+					self._completando.discard(simbolo)
+
+		self._completador.submit(completar)
+
+	def em_dia(self, simbolo):
+		return self._meta(simbolo)["valido_ate"] > time.time()
+
+def _baixar(simbolo, inicio=None):
+	"""
+	Colunas das barras diárias do Yahoo desde `inicio` (date), ou dos
+	últimos Config.HISTORICO_ANOS anos.
+	"""
+	if Config.YAHOO_FONTE == "http":
+		from modules.yahoo import historico
+		return historico(simbolo, inicio)
+
+	import yfinance as yf
+	periodo = {"start": inicio.isoformat()} if inicio else {"period": f"{Config.HISTORICO_ANOS}y"}
+	hist = yf.Ticker(simbolo).history(
+		interval="1d", auto_adjust=False, timeout=limitar_timeout(Config.YAHOO_TIMEOUT), **periodo
+	).dropna(subset=["Close"])
+
+	# O índice vem no fuso da B3; sem o fuso, a data do pregão é a do dia local
+	datas = hist.index.tz_localize(None) if hist.index.tz is not None else hist.index
+	return {
+		"data": datas.values.astype("datetime64[D]"),
+		"abertura": hist["Open"].to_numpy(),
+		"maxima": hist["High"].to_numpy(),
+		"minima": hist["Low"].to_numpy(),
+		"fechamento": hist["Close"].to_numpy(),
+		"volume": hist["Volume"].fillna(0).to_numpy()
+	}
+
+_armazem = None
+_lock = threading.Lock()
+
+def obter_armazem():
+	"""
+	Histórico local compartilhado pelo processo.
+	"""
+	global _armazem
+	if _armazem is None:
+		with _lock:
+			if _armazem is None:
+				_armazem = ArmazemHistorico(Config.HISTORICO_DIR)
+	return _armazem
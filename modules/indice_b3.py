@@ -0,0 +1,187 @@
+import csv
+import re
+import threading
+import unicodedata
+from functools import lru_cache
+from config import Config
+
+# Termos que não ajudam a distinguir uma empresa da outra
+TERMOS_IGNORADOS = {"sa", "cia", "companhia", "holding", "grupo", "on", "pn", "unit"}
+
+# Similaridade (coeficiente de Dice entre trigramas) para aceitar um candidato sem
+# consultar a IA, e vantagem mínima sobre o segundo ticker mais parecido
+SIMILARIDADE_MINIMA = 0.75
+MARGEM_MINIMA = 0.15
+
+# Contingência, usada só quando a IA não resolve o nome (ex.: offline): limiar
+# menor, compensado por uma vantagem maior (ex.: "Banco Inter" não vira ITUB4)
+SIMILARIDADE_CONTINGENCIA = 0.55
+MARGEM_CONTINGENCIA = 0.2
+
+def normalizar(texto):
+	"""
+	Normaliza um nome para comparação: sem acentos, minúsculo,
+	sem pontuação e sem sufixos societários.
+	"""
+	texto = unicodedata.normalize("NFKD", texto)
+	texto = "".join(c for c in texto if not unicodedata.combining(c))
+	texto = re.sub(r"[^a-z0-9&]+", " ", texto.lower())
+	palavras = [p for p in texto.split() if p not in TERMOS_IGNORADOS]
+	return " ".join(palavras)
+
+def trigramas(texto):
+	"""
+	Conjunto de trigramas de caracteres do texto normalizado.
+	"""
+	texto = f"  {texto} "
+	return {texto[i:i + 3] for i in range(len(texto) - 2)}
+
+class IndiceB3:
+	"""
+	Índice local nome → ticker das empresas listadas na B3.
+
+	Consultas exatas (nome, apelido, ticker) são um acesso a dicionário;
+	as demais passam por um índice invertido de trigramas.
+	"""
+
+	def __init__(self, empresas):
+		self.exatos = {}
+		self.aliases = {}
+		self.setores = {}
+		self.termos = []
+		self.trigramas_por_termo = []
+		self.indice_invertido = {}
+
+		for ticker, nome, aliases, setor in empresas:
+			ticker = ticker.strip().upper()
+			nomes = [nome] + [a for a in aliases if a.strip()]
+			self.aliases[ticker] = nomes
+			self.setores[ticker] = setor.strip()
+
+			chaves = {normalizar(n) for n in nomes}
+			chaves.add(ticker.lower())
+			chaves.add(re.sub(r"\d+$", "", ticker).lower())
+
+			for chave in chaves:
+				if not chave:
+					continue
+				self.exatos.setdefault(chave, ticker)
+				self._indexar(chave, ticker)
+
+	def _indexar(self, termo, ticker):
+		posicao = len(self.termos)
+		grams = trigramas(termo)
+		self.termos.append((termo, ticker))
+		self.trigramas_por_termo.append(grams)
+		for gram in grams:
+			self.indice_invertido.setdefault(gram, []).append(posicao)
+
+	def buscar(self, nome_empresa, minimo=SIMILARIDADE_MINIMA, margem=MARGEM_MINIMA):
+		"""
+		Retorna o ticker mais provável para o nome informado, ou None se
+		nenhum candidato chegar a `minimo` ou se o segundo ticker mais
+		parecido ficar a menos de `margem` dele (empates nunca são aceitos).
+		"""
+		consulta = normalizar(nome_empresa)
+		if not consulta:
+			return None
+
+		if consulta in self.exatos:
+			return self.exatos[consulta]
+
+		grams = trigramas(consulta)
+		contagem = {}
+		for gram in grams:
+			for posicao in self.indice_invertido.get(gram, ()):
+				contagem[posicao] = contagem.get(posicao, 0) + 1
+
+		# Melhor pontuação de cada ticker (um ticker tem vários nomes)
+		pontuacoes = {}
+		for posicao, comuns in contagem.items():
+			score = 2 * comuns / (len(grams) + len(self.trigramas_por_termo[posicao]))
+			ticker = self.termos[posicao][1]
+			pontuacoes[ticker] = max(score, pontuacoes.get(ticker, 0.0))
+
+		ranking = sorted(pontuacoes.items(), key=lambda item: item[1], reverse=True)
+		if not ranking or ranking[0][1] < minimo:
+			return None
+		if len(ranking) > 1:
+			vantagem = ranking[0][1] - ranking[1][1]
+			if vantagem <= 0 or vantagem < margem:
+				return None
+
+		return ranking[0][0]
+
+	def nomes_do_ticker(self, ticker):
+		"""
+		Nome e apelidos conhecidos para o ticker (lista vazia se não houver).
+		"""
+		return list(self.aliases.get(ticker.upper().replace(".SA", ""), []))
+
+	def setor_do_ticker(self, ticker):
+		"""
+		Setor da empresa (chave usada nos termos setoriais), ou string vazia.
+		"""
+		return self.setores.get(ticker.upper().replace(".SA", ""), "")
+
+def carregar_csv(caminho):
+	"""
+	Lê o CSV de empresas (ticker;nome;aliases separados por |;setor).
+	"""
+	empresas = []
+	with open(caminho, encoding="utf-8", newline="") as arquivo:
+		for linha in csv.DictReader(arquivo, delimiter=";"):
+			aliases = (linha.get("aliases") or "").split("|")
+			empresas.append((linha["ticker"], linha["nome"], aliases, linha.get("setor") or ""))
+	return empresas
+
+_indice = None
+_lock = threading.Lock()
+
+def obter_indice():
+	"""
+	Índice compartilhado do processo, carregado na primeira consulta.
+	"""
+	global _indice
+	if _indice is None:
+		with _lock:
+			if _indice is None:
+				_indice = IndiceB3(carregar_csv(Config.B3_EMPRESAS_CSV))
+	return _indice
+
+def recarregar_indice(caminho=None):
+	"""
+	Recarrega o índice a partir do CSV (permite atualizar a base sem reiniciar).
+	"""
+	global _indice
+	novo = IndiceB3(carregar_csv(caminho or Config.B3_EMPRESAS_CSV))
+	with _lock:
+		_indice = novo
+	buscar_ticker_local.cache_clear()
+	buscar_ticker_aproximado.cache_clear()
+	return novo
+
+@lru_cache(maxsize=1024)
+def buscar_ticker_local(nome_empresa):
+	"""
+	Busca o ticker no índice local. Retorna string (ex: PETR4) ou None
+	se o nome não for encontrado com segurança.
+	"""
+	try:
+		return obter_indice().buscar(nome_empresa)
+	except OSError as e:
+		print(f"[ERRO] Índice B3 indisponível: {e}")
+		return None
+
+@lru_cache(maxsize=1024)
+def buscar_ticker_aproximado(nome_empresa):
+	"""
+	Busca mais tolerante no índice local, para quando a IA não resolveu
+	o nome: aceita similaridades menores, desde que o candidato fique bem à
+	frente do segundo. Na dúvida retorna None, em vez de outra empresa.
+	"""
+	try:
+		return obter_indice().buscar(nome_empresa, SIMILARIDADE_CONTINGENCIA, MARGEM_CONTINGENCIA)
+	except OSError as e:
+		print(f"[ERRO] Índice B3 indisponível: {e}")
+		return None
@@ -1,15 +1,22 @@
-import requests
-from bs4 import BeautifulSoup
-import yfinance as yf
+from config import Config
 from modules.groq_client import obter_ticker_b3
+from modules.disjuntor import protegido
+from modules.indice_b3 import buscar_ticker_aproximado, buscar_ticker_local, obter_indice
+from modules.metricas import anotar, instrumentar, span
 
-def obter_resumo_empresa(nome_empresa):
+@instrumentar("info")
+def obter_resumo_empresa(nome_empresa, entidade=None):
 	"""
-	Obtém informações básicas da empresa usando yfinance
+	Obtém informações básicas da empresa usando yfinance.
+	Com `entidade` já resolvida, não consulta o ticker novamente
+	e preenche o nome oficial dela.
 	"""
 	try:
-		# Tenta encontrar o ticker correto
-		ticker = encontrar_ticker(nome_empresa)
+		# Tenta encontrar o ticker correto (se ainda não foi resolvido)
+		if entidade:
+			ticker = entidade.ticker
+		else:
+			ticker = encontrar_ticker(nome_empresa)
 		
 		if not ticker:
 			return {
@@ -17,9 +24,16 @@ def obter_resumo_empresa(nome_empresa):
 				"mensagem": f"Ticker não encontrado para {nome_empresa}"
 			}
 		
-		# Busca informações usando yfinance
-		empresa = yf.Ticker(ticker + ".SA")
-		info = empresa.info
+		try:
+			with span("yahoo.info", simbolo=ticker + ".SA", fonte=Config.YAHOO_FONTE):
+				info = protegido("yahoo", _info_yahoo, ticker + ".SA")
+		except Exception as e:
+			# Yahoo fora do ar (ou disjuntor aberto): o que o índice local sabe
+			contingencia = _resumo_local(ticker)
+			if contingencia is None:
+				raise
+			print(f"[AVISO] Informações do Yahoo indisponíveis ({e}), usando o índice local")
+			return {"status": "sucesso", "dados": contingencia}
 		
 		resumo = {
 			"nome": info.get('longName', nome_empresa),
@@ -31,6 +45,9 @@ def obter_resumo_empresa(nome_empresa):
 			"funcionarios": info.get('fullTimeEmployees', 'Não informado'),
 			"ticker": ticker + ".SA"
 		}
+
+		if entidade and info.get('longName'):
+			entidade.nome_oficial = info['longName']
 		
 		return {
 			"status": "sucesso",
@@ -43,14 +60,60 @@ def obter_resumo_empresa(nome_empresa):
 			"mensagem": f"Erro ao buscar informações: {str(e)}"
 		}
 
+def _info_yahoo(simbolo):
+	if Config.YAHOO_FONTE == "http":
+		from modules.yahoo import info_empresa
+		return info_empresa(simbolo)
+
+	# Busca informações usando yfinance (importado só nesta etapa)
+	import yfinance as yf
+	return yf.Ticker(simbolo).info
+
+def _resumo_local(ticker):
+	"""
+	Resumo mínimo da empresa a partir do índice da B3, ou None se ela não estiver lá.
+	"""
+	indice = obter_indice()
+	nomes = indice.nomes_do_ticker(ticker)
+	if not nomes:
+		return None
+
+	return {
+		"nome": nomes[0],
+		"setor": indice.setor_do_ticker(ticker) or "Não informado",
+		"industria": "Não informado",
+		"site": "Não informado",
+		"descricao": "Não disponível",
+		"pais": "Brasil",
+		"funcionarios": "Não informado",
+		"ticker": ticker + ".SA",
+		"origem": "indice_local"
+	}
+
 def encontrar_ticker(nome_empresa):
 	"""
-	Encontra o ticker da empresa usando IA (Groq).
+	Encontra o ticker da empresa no índice local da B3; só consulta a IA
+	(Groq) quando o nome não é encontrado com segurança. A busca
+	aproximada no índice fica como contingência, se a IA falhar.
 	"""
+	ticker = buscar_ticker_local(nome_empresa)
+
+	if ticker:
+		anotar(origem="indice_local")
+		return ticker
+
 	ticker = obter_ticker_b3(nome_empresa)
 
 	if ticker:
+		anotar(origem="groq")
+		return ticker
+
+	ticker = buscar_ticker_aproximado(nome_empresa)
+
+	if ticker:
+		anotar(origem="indice_aproximado")
 		return ticker
 
 	# Fallback simples se a IA falhar
+	anotar(origem="fallback")
 	return nome_empresa.split()[0].upper()
@@ -0,0 +1,211 @@
+import os
+import sqlite3
+import threading
+import time
+from config import Config
+from modules.feeds import obter_leitor
+from modules.metricas import anotar, instrumentar
+
+class ArmazemNoticias:
+	"""
+	Base local de notícias em SQLite com índice de texto completo (FTS5).
+
+	As entradas são deduplicadas pelo link e guardam a data de publicação,
+	o que permite consultar qualquer janela de tempo sem acessar os feeds.
+	"""
+
+	def __init__(self, caminho):
+		self.caminho = caminho
+		self._lock = threading.Lock()
+
+		pasta = os.path.dirname(caminho)
+		if pasta:
+			os.makedirs(pasta, exist_ok=True)
+
+		self._conexao = sqlite3.connect(caminho, check_same_thread=False, timeout=10)
+		self._conexao.row_factory = sqlite3.Row
+		self._conexao.executescript("""
+			PRAGMA journal_mode=WAL;
+			CREATE TABLE IF NOT EXISTS noticias (
+				id INTEGER PRIMARY KEY,
+				link TEXT NOT NULL UNIQUE,
+				titulo TEXT NOT NULL,
+				fonte TEXT,
+				data TEXT,
+				publicado_em REAL NOT NULL,
+				ingerido_em REAL NOT NULL
+			);
+			CREATE INDEX IF NOT EXISTS idx_publicado ON noticias (publicado_em);
+			CREATE VIRTUAL TABLE IF NOT EXISTS noticias_fts USING fts5(
+				titulo, content='noticias', content_rowid='id',
+				tokenize='unicode61 remove_diacritics 2'
+			);
+			CREATE TABLE IF NOT EXISTS meta (chave TEXT PRIMARY KEY, valor REAL);
+		""")
+		self._conexao.commit()
+
+	def inserir(self, entradas, registrar_ingestao=True):
+		"""
+		Insere as entradas ainda não vistas (pelo link). Retorna quantas eram novas.
+		Sem `registrar_ingestao` (nenhum feed lido), a base não é dada como em dia.
+		"""
+		agora = time.time()
+		novas = 0
+		with self._lock:
+			for e in entradas:
+				if not e.get("link") or not e.get("titulo"):
+					continue
+				cursor = self._conexao.execute(
+					"INSERT OR IGNORE INTO noticias (link, titulo, fonte, data, publicado_em, ingerido_em) "
+					"VALUES (?, ?, ?, ?, ?, ?)",
+					(e["link"], e["titulo"], e.get("fonte"), e.get("data"), e.get("publicado_em") or agora, agora)
+				)
+				if cursor.rowcount:
+					self._conexao.execute(
+						"INSERT INTO noticias_fts (rowid, titulo) VALUES (?, ?)",
+						(cursor.lastrowid, e["titulo"])
+					)
+					novas += 1
+			if registrar_ingestao:
+				self._conexao.execute("INSERT OR REPLACE INTO meta VALUES ('ultima_ingestao', ?)", (agora,))
+			self._conexao.commit()
+		return novas
+
+	def recentes(self, horas, limite):
+		"""
+		Notícias publicadas nas últimas `horas`, das mais novas para as mais antigas.
+		"""
+		with self._lock:
+			linhas = self._conexao.execute(
+				"SELECT titulo, link, fonte, data, publicado_em FROM noticias "
+				"WHERE publicado_em >= ? ORDER BY publicado_em DESC LIMIT ?",
+				(time.time() - horas * 3600, limite)
+			).fetchall()
+		return [dict(linha) for linha in linhas]
+
+	def buscar(self, termos, horas, limite):
+		"""
+		Notícias da janela cujo título contém algum dos termos (busca FTS).
+		"""
+		termos = [t.replace('"', "") for t in termos if t.strip()]
+		if not termos:
+			return []
+
+		consulta = " OR ".join(f'"{t}"' for t in termos)
+		with self._lock:
+			linhas = self._conexao.execute(
+				"SELECT n.titulo, n.link, n.fonte, n.data, n.publicado_em "
+				"FROM noticias_fts f JOIN noticias n ON n.id = f.rowid "
+				"WHERE noticias_fts MATCH ? AND n.publicado_em >= ? "
+				"ORDER BY n.publicado_em DESC LIMIT ?",
+				(consulta, time.time() - horas * 3600, limite)
+			).fetchall()
+		return [dict(linha) for linha in linhas]
+
+	def ultima_ingestao(self):
+		"""
+		Momento (epoch) da última ingestão, ou 0 se nunca houve.
+		"""
+		with self._lock:
+			linha = self._conexao.execute("SELECT valor FROM meta WHERE chave = 'ultima_ingestao'").fetchone()
+		return linha[0] if linha else 0.0
+
+	def remover_antigas(self, dias):
+		"""
+		Apaga notícias publicadas há mais de `dias` dias.
+		"""
+		limite = time.time() - dias * 86400
+		with self._lock:
+			self._conexao.execute(
+				"DELETE FROM noticias_fts WHERE rowid IN (SELECT id FROM noticias WHERE publicado_em < ?)",
+				(limite,)
+			)
+			self._conexao.execute("DELETE FROM noticias WHERE publicado_em < ?", (limite,))
+			self._conexao.commit()
+
+@instrumentar("ingestao")
+def ingerir_feeds(armazem=None):
+	"""
+	Lê todos os feeds configurados e grava as entradas novas. Retorna quantas eram novas.
+	Se nenhum feed for lido, a próxima chamada tenta de novo em vez de
+	esperar Config.INGESTAO_INTERVALO.
+	"""
+	armazem = armazem or obter_armazem()
+	entradas, em_dia = obter_leitor().ler_todas()
+	novas = armazem.inserir(entradas, registrar_ingestao=em_dia > 0)
+	anotar(novas=novas, feeds=em_dia)
+	if not em_dia:
+		print("[AVISO] Nenhum feed de notícias foi lido; a ingestão será repetida")
+	return novas
+
+def atualizar_se_necessario(armazem=None):
+	"""
+	Ingere os feeds de forma síncrona só se a base estiver desatualizada
+	(ex.: CLI sem o worker em segundo plano).
+	"""
+	armazem = armazem or obter_armazem()
+	if time.time() - armazem.ultima_ingestao() >= Config.INGESTAO_INTERVALO:
+		try:
+			ingerir_feeds(armazem)
+		except Exception as e:
+			print(f"[ERRO] Falha na ingestão de notícias: {e}")
+	return armazem
+
+class IngestorNoticias(threading.Thread):
+	"""
+	Worker em segundo plano que consulta os feeds periodicamente.
+	"""
+
+	def __init__(self, intervalo=None):
+		super().__init__(name="ingestor-noticias", daemon=True)
+		self.intervalo = intervalo or Config.INGESTAO_INTERVALO
+		self._parar = threading.Event()
+
+	def run(self):
+		armazem = obter_armazem()
+		while not self._parar.is_set():
+			try:
+				novas = ingerir_feeds(armazem)
+				armazem.remover_antigas(Config.NOTICIAS_RETENCAO_DIAS)
+				if novas:
+					print(f"[INGESTÃO] {novas} notícias novas")
+			except Exception as e:
+				print(f"[ERRO] Falha na ingestão de notícias: {e}")
+			self._parar.wait(self.intervalo)
+
+	def parar(self):
+		self._parar.set()
+
+_armazem = None
+_ingestor = None
+_lock = threading.Lock()
+
+def obter_armazem():
+	"""
+	Base de notícias compartilhada pelo processo.
+	"""
+	global _armazem
+	if _armazem is None:
+		with _lock:
+			if _armazem is None:
+				_armazem = ArmazemNoticias(Config.NOTICIAS_DB)
+	return _armazem
+
+def iniciar_ingestao():
+	"""
+	Inicia (uma única vez por processo) o worker de ingestão.
+	"""
+	global _ingestor
+	with _lock:
+		if _ingestor is None or not _ingestor.is_alive():
+			_ingestor = IngestorNoticias()
+			_ingestor.start()
+	return _ingestor
+
+if __name__ == "__main__":
+	# Execução dedicada: python -m modules.ingestao
+	print(f"Ingerindo {len(Config.RSS_FEEDS)} feeds a cada {Config.INGESTAO_INTERVALO}s (Ctrl+C para sair)")
+	try:
+		iniciar_ingestao().join()
+	except KeyboardInterrupt:
+		pass
@@ -0,0 +1,286 @@
+import contextlib
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from config import Config
+from modules.disjuntor import obter_disjuntor, registrar_erro
+from modules.metricas import registrar_medida
+from modules.prazo import PrazoEsgotado, restante
+
+# Respostas que valem nova tentativa (limite de taxa e falhas temporárias)
+CODIGOS_RETENTAVEIS = {408, 429, 500, 502, 503, 504}
+
+class LimiteExcedido(Exception):
+	"""
+	A fila do limitador passaria de Config.LIMITE_ESPERA_MAX.
+	"""
+
+class ErroProvedor(Exception):
+	"""
+	Resposta HTTP de erro de um provedor, com o Retry-After (s) se informado.
+	"""
+
+	def __init__(self, codigo, mensagem="", retry_after=None):
+		super().__init__(f"HTTP {codigo}: {mensagem}")
+		self.codigo = codigo
+		self.retry_after = retry_after
+
+class BaldeTokens:
+	"""
+	Balde de tokens com reposição contínua (`por_minuto` por minuto).
+
+	`reservar` desconta na hora e devolve quanto esperar: o saldo pode
+	ficar negativo, o que enfileira os pedidos seguintes por ordem de chegada.
+	"""
+
+	def __init__(self, por_minuto):
+		self.capacidade = float(por_minuto)
+		self.taxa = por_minuto / 60.0
+		self.saldo = self.capacidade
+		self.atualizado = time.monotonic()
+
+	def _repor(self, agora):
+		self.saldo = min(self.capacidade, self.saldo + (agora - self.atualizado) * self.taxa)
+		self.atualizado = agora
+
+	def reservar(self, n, agora):
+		self._repor(agora)
+		self.saldo -= min(n, self.capacidade)
+		return max(0.0, -self.saldo / self.taxa)
+
+	def devolver(self, n, agora):
+		self._repor(agora)
+		self.saldo = min(self.capacidade, self.saldo + n)
+
+class Limitador:
+	"""
+	Limite de requisições e de tokens por minuto de um provedor, compartilhado
+	pelas threads do processo. Um 429 pausa todas as chamadas até o Retry-After.
+	"""
+
+	def __init__(self, nome, rpm=0, tpm=0):
+		self.nome = nome
+		self.requisicoes = BaldeTokens(rpm) if rpm else None
+		self.tokens = BaldeTokens(tpm) if tpm else None
+		self.pausado_ate = 0.0
+		self._lock = threading.Lock()
+
+	def adquirir(self, tokens=0, espera_max=None):
+		"""
+		Reserva uma requisição e `tokens` e dorme o necessário.
+		Levanta LimiteExcedido (sem reservar) se a espera passar de `espera_max`.
+		"""
+		espera_max = Config.LIMITE_ESPERA_MAX if espera_max is None else espera_max
+		with self._lock:
+			agora = time.monotonic()
+			espera = max(0.0, self.pausado_ate - agora)
+			if self.requisicoes:
+				espera = max(espera, self.requisicoes.reservar(1, agora))
+			if self.tokens and tokens:
+				espera = max(espera, self.tokens.reservar(tokens, agora))
+
+			if espera > espera_max:
+				if self.requisicoes:
+					self.requisicoes.devolver(1, agora)
+				if self.tokens and tokens:
+					self.tokens.devolver(tokens, agora)
+				raise LimiteExcedido(f"{self.nome}: fila de {espera:.0f}s acima do limite de {espera_max:.0f}s")
+
+		if espera > 0:
+			time.sleep(espera)
+			registrar_medida(f"limite.{self.nome}", espera, motivo="fila", tokens=tokens)
+		return espera
+
+	def ajustar(self, estimados, reais):
+		"""
+		Corrige o saldo de tokens com o uso informado pela API.
+		"""
+		if not self.tokens or reais is None:
+			return
+		with self._lock:
+			self.tokens.devolver(estimados - reais, time.monotonic())
+
+	def pausar(self, segundos):
+		with self._lock:
+			self.pausado_ate = max(self.pausado_ate, time.monotonic() + segundos)
+
+class Vagas:
+	"""
+	Limite de chamadas simultâneas a um serviço externo, compartilhado pelas
+	threads do processo. Reentrante na mesma thread: uma chamada que já
+	ocupa a vaga (ex.: o stream do Gemini) não espera por outra.
+	"""
+
+	def __init__(self, nome, maximo=0):
+		self.nome = nome
+		self.maximo = maximo
+		self._semaforo = threading.BoundedSemaphore(maximo) if maximo else None
+		self._local = threading.local()
+
+	@contextlib.contextmanager
+	def ocupar(self):
+		"""
+		Ocupa uma vaga durante o bloco. Levanta LimiteExcedido se nenhuma
+		abrir em Config.LIMITE_ESPERA_MAX (ou no que resta do prazo).
+		"""
+		if self._semaforo is None or getattr(self._local, "ocupada", False):
+			yield
+			return
+
+		inicio = time.monotonic()
+		if not self._semaforo.acquire(timeout=restante(Config.LIMITE_ESPERA_MAX)):
+			raise LimiteExcedido(f"{self.nome}: {self.maximo} chamadas simultâneas em andamento")
+		espera = time.monotonic() - inicio
+		if espera > 0.001:
+			registrar_medida(f"limite.{self.nome}", espera, motivo="concorrencia")
+
+		self._local.ocupada = True
+		try:
+			yield
+		finally:
+			self._local.ocupada = False
+			self._semaforo.release()
+
+_limitadores = {}
+_vagas = {}
+_lock = threading.Lock()
+
+def obter_limitador(provedor):
+	"""
+	Limitador do provedor ("groq" ou "gemini"), criado na primeira chamada
+	com Config.<PROVEDOR>_RPM e Config.<PROVEDOR>_TPM.
+	"""
+	with _lock:
+		if provedor not in _limitadores:
+			prefixo = provedor.upper()
+			_limitadores[provedor] = Limitador(
+				provedor,
+				rpm=getattr(Config, f"{prefixo}_RPM", 0),
+				tpm=getattr(Config, f"{prefixo}_TPM", 0)
+			)
+		return _limitadores[provedor]
+
+def obter_vagas(servico):
+	"""
+	Vagas do serviço ("groq", "gemini", "yahoo", "rss"), criadas na primeira
+	chamada com Config.<SERVICO>_CONCORRENCIA (0 = sem limite).
+	"""
+	with _lock:
+		if servico not in _vagas:
+			_vagas[servico] = Vagas(servico, getattr(Config, f"{servico.upper()}_CONCORRENCIA", 0))
+		return _vagas[servico]
+
+def ler_retry_after(valor):
+	"""
+	Segundos do cabeçalho Retry-After (número ou data HTTP), ou None.
+	"""
+	if not valor:
+		return None
+	try:
+		return max(0.0, float(valor))
+	except ValueError:
+		pass
+	try:
+		return max(0.0, parsedate_to_datetime(valor).timestamp() - time.time())
+	except (TypeError, ValueError):
+		return None
+
+def espera_backoff(tentativa, retry_after=None):
+	"""
+	Espera antes da tentativa seguinte: o Retry-After, se houver, ou backoff
+	exponencial com jitter (metade fixa, metade aleatória) limitado a
+	Config.LIMITE_BACKOFF_MAX.
+	"""
+	if retry_after is not None:
+		return retry_after + random.uniform(0, Config.LIMITE_BACKOFF_BASE)
+	teto = min(Config.LIMITE_BACKOFF_MAX, Config.LIMITE_BACKOFF_BASE * 2 ** tentativa)
+	return teto / 2 + random.uniform(0, teto / 2)
+
+def classificar_erro(excecao):
+	"""
+	(retentável, código HTTP, Retry-After) do erro, inclusive dos encadeados
+	pelos SDKs (ex.: LangChain -> google.genai.errors.APIError).
+	"""
+	atual = excecao
+	while atual is not None:
+		if isinstance(atual, ErroProvedor):
+			return atual.codigo in CODIGOS_RETENTAVEIS, atual.codigo, atual.retry_after
+
+		resposta = getattr(atual, "response", None)
+		codigo = (
+			getattr(atual, "code", None) or getattr(atual, "status_code", None)
+			or getattr(resposta, "status_code", None)
+		)
+		if isinstance(codigo, int) and 100 <= codigo < 600:
+			cabecalhos = getattr(resposta, "headers", None) or {}
+			return codigo in CODIGOS_RETENTAVEIS, codigo, ler_retry_after(cabecalhos.get("Retry-After"))
+
+		if type(atual).__name__ in ("ConnectionError", "ConnectError", "Timeout", "ReadTimeout", "ConnectTimeout"):
+			return True, None, None
+		atual = atual.__cause__ or atual.__context__
+	return False, None, None
+
+def registrar_falha(provedor, excecao):
+	"""
+	Conta no disjuntor e no limitador do provedor um erro ocorrido fora de
+	`executar_com_limite` (ex.: no meio de um stream, que não é repetido).
+	Um 429 pausa o provedor pelo Retry-After (ou pelo backoff).
+	"""
+	registrar_erro(obter_disjuntor(provedor), excecao)
+	_, codigo, retry_after = classificar_erro(excecao)
+	if codigo == 429:
+		obter_limitador(provedor).pausar(espera_backoff(0, retry_after))
+
+def executar_com_limite(provedor, chamada, tokens=0, registrar_sucesso=True):
+	"""
+	Executa `chamada()` respeitando o limite do provedor e repete em 429,
+	5xx e falhas de conexão (até Config.LIMITE_TENTATIVAS vezes).
+
+	Um 429 pausa o provedor inteiro pelo Retry-After, para que as outras
+	threads não insistam. Outros erros e a última falha são relançados.
+	Cada tentativa passa pelo disjuntor do provedor: aberto, ele levanta
+	DisjuntorAberto na hora, sem fila nem espera. Sem `registrar_sucesso`
+	(ex.: abertura de um stream), quem chamou registra o sucesso no fim.
+	"""
+	with obter_vagas(provedor).ocupar():
+		return _executar_com_limite(provedor, chamada, tokens, registrar_sucesso)
+
+def _executar_com_limite(provedor, chamada, tokens, registrar_sucesso=True):
+	limitador = obter_limitador(provedor)
+	disjuntor = obter_disjuntor(provedor)
+	for tentativa in range(Config.LIMITE_TENTATIVAS):
+		disjuntor.verificar()
+		try:
+			# A fila não passa do prazo do relatório, se houver
+			limitador.adquirir(tokens, restante(Config.LIMITE_ESPERA_MAX))
+			resultado = chamada()
+		except (LimiteExcedido, PrazoEsgotado):
+			raise
+		except Exception as e:
+			registrar_erro(disjuntor, e)
+
+			retentavel, codigo, retry_after = classificar_erro(e)
+			if not retentavel or tentativa == Config.LIMITE_TENTATIVAS - 1:
+				raise
+
+			# A tentativa recusada não consumiu os tokens reservados
+			limitador.ajustar(tokens, 0)
+
+			espera = espera_backoff(tentativa, retry_after)
+			resto = restante()
+			if resto is not None and espera >= resto:
+				# Não sobra prazo para esperar e tentar de novo
+				raise
+			print(f"[AVISO] {provedor}: {codigo or type(e).__name__}, nova tentativa em {espera:.1f}s")
+			registrar_medida(f"limite.{provedor}", espera, motivo="retry", codigo=codigo, tentativa=tentativa + 1)
+			if codigo == 429:
+				# A pausa vale para todas as threads; a próxima reserva já espera por ela
+				limitador.pausar(espera)
+			else:
+				time.sleep(espera)
+			continue
+
+		if registrar_sucesso:
+			disjuntor.sucesso()
+		return resultado
@@ -0,0 +1,221 @@
+import json
+import multiprocessing
+import queue
+import sys
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from config import Config
+from modules.cache import ler_relatorio_pronto, gravar_relatorio_pronto
+from modules.metricas import instrumentar
+
+_processor = None
+_lock = threading.Lock()
+
+def ler_empresas(origem):
+	"""
+	Nomes ou tickers, um por linha, de um arquivo ou da entrada padrão ("-").
+	Linhas vazias e comentários (#) são ignorados.
+	"""
+	if origem == "-":
+		linhas = sys.stdin.read().splitlines()
+	else:
+		with open(origem, encoding="utf-8") as f:
+			linhas = f.read().splitlines()
+
+	empresas = [l.split("#", 1)[0].strip() for l in linhas]
+	return [e for e in empresas if e]
+
+def _obter_processor():
+	# Um processador Gemini por processo, compartilhado pelas threads
+	global _processor
+	if _processor is None:
+		with _lock:
+			if _processor is None:
+				from modules.gemini import GeminiProcessor
+				_processor = GeminiProcessor()
+	return _processor
+
+@instrumentar("lote")
+def processar_empresa(empresa, entidade=None, prazo=None, noticias=None):
+	"""
+	Gera o relatório de uma empresa sem interação. Aceita a `entidade` já
+	resolvida, um `prazo` (s) no lugar de Config.RELATORIO_PRAZO e as
+	`noticias` já filtradas.
+
+	Retorna um dicionário serializável com `status` "sucesso", "parcial"
+	(faltou alguma seção, listada em `faltando`, ex.: prazo esgotado) ou "erro".
+	"""
+	from modules.coleta import coletar_dados
+	from modules.entidade import resolver_entidade
+	from modules.prazo import com_prazo
+	from modules.relatorio import CHAVE_FALTANDO, gerar_relatorio
+
+	inicio = time.perf_counter()
+	resultado = {"empresa": empresa}
+	try:
+		with com_prazo(prazo):
+			entidade = entidade or resolver_entidade(empresa)
+			resultado["ticker"] = entidade.ticker
+
+			pronto = ler_relatorio_pronto(entidade.simbolo)
+			if pronto:
+				resultado.update(
+					status="sucesso", origem="cache",
+					relatorio=pronto["dados_finais"], dados_coletados=pronto["dados_coletados"]
+				)
+			else:
+				dados_coletados = coletar_dados(entidade, noticias=noticias)
+				resultado["dados_coletados"] = dados_coletados
+
+				relatorio = gerar_relatorio(_obter_processor(), empresa, dados_coletados, entidade)
+				faltando = relatorio.get(CHAVE_FALTANDO, [])
+				resultado.update(relatorio=relatorio, origem="gerado")
+
+				if faltando:
+					resultado.update(status="parcial", faltando=faltando)
+				else:
+					resultado["status"] = "sucesso"
+					gravar_relatorio_pronto(entidade.simbolo, {"dados_finais": relatorio, "dados_coletados": dados_coletados})
+
+	except Exception as e:
+		resultado.update(status="erro", mensagem=f"{type(e).__name__}: {e}")
+
+	resultado["duracao_s"] = round(time.perf_counter() - inicio, 2)
+	return resultado
+
+def _preparar_bloco(bloco, armazem=None):
+	"""
+	Resolve as empresas do bloco e filtra as notícias de todas juntas (uma
+	chamada à IA por bloco, não por empresa). Retorna [(empresa, entidade,
+	notícias)]; o que falhar aqui, `processar_empresa` refaz sozinho.
+	"""
+	from modules.entidade import resolver_entidade
+	from modules.noticia import buscar_noticias_rss
+
+	def resolver(empresa):
+		try:
+			return resolver_entidade(empresa)
+		except Exception:
+			return None
+
+	with ThreadPoolExecutor(max_workers=len(bloco)) as executor:
+		entidades = list(executor.map(resolver, bloco))
+
+	# Quem já tem relatório pronto no cache não precisa das notícias
+	pendentes = [e for e in entidades if e and not ler_relatorio_pronto(e.simbolo)]
+	noticias = {}
+	if len(pendentes) > 1:
+		try:
+			noticias = buscar_noticias_rss([e.simbolo for e in pendentes], entidade=pendentes, armazem=armazem)
+		except Exception as e:
+			print(f"[AVISO] Notícias do bloco não filtradas ({type(e).__name__}: {e}), buscando por empresa")
+
+	return [
+		(empresa, entidade, noticias.get(entidade.simbolo) if entidade else None)
+		for empresa, entidade in zip(bloco, entidades)
+	]
+
+def _futuro_com_erro(excecao):
+	futuro = Future()
+	futuro.set_exception(excecao)
+	return futuro
+
+def _inicializar_processo(completar_workers):
+	# Mensagens dos módulos (print) vão para stderr, longe do JSONL
+	sys.stdout = sys.stderr
+	# Com "spawn" a configuração é relida do ambiente; vale a do processo principal
+	Config.HISTORICO_COMPLETAR_WORKERS = completar_workers
+
+def executar_lote(empresas, saida, workers=None, processos=False, progresso=None, prazo=None):
+	"""
+	Gera os relatórios em paralelo (threads ou processos) e grava cada um
+	como uma linha JSON em `saida` assim que termina. Cada relatório tem
+	`prazo` segundos (padrão: Config.LOTE_PRAZO; 0 = sem prazo, para que
+	os limites de taxa enfileirem as chamadas em vez de recusá-las).
+	As notícias são filtradas por blocos de Config.LOTE_BLOCO_NOTICIAS empresas.
+
+	`progresso(feitos, total, resultado)` é chamado após cada empresa.
+	Retorna o resumo {"total", "sucesso", "parcial", "erro", "falhas", "duracao_s"}.
+	"""
+	workers = workers or Config.LOTE_WORKERS
+	prazo = Config.LOTE_PRAZO if prazo is None else prazo
+	inicio = time.perf_counter()
+	resumo = {"total": len(empresas), "sucesso": 0, "parcial": 0, "erro": 0, "falhas": []}
+
+	if processos:
+		# "spawn": com fork, os filhos herdariam as conexões SQLite abertas e os
+		# singletons (cache, base de notícias) do processo principal
+		executor = ProcessPoolExecutor(
+			max_workers=workers, initializer=_inicializar_processo,
+			initargs=(Config.HISTORICO_COMPLETAR_WORKERS,),
+			mp_context=multiprocessing.get_context("spawn")
+		)
+	else:
+		executor = ThreadPoolExecutor(max_workers=workers)
+
+	# Base de notícias atualizada uma vez, antes de as etapas concorrerem por ela
+	from modules.ingestao import atualizar_se_necessario
+	armazem = atualizar_se_necessario()
+
+	# Os blocos são preparados em sequência, em uma thread própria; cada
+	# empresa vai para o pool assim que o seu bloco fica pronto
+	concluidos = queue.Queue()
+
+	def enviar():
+		enviadas = 0
+		try:
+			tamanho = max(1, Config.LOTE_BLOCO_NOTICIAS)
+			for i in range(0, len(empresas), tamanho):
+				bloco = empresas[i:i + tamanho]
+				try:
+					preparadas = _preparar_bloco(bloco, armazem)
+				except Exception as e:
+					print(f"[AVISO] Bloco do lote não preparado ({type(e).__name__}: {e})")
+					preparadas = [(empresa, None, None) for empresa in bloco]
+
+				for empresa, entidade, noticias in preparadas:
+					enviado_em = time.perf_counter()
+					try:
+						futuro = executor.submit(processar_empresa, empresa, entidade, prazo, noticias)
+					except Exception as e:
+						# Ex.: pool de processos quebrado
+						futuro = _futuro_com_erro(e)
+					futuro.add_done_callback(
+						lambda f, item=(empresa, entidade, enviado_em): concluidos.put((*item, f))
+					)
+					enviadas += 1
+		except BaseException as e:
+			# Sem um resultado para cada empresa, o laço abaixo esperaria para sempre
+			for empresa in empresas[enviadas:]:
+				concluidos.put((empresa, None, time.perf_counter(), _futuro_com_erro(e)))
+
+	with executor:
+		threading.Thread(target=enviar, name="lote-blocos", daemon=True).start()
+		for feitos in range(1, len(empresas) + 1):
+			empresa, entidade, enviado_em, futuro = concluidos.get()
+			try:
+				resultado = futuro.result()
+			except Exception as e:
+				# Ex.: processo filho encerrado; mesmas chaves de `processar_empresa`
+				resultado = {"empresa": empresa, "status": "erro", "mensagem": f"{type(e).__name__}: {e}"}
+				if entidade:
+					resultado["ticker"] = entidade.ticker
+				resultado["duracao_s"] = round(time.perf_counter() - enviado_em, 2)
+
+			saida.write(json.dumps(resultado, ensure_ascii=False, default=str) + "\n")
+			saida.flush()
+
+			resumo[resultado["status"]] += 1
+			if resultado["status"] != "sucesso":
+				resumo["falhas"].append({
+					"empresa": resultado["empresa"],
+					"status": resultado["status"],
+					"mensagem": resultado.get("mensagem") or f"faltando: {', '.join(resultado.get('faltando', []))}"
+				})
+
+			if progresso:
+				progresso(feitos, len(empresas), resultado)
+
+	resumo["duracao_s"] = round(time.perf_counter() - inicio, 2)
+	return resumo
@@ -0,0 +1,298 @@
+import contextvars
+import functools
+import json
+import sys
+import threading
+import time
+import uuid
+from config import Config
+
+# Limites (s) dos buckets do histograma de duração
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_span_atual = contextvars.ContextVar("span_atual", default=None)
+_coletor_atual = contextvars.ContextVar("coletor_atual", default=None)
+
+class Span:
+	"""
+	Trecho medido do pipeline (etapa ou chamada externa).
+
+	Guarda duração, atributos (tamanho do payload, cache hit/miss, ...)
+	e a classe do erro, se houver. Use via `span(...)`.
+	"""
+
+	def __init__(self, nome, atributos, pai=None):
+		self.nome = nome
+		self.atributos = atributos
+		self.id = uuid.uuid4().hex[:16]
+		self.pai = pai.id if pai else None
+		self.rastro = pai.rastro if pai else uuid.uuid4().hex[:16]
+		self.inicio = time.time()
+		self.duracao = None
+		self.erro = None
+		self._t0 = None
+		self._token = None
+
+	def anotar(self, **atributos):
+		self.atributos.update(atributos)
+
+	def falhar(self, classe):
+		"""
+		Marca o span com erro sem exceção (ex.: retorno {"status": "erro"}).
+		"""
+		self.erro = classe
+
+	def __enter__(self):
+		self._t0 = time.perf_counter()
+		self._token = _span_atual.set(self)
+		return self
+
+	def __exit__(self, tipo, excecao, tb):
+		self.duracao = time.perf_counter() - self._t0
+		if tipo is not None and self.erro is None:
+			self.erro = tipo.__name__
+		_span_atual.reset(self._token)
+		_registrar(self)
+		return False
+
+	def como_dict(self):
+		return {
+			"span": self.nome,
+			"rastro": self.rastro,
+			"id": self.id,
+			"pai": self.pai,
+			"inicio": round(self.inicio, 6),
+			"duracao_ms": round(self.duracao * 1000, 3) if self.duracao is not None else None,
+			"erro": self.erro,
+			**self.atributos
+		}
+
+def span(nome, **atributos):
+	"""
+	Abre um span filho do span atual (no mesmo contexto):
+
+		with span("groq", etapa="ticker") as s:
+			...
+			s.anotar(bytes_recebidos=len(corpo))
+	"""
+	return Span(nome, atributos, _span_atual.get())
+
+def registrar_medida(nome, duracao, erro=None, **atributos):
+	"""
+	Registra um span já medido. Útil em geradores, onde um `with span(...)`
+	ficaria ativo no contexto de quem consome os itens.
+	"""
+	s = Span(nome, atributos, _span_atual.get())
+	s.duracao = duracao
+	s.erro = erro
+	_registrar(s)
+
+def anotar(**atributos):
+	"""
+	Acrescenta atributos ao span atual, se houver (ex.: cache="hit").
+	"""
+	atual = _span_atual.get()
+	if atual is not None:
+		atual.anotar(**atributos)
+
+def instrumentar(nome):
+	"""
+	Decorador que mede cada chamada da função em um span. Retornos no
+	padrão {"status": "erro", ...} também contam como erro.
+	"""
+	def decorador(funcao):
+		@functools.wraps(funcao)
+		def medida(*args, **kwargs):
+			with span(nome) as s:
+				resultado = funcao(*args, **kwargs)
+				if isinstance(resultado, dict) and resultado.get("status") == "erro":
+					s.falhar("status_erro")
+				return resultado
+		return medida
+	return decorador
+
+def no_contexto(funcao):
+	"""
+	Versão de `funcao` que roda no contexto atual (span e coletor), para
+	submeter a executores de threads sem perder o rastro.
+	"""
+	contexto = contextvars.copy_context()
+	return functools.partial(contexto.run, funcao)
+
+class ColetorSpans:
+	"""
+	Junta os spans concluídos dentro de um bloco `with` (ex.: um relatório),
+	inclusive os das threads criadas com `no_contexto`.
+	"""
+
+	def __init__(self):
+		self.spans = []
+		self._lock = threading.Lock()
+		self._token = None
+
+	def adicionar(self, s):
+		with self._lock:
+			self.spans.append(s.como_dict())
+
+	def tempos(self):
+		"""
+		Spans em ordem de início.
+		"""
+		with self._lock:
+			return sorted(self.spans, key=lambda s: s["inicio"])
+
+	def __enter__(self):
+		self._token = _coletor_atual.set(self)
+		return self
+
+	def __exit__(self, *args):
+		_coletor_atual.reset(self._token)
+		return False
+
+class Metricas:
+	"""
+	Agregados por nome de span: histograma de duração, erros por classe,
+	cache hit/miss e bytes enviados/recebidos.
+	"""
+
+	def __init__(self):
+		self._lock = threading.Lock()
+		self.duracoes = {}  # nome -> [contagem por bucket..., +Inf], soma
+		self.erros = {}
+		self.cache = {}
+		self.bytes = {}
+
+	def registrar(self, s):
+		with self._lock:
+			hist = self.duracoes.setdefault(s.nome, {"buckets": [0] * (len(BUCKETS) + 1), "soma": 0.0})
+			for i, limite in enumerate(BUCKETS):
+				if s.duracao <= limite:
+					hist["buckets"][i] += 1
+			hist["buckets"][-1] += 1
+			hist["soma"] += s.duracao
+
+			if s.erro:
+				chave = (s.nome, s.erro)
+				self.erros[chave] = self.erros.get(chave, 0) + 1
+			if s.atributos.get("cache") in ("hit", "miss"):
+				chave = (s.nome, s.atributos["cache"])
+				self.cache[chave] = self.cache.get(chave, 0) + 1
+			for direcao in ("enviados", "recebidos"):
+				valor = s.atributos.get(f"bytes_{direcao}")
+				if valor:
+					chave = (s.nome, direcao)
+					self.bytes[chave] = self.bytes.get(chave, 0) + valor
+
+	def texto_prometheus(self):
+		"""
+		Métricas no formato de texto do Prometheus.
+		"""
+		linhas = [
+			"# HELP pipeline_span_duracao_segundos Duração das etapas e chamadas externas",
+			"# TYPE pipeline_span_duracao_segundos histogram"
+		]
+		with self._lock:
+			for nome, hist in sorted(self.duracoes.items()):
+				for limite, contagem in zip(BUCKETS, hist["buckets"]):
+					linhas.append(f'pipeline_span_duracao_segundos_bucket{{span="{nome}",le="{limite}"}} {contagem}')
+				linhas.append(f'pipeline_span_duracao_segundos_bucket{{span="{nome}",le="+Inf"}} {hist["buckets"][-1]}')
+				linhas.append(f'pipeline_span_duracao_segundos_sum{{span="{nome}"}} {hist["soma"]:.6f}')
+				linhas.append(f'pipeline_span_duracao_segundos_count{{span="{nome}"}} {hist["buckets"][-1]}')
+
+			linhas += ["# HELP pipeline_span_erros_total Erros por etapa e classe", "# TYPE pipeline_span_erros_total counter"]
+			for (nome, classe), n in sorted(self.erros.items()):
+				linhas.append(f'pipeline_span_erros_total{{span="{nome}",classe="{classe}"}} {n}')
+
+			linhas += ["# HELP pipeline_cache_total Consultas ao cache por resultado", "# TYPE pipeline_cache_total counter"]
+			for (nome, resultado), n in sorted(self.cache.items()):
+				linhas.append(f'pipeline_cache_total{{span="{nome}",resultado="{resultado}"}} {n}')
+
+			linhas += ["# HELP pipeline_bytes_total Bytes trafegados nas chamadas externas", "# TYPE pipeline_bytes_total counter"]
+			for (nome, direcao), n in sorted(self.bytes.items()):
+				linhas.append(f'pipeline_bytes_total{{span="{nome}",direcao="{direcao}"}} {n}')
+
+		from modules.tokens import metricas_tokens
+		linhas += ["# HELP pipeline_llm_tokens_total Tokens consumidos nas chamadas de LLM", "# TYPE pipeline_llm_tokens_total counter"]
+		for etapa, m in metricas_tokens().items():
+			linhas.append(f'pipeline_llm_tokens_total{{etapa="{etapa}",tipo="prompt"}} {m["tokens_prompt"]}')
+			linhas.append(f'pipeline_llm_tokens_total{{etapa="{etapa}",tipo="resposta"}} {m["tokens_resposta"]}')
+
+		from modules.disjuntor import estados_disjuntores
+		linhas += ["# HELP pipeline_disjuntor_aberto Disjuntor do serviço externo aberto (1) ou não (0)", "# TYPE pipeline_disjuntor_aberto gauge"]
+		for servico, estado in sorted(estados_disjuntores().items()):
+			linhas.append(f'pipeline_disjuntor_aberto{{servico="{servico}"}} {int(estado == "aberto")}')
+
+		return "\n".join(linhas) + "\n"
+
+_metricas = Metricas()
+_lock_log = threading.Lock()
+_arquivo_log = None
+
+def _registrar(s):
+	_metricas.registrar(s)
+
+	coletor = _coletor_atual.get()
+	if coletor is not None:
+		coletor.adicionar(s)
+
+	if Config.METRICAS_LOG:
+		_escrever_log(s)
+
+def _escrever_log(s):
+	# Uma linha JSON por span: "-" para stderr, ou o caminho de um arquivo
+	global _arquivo_log
+	linha = json.dumps(s.como_dict(), ensure_ascii=False, default=str)
+	with _lock_log:
+		if Config.METRICAS_LOG == "-":
+			print(linha, file=sys.stderr)
+			return
+		if _arquivo_log is None:
+			_arquivo_log = open(Config.METRICAS_LOG, "a", encoding="utf-8")
+		_arquivo_log.write(linha + "\n")
+		_arquivo_log.flush()
+
+def obter_metricas():
+	return _metricas
+
+def texto_prometheus():
+	return _metricas.texto_prometheus()
+
+_servidor = None
+
+def iniciar_servidor_metricas(porta=None, host=None):
+	"""
+	Serve /metrics (formato Prometheus) em uma thread, uma vez por processo,
+	em Config.METRICAS_HOST (só local, por padrão).
+	Sem porta (Config.METRICAS_PORTA = 0), não faz nada.
+	"""
+	global _servidor
+	porta = porta if porta is not None else Config.METRICAS_PORTA
+	if not porta:
+		return None
+
+	from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+	class Handler(BaseHTTPRequestHandler):
+		def do_GET(self):
+			if self.path.split("?")[0] != "/metrics":
+				self.send_error(404)
+				return
+			corpo = texto_prometheus().encode("utf-8")
+			self.send_response(200)
+			self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+			self.send_header("Content-Length", str(len(corpo)))
+			self.end_headers()
+			self.wfile.write(corpo)
+
+		def log_message(self, *args):
+			pass
+
+	with _lock_log:
+		if _servidor is None:
+			try:
+				_servidor = ThreadingHTTPServer((host or Config.METRICAS_HOST, porta), Handler)
+			except OSError as e:
+				print(f"[ERRO] Não foi possível abrir a porta de métricas {porta}: {e}")
+				return None
+			threading.Thread(target=_servidor.serve_forever, name="metricas", daemon=True).start()
+	return _servidor
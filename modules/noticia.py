@@ -1,34 +1,238 @@
-import feedparser
-from datetime import datetime
-from modules.groq_client import obter_nome_empresa, filtrar_noticias_empresa
-
-def buscar_noticias_rss(ticker):
-	noticias = []
-	feeds = {
-		"InfoMoney": "https://www.infomoney.com.br/feed/",
-		"Investing": "https://br.investing.com/rss/news_301.rss"
-	}
-
-	nome_empresa = obter_nome_empresa(ticker)
-	noticias_nao_tratadas = []
-
-	for fonte, url in feeds.items():
-		try:
-			feed = feedparser.parse(url)
-			for entry in feed.entries[:10]:
-				noticias_nao_tratadas.append({
-					"titulo": entry.title,
-					"link": entry.link,
-					"fonte": fonte,
-					"data": getattr(entry, "published", datetime.now().strftime("%d/%m/%Y"))
-				})
-
-				if len(noticias_nao_tratadas) >= 10:
-					break
-		except Exception as e:
-			print(f"[ERRO] Não foi possível acessar {fonte}: {e}")
-
-	# 🔥 FILTRAGEM COM GROQ
-	noticias = filtrar_noticias_empresa(nome_empresa, noticias_nao_tratadas)
+import re
+from config import Config
+from modules.ingestao import atualizar_se_necessario
+from modules.metricas import anotar, instrumentar
+from modules.indice_b3 import obter_indice, normalizar
+from modules.groq_client import obter_nome_empresa, filtrar_noticias_empresa, filtrar_noticias_empresas
 
+# Termos setoriais (já normalizados) usados pela pré-filtragem local
+TERMOS_SETOR = {
+	"bancos": ["banco", "bancos", "credito", "selic", "juros", "bancario"],
+	"financeiro": ["bolsa", "ibovespa", "mercado de capitais", "ipo"],
+	"seguros": ["seguro", "seguros", "seguradora", "resseguro"],
+	"petroleo": ["petroleo", "oleo", "gas", "brent", "opep", "combustivel", "combustiveis", "gasolina", "diesel"],
+	"mineracao": ["minerio", "mineracao", "minerio de ferro", "mineradora"],
+	"siderurgia": ["aco", "siderurgia", "siderurgica"],
+	"energia": ["energia", "eletrica", "aneel", "transmissao", "distribuidora"],
+	"saneamento": ["saneamento", "agua", "esgoto"],
+	"telecom": ["telecom", "telefonia", "5g", "anatel"],
+	"saude": ["saude", "hospital", "plano de saude", "ans", "farmacia"],
+	"varejo": ["varejo", "varejista", "consumo", "vendas"],
+	"alimentos": ["carne", "frigorifico", "alimentos", "proteina"],
+	"bebidas": ["cerveja", "bebidas"],
+	"industria": ["industria", "industrial", "exportacao"],
+	"papel_celulose": ["celulose", "papel"],
+	"quimica": ["petroquimica", "quimica"],
+	"tecnologia": ["tecnologia", "software", "digital"],
+	"construcao": ["construcao", "imobiliario", "construtora", "minha casa minha vida"],
+	"shoppings": ["shopping", "shoppings"],
+	"logistica": ["logistica", "ferrovia", "rodovia", "aluguel de carros", "frota"],
+	"educacao": ["educacao", "ensino", "fies"],
+	"turismo": ["turismo", "viagens", "academia"],
+	"agro": ["agro", "safra", "soja", "acucar", "etanol", "milho"]
+}
+
+# Nomes que também são palavras comuns: sozinhos, não bastam para decidir
+PALAVRAS_AMBIGUAS = {
+	"vale", "via", "pan", "porto", "bolsa", "vivo", "rumo", "vamos", "tim",
+	"vibra", "direcional", "renner", "bb", "rd", "petro", "b3", "slc", "cea"
+}
+
+def baixar_noticias(horas=None):
+	"""
+	Notícias recentes da base local (alimentada pela ingestão dos feeds),
+	sem filtragem por empresa.
+	"""
+	armazem = atualizar_se_necessario()
+	return armazem.recentes(horas or Config.NOTICIAS_JANELA_HORAS, Config.NOTICIAS_MAX_CANDIDATAS)
+
+def buscar_candidatas(ticker, nome_empresa=None, horas=None, armazem=None):
+	"""
+	Consulta indexada (FTS) das notícias da janela que citam algum termo da empresa.
+	Com `armazem`, consulta a base como está, sem tentar atualizá-la (quem
+	chamou já cuidou disso ou desistiu de esperar).
+	"""
+	fortes, fracos = termos_empresa(ticker, nome_empresa)
+	armazem = armazem or atualizar_se_necessario()
+	return armazem.buscar(
+		sorted(fortes | fracos),
+		horas or Config.NOTICIAS_JANELA_HORAS,
+		Config.NOTICIAS_MAX_CANDIDATAS
+	)
+
+class IndiceManchetes:
+	"""
+	Índice invertido (termo normalizado → manchetes) de uma lista de notícias.
+	"""
+
+	def __init__(self, noticias):
+		self.textos = []
+		self.postagens = {}
+		for i, noticia in enumerate(noticias):
+			texto = normalizar(noticia.get("titulo", ""))
+			self.textos.append(f" {texto} ")
+			for token in set(texto.split()):
+				self.postagens.setdefault(token, set()).add(i)
+
+	def buscar(self, termo):
+		"""
+		Índices das manchetes que contêm o termo (palavra ou expressão).
+		"""
+		tokens = termo.split()
+		if not tokens:
+			return set()
+
+		candidatas = set(self.postagens.get(tokens[0], ()))
+		for token in tokens[1:]:
+			candidatas &= self.postagens.get(token, set())
+
+		if len(tokens) == 1:
+			return candidatas
+		return {i for i in candidatas if f" {termo} " in self.textos[i]}
+
+def termos_empresa(ticker, nome_empresa=None):
+	"""
+	Separa os termos da empresa em fortes (nome, apelidos, ticker) e fracos
+	(palavras ambíguas e termos do setor).
+	"""
+	indice = obter_indice()
+	base = ticker.upper().replace(".SA", "")
+	nomes = indice.nomes_do_ticker(base)
+	if nome_empresa:
+		nomes.append(nome_empresa)
+
+	fortes, fracos = set(), set()
+	for nome in nomes + [base, re.sub(r"\d+$", "", base)]:
+		termo = normalizar(nome)
+		if not termo:
+			continue
+		(fracos if termo in PALAVRAS_AMBIGUAS else fortes).add(termo)
+
+	fracos.update(TERMOS_SETOR.get(indice.setor_do_ticker(base), []))
+
+	return fortes, fracos - fortes
+
+def pre_filtrar_noticias(noticias, ticker, nome_empresa=None, indice_manchetes=None):
+	"""
+	Classifica as notícias localmente. Retorna (relevantes, ambiguas) com os
+	índices das manchetes; as demais são descartadas sem consultar a IA.
+	"""
+	indice_manchetes = indice_manchetes or IndiceManchetes(noticias)
+	fortes, fracos = termos_empresa(ticker, nome_empresa)
+
+	relevantes = set()
+	for termo in fortes:
+		relevantes |= indice_manchetes.buscar(termo)
+
+	ambiguas = set()
+	for termo in fracos:
+		ambiguas |= indice_manchetes.buscar(termo)
+
+	return sorted(relevantes), sorted(ambiguas - relevantes)
+
+@instrumentar("noticias")
+def buscar_noticias_rss(ticker, noticias_nao_tratadas=None, entidade=None, armazem=None):
+	"""
+	Retorna as notícias relacionadas à empresa do ticker, consultando a base
+	local de notícias. Aceita entradas já obtidas no lugar da consulta e,
+	com `entidade`, dispensa a consulta do nome pelo ticker. Com `armazem`,
+	a base de notícias é consultada sem nova atualização.
+
+	Com uma lista de tickers (ou de entidades), filtra as mesmas notícias
+	para todas as empresas em uma única chamada e retorna {ticker: [notícias]}.
+	"""
+	if isinstance(ticker, (list, tuple)) or isinstance(entidade, (list, tuple)):
+		return buscar_noticias_empresas(ticker, noticias_nao_tratadas, entidade, armazem)
+
+	if entidade:
+		nome_empresa = entidade.nome
+	else:
+		nome_empresa = _nome_local(ticker) or obter_nome_empresa(ticker)
+
+	if noticias_nao_tratadas is None:
+		noticias_nao_tratadas = buscar_candidatas(ticker, nome_empresa, armazem=armazem)
+
+	# Pré-filtragem local: só as manchetes ambíguas vão para a IA
+	relevantes, ambiguas = pre_filtrar_noticias(noticias_nao_tratadas, ticker, nome_empresa)
+	selecionadas = set(relevantes)
+	anotar(candidatas=len(noticias_nao_tratadas), relevantes=len(relevantes), ambiguas=len(ambiguas))
+
+	if ambiguas and Config.GROQ_API_KEY:
+		candidatas = [noticias_nao_tratadas[i] for i in ambiguas]
+		# 🔥 FILTRAGEM COM GROQ
+		aprovadas = _chaves(filtrar_noticias_empresa(nome_empresa, candidatas))
+		selecionadas.update(i for i in ambiguas if _chaves([noticias_nao_tratadas[i]]) & aprovadas)
+
+	return [noticias_nao_tratadas[i] for i in sorted(selecionadas)]
+
+def buscar_noticias_empresas(tickers, noticias_nao_tratadas=None, entidades=None, armazem=None):
+	"""
+	Filtra as notícias para várias empresas de uma vez (um prompt por lote
+	de manchetes, não por empresa). Sem notícias informadas, junta as
+	candidatas de cada empresa na base local. Retorna {ticker: [notícias]}.
+	"""
+	if entidades:
+		tickers = [e.simbolo for e in entidades]
+		nomes = [e.nome for e in entidades]
+	else:
+		nomes = [_nome_local(t) or obter_nome_empresa(t) or t for t in tickers]
+
+	if len(tickers) == 1:
+		return {tickers[0]: buscar_noticias_rss(tickers[0], noticias_nao_tratadas, entidades[0] if entidades else None, armazem)}
+
+	if noticias_nao_tratadas is None:
+		noticias_nao_tratadas = _unir_candidatas(tickers, nomes, armazem or atualizar_se_necessario())
+
+	indice_manchetes = IndiceManchetes(noticias_nao_tratadas)
+	classificacao = [
+		pre_filtrar_noticias(noticias_nao_tratadas, ticker, nome, indice_manchetes)
+		for ticker, nome in zip(tickers, nomes)
+	]
+	selecionadas = [set(relevantes) for relevantes, _ in classificacao]
+	anotar(candidatas=len(noticias_nao_tratadas), empresas=len(tickers))
+
+	# Só as empresas com manchetes ambíguas vão para a IA, com a união dessas manchetes
+	pendentes = [p for p, (_, ambiguas) in enumerate(classificacao) if ambiguas]
+	if pendentes and Config.GROQ_API_KEY:
+		ambiguas = sorted(set().union(*(classificacao[p][1] for p in pendentes)))
+		filtradas = filtrar_noticias_empresas(
+			[nomes[p] for p in pendentes],
+			[noticias_nao_tratadas[i] for i in ambiguas]
+		)
+		for p, aprovadas in zip(pendentes, filtradas):
+			aprovadas = _chaves(aprovadas)
+			selecionadas[p].update(
+				i for i in classificacao[p][1] if _chaves([noticias_nao_tratadas[i]]) & aprovadas
+			)
+
+	resultado = {}
+	for ticker, indices in zip(tickers, selecionadas):
+		resultado.setdefault(ticker, set()).update(indices)
+	return {ticker: [noticias_nao_tratadas[i] for i in sorted(indices)] for ticker, indices in resultado.items()}
+
+def _unir_candidatas(tickers, nomes, armazem):
+	# Candidatas (FTS) de cada empresa, sem repetir a mesma manchete
+	noticias, vistas = [], set()
+	for ticker, nome in zip(tickers, nomes):
+		for noticia in buscar_candidatas(ticker, nome, armazem=armazem):
+			chave = noticia.get("link") or noticia.get("titulo")
+			if chave not in vistas:
+				vistas.add(chave)
+				noticias.append(noticia)
 	return noticias
+
+def _chaves(noticias):
+	# A IA pode reescrever um dos campos; link ou título idênticos bastam
+	chaves = set()
+	for n in noticias:
+		if not isinstance(n, dict):
+			continue
+		if n.get("link"):
+			chaves.add(("link", n["link"]))
+		if n.get("titulo"):
+			chaves.add(("titulo", n["titulo"].strip()))
+	return chaves
+
+def _nome_local(ticker):
+	nomes = obter_indice().nomes_do_ticker(ticker)
+	return nomes[0] if nomes else None
@@ -0,0 +1,119 @@
+import contextlib
+import contextvars
+import queue
+import threading
+import time
+from config import Config
+
+_prazo_atual = contextvars.ContextVar("prazo_atual", default=None)
+
+class PrazoEsgotado(Exception):
+	"""
+	O prazo do relatório acabou antes (ou durante) a etapa.
+	"""
+
+class Prazo:
+	"""
+	Instante-limite de um relatório. Cada etapa usa o que resta dele.
+	"""
+
+	def __init__(self, segundos, limite=None):
+		fim = time.monotonic() + segundos
+		self.fim = min(fim, limite.fim) if limite else fim
+
+	def restante(self):
+		return max(0.0, self.fim - time.monotonic())
+
+	def esgotado(self):
+		return self.restante() <= 0
+
+@contextlib.contextmanager
+def com_prazo(segundos=None):
+	"""
+	Define o prazo das etapas chamadas dentro do bloco (e das threads
+	criadas com `metricas.no_contexto`). Sem `segundos`, usa
+	Config.RELATORIO_PRAZO; com 0, não há prazo. Um prazo interno
+	nunca vai além do externo.
+	"""
+	segundos = Config.RELATORIO_PRAZO if segundos is None else segundos
+	if not segundos:
+		yield _prazo_atual.get()
+		return
+
+	prazo = Prazo(segundos, _prazo_atual.get())
+	token = _prazo_atual.set(prazo)
+	try:
+		yield prazo
+	finally:
+		_prazo_atual.reset(token)
+
+def prazo_atual():
+	return _prazo_atual.get()
+
+def restante(padrao=None):
+	"""
+	Segundos que restam do prazo atual, limitados a `padrao`
+	(ou `padrao` se não houver prazo).
+	"""
+	prazo = _prazo_atual.get()
+	if prazo is None:
+		return padrao
+	if padrao is None:
+		return prazo.restante()
+	return min(padrao, prazo.restante())
+
+def prazo_esgotado():
+	prazo = _prazo_atual.get()
+	return prazo is not None and prazo.esgotado()
+
+def limitar_timeout(timeout):
+	"""
+	Timeout de uma chamada HTTP (número ou tupla conexão/leitura) reduzido
+	ao que resta do prazo. Levanta PrazoEsgotado se não sobrou nada.
+	"""
+	prazo = _prazo_atual.get()
+	if prazo is None:
+		return timeout
+	resto = prazo.restante()
+	if resto <= 0:
+		raise PrazoEsgotado("prazo do relatório esgotado")
+	if isinstance(timeout, tuple):
+		return tuple(min(t, resto) for t in timeout)
+	return min(timeout, resto) if timeout else resto
+
+def iterar_ate_prazo(iteravel):
+	"""
+	Consome `iteravel` até o fim ou até o prazo atual acabar, o que vier
+	primeiro. Com prazo, a iteração roda em outra thread: um item que
+	demora não segura quem consome, e o que chegou até ali é aproveitado.
+	"""
+	prazo = _prazo_atual.get()
+	if prazo is None:
+		yield from iteravel
+		return
+
+	fila = queue.Queue()
+	fim = object()
+
+	def produzir():
+		try:
+			for item in iteravel:
+				fila.put((item, None))
+		except Exception as e:
+			fila.put((fim, e))
+			return
+		fila.put((fim, None))
+
+	contexto = contextvars.copy_context()
+	threading.Thread(target=contexto.run, args=(produzir,), name="prazo", daemon=True).start()
+
+	while True:
+		try:
+			item, erro = fila.get(timeout=prazo.restante())
+		except queue.Empty:
+			return
+		if item is fim:
+			if erro is not None:
+				raise erro
+			return
+		yield item
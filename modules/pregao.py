@@ -0,0 +1,117 @@
+from datetime import date, datetime, time, timedelta, timezone
+from functools import lru_cache
+from config import Config
+
+# Horário de Brasília (sem horário de verão desde 2019)
+FUSO_B3 = timezone(timedelta(hours=-3))
+
+ABERTURA = time(10, 0)
+# A B3 acompanha o horário de verão dos EUA: fecha às 17h durante ele, às 18h fora
+FECHAMENTO_VERAO_EUA = time(17, 0)
+FECHAMENTO_INVERNO_EUA = time(18, 0)
+
+def _pascoa(ano):
+	# Algoritmo de Meeus/Jones/Butcher (calendário gregoriano)
+	a = ano % 19
+	b, c = divmod(ano, 100)
+	d, e = divmod(b, 4)
+	f = (b + 8) // 25
+	g = (b - f + 1) // 3
+	h = (19 * a + b - d - g + 15) % 30
+	i, k = divmod(c, 4)
+	l = (32 + 2 * e + 2 * i - h - k) % 7
+	m = (a + 11 * h + 22 * l) // 451
+	mes, dia = divmod(h + l - 7 * m + 114, 31)
+	return date(ano, mes, dia + 1)
+
+@lru_cache(maxsize=16)
+def feriados_b3(ano):
+	"""
+	Dias sem pregão na B3: feriados nacionais, Carnaval, Sexta-feira Santa,
+	Corpus Christi, véspera de Natal e último dia do ano.
+	"""
+	pascoa = _pascoa(ano)
+	return frozenset({
+		date(ano, 1, 1),
+		pascoa - timedelta(days=48),  # Carnaval (segunda)
+		pascoa - timedelta(days=47),  # Carnaval (terça)
+		pascoa - timedelta(days=2),   # Sexta-feira Santa
+		date(ano, 4, 21),
+		date(ano, 5, 1),
+		pascoa + timedelta(days=60),  # Corpus Christi
+		date(ano, 9, 7),
+		date(ano, 10, 12),
+		date(ano, 11, 2),
+		date(ano, 11, 15),
+		date(ano, 11, 20),
+		date(ano, 12, 24),
+		date(ano, 12, 25),
+		date(ano, 12, 31)
+	})
+
+def dia_de_pregao(dia):
+	"""
+	True se houver pregão na data (dia útil que não é feriado da B3).
+	"""
+	return dia.weekday() < 5 and dia not in feriados_b3(dia.year)
+
+def _domingo(ano, mes, ordem):
+	# `ordem`-ésimo domingo do mês
+	primeiro = date(ano, mes, 1)
+	return primeiro + timedelta(days=(6 - primeiro.weekday()) % 7 + 7 * (ordem - 1))
+
+def horario_fechamento(dia):
+	"""
+	Fim do pregão regular na data: Config.PREGAO_FECHAMENTO ("HH:MM"), se
+	definido; senão 17h durante o horário de verão dos EUA (do 2º domingo
+	de março ao 1º de novembro) e 18h no resto do ano.
+	"""
+	if Config.PREGAO_FECHAMENTO:
+		return time.fromisoformat(Config.PREGAO_FECHAMENTO)
+	if _domingo(dia.year, 3, 2) <= dia < _domingo(dia.year, 11, 1):
+		return FECHAMENTO_VERAO_EUA
+	return FECHAMENTO_INVERNO_EUA
+
+def agora_b3():
+	return datetime.now(FUSO_B3)
+
+def mercado_aberto(momento=None):
+	"""
+	True durante o pregão regular da B3.
+	"""
+	momento = (momento or agora_b3()).astimezone(FUSO_B3)
+	return dia_de_pregao(momento.date()) and ABERTURA <= momento.time() < horario_fechamento(momento.date())
+
+def logo_apos_fechamento(momento=None):
+	"""
+	True nos Config.PREGAO_TOLERANCIA_FECHAMENTO segundos após o fim do
+	pregão: o leilão de fechamento e o atraso (~15 min) dos dados do Yahoo
+	ainda podem mudar o preço de fechamento.
+	"""
+	momento = (momento or agora_b3()).astimezone(FUSO_B3)
+	dia = momento.date()
+	if not dia_de_pregao(dia):
+		return False
+	fechamento = datetime.combine(dia, horario_fechamento(dia), tzinfo=FUSO_B3)
+	return fechamento <= momento < fechamento + timedelta(seconds=Config.PREGAO_TOLERANCIA_FECHAMENTO)
+
+def proxima_abertura(momento=None):
+	"""
+	Início do próximo pregão (o de hoje, se ainda não abriu).
+	"""
+	momento = (momento or agora_b3()).astimezone(FUSO_B3)
+	dia = momento.date()
+	if momento.time() >= ABERTURA or not dia_de_pregao(dia):
+		dia += timedelta(days=1)
+		while not dia_de_pregao(dia):
+			dia += timedelta(days=1)
+	return datetime.combine(dia, ABERTURA, tzinfo=FUSO_B3)
+
+def segundos_ate_abertura(momento=None):
+	"""
+	Segundos até a próxima abertura (0 se o mercado estiver aberto).
+	"""
+	momento = (momento or agora_b3()).astimezone(FUSO_B3)
+	if mercado_aberto(momento):
+		return 0.0
+	return (proxima_abertura(momento) - momento).total_seconds()
@@ -0,0 +1,183 @@
+import hashlib
+import json
+import sqlite3
+from config import Config
+from modules.cache import obter_cache
+from modules.esquema import validar_secao
+from modules.prazo import iterar_ate_prazo, prazo_esgotado
+
+# Seções geradas pelo LLM; as demais (nome_oficial, ticker, acao) saem dos dados coletados
+SECOES_LLM = ["resumo", "noticias", "analise_rapida"]
+
+# Todas as seções, na ordem de exibição, e os nomes usados nos avisos
+SECOES_RELATORIO = ["nome_oficial", "ticker", "acao"] + SECOES_LLM
+NOMES_SECOES = {
+	"nome_oficial": "nome oficial",
+	"ticker": "ticker",
+	"acao": "cotação",
+	"resumo": "sobre a empresa",
+	"noticias": "notícias",
+	"analise_rapida": "análise rápida"
+}
+
+# Chave do relatório com as seções que não ficaram prontas (relatório parcial)
+CHAVE_FALTANDO = "faltando"
+
+TIPO_CACHE = "secao_relatorio"
+
+def impressao(valor):
+	"""
+	Impressão digital (hash curto) de um valor serializável em JSON.
+	"""
+	texto = json.dumps(valor, sort_keys=True, ensure_ascii=False, default=str)
+	return hashlib.sha256(texto.encode("utf-8")).hexdigest()[:16]
+
+def impressoes_secoes(dados_coletados):
+	"""
+	Impressão das entradas que alimentam cada seção gerada pelo LLM.
+	"""
+	info = dados_coletados.get("info") or {}
+	base = {k: info.get(k) for k in ("nome", "setor", "industria", "descricao")}
+	noticias = sorted(n.get("link") or n.get("titulo", "") for n in dados_coletados.get("noticias") or [])
+	return {
+		"resumo": impressao(base),
+		"noticias": impressao(noticias),
+		"analise_rapida": impressao([base, noticias])
+	}
+
+def secoes_locais(empresa, dados_coletados, entidade=None):
+	"""
+	Seções montadas direto dos dados coletados, sem LLM.
+	"""
+	info = dados_coletados.get("info") or {}
+	cotacao = dados_coletados.get("cotacao") or {}
+	secoes = {
+		"nome_oficial": entidade.nome_oficial if entidade else info.get("nome", empresa),
+		"ticker": entidade.ticker if entidade else cotacao.get("ticker", "").replace(".SA", "")
+	}
+	if cotacao.get("preco_atual") is not None:
+		secoes["acao"] = validar_secao("acao", {
+			"preco_atual": cotacao.get("preco_atual"),
+			"variacao": cotacao.get("variacao_percentual"),
+			"volume": cotacao.get("volume")
+		})
+	return {s: v for s, v in secoes.items() if v}
+
+def _chave(empresa, dados_coletados, entidade=None):
+	if entidade:
+		return entidade.simbolo
+	return (dados_coletados.get("cotacao") or {}).get("ticker") or empresa.strip().lower()
+
+def _preco_mudou(anterior, atual):
+	if not anterior or atual is None:
+		return False
+	return abs(atual - anterior) / anterior * 100 > Config.RELATORIO_LIMIAR_PRECO
+
+def planejar(empresa, dados_coletados, entidade=None):
+	"""
+	Separa as seções ainda válidas no cache das que precisam ser geradas de novo.
+
+	Uma seção é refeita quando a impressão das suas entradas mudou (ex.: novas
+	manchetes) ou, no caso da análise, quando o preço andou além do limiar.
+	Retorna (válidas {seção: valor}, pendentes [seções], antigas {seção: valor}).
+	"""
+	chave = _chave(empresa, dados_coletados, entidade)
+	impressoes = impressoes_secoes(dados_coletados)
+	preco = (dados_coletados.get("cotacao") or {}).get("preco_atual")
+
+	validas, pendentes, antigas = {}, [], {}
+	for secao in SECOES_LLM:
+		entrada = _ler(chave, secao)
+		if entrada is None:
+			pendentes.append(secao)
+			continue
+
+		antigas[secao] = entrada["valor"]
+		if entrada["impressao"] != impressoes[secao] or (
+			secao == "analise_rapida" and _preco_mudou(entrada.get("preco"), preco)
+		):
+			pendentes.append(secao)
+		else:
+			validas[secao] = entrada["valor"]
+
+	return validas, pendentes, antigas
+
+def gerar_relatorio(processor, empresa, dados_coletados, entidade=None):
+	"""
+	Relatório completo, pedindo ao LLM só as seções cujas entradas mudaram.
+	"""
+	return dict(gerar_relatorio_em_stream(processor, empresa, dados_coletados, entidade)) or None
+
+def gerar_relatorio_em_stream(processor, empresa, dados_coletados, entidade=None):
+	"""
+	Produz (seção, valor) do relatório: primeiro as seções locais e as do cache,
+	depois as regeneradas, à medida que o LLM as conclui.
+	Se a geração falhar, a versão anterior da seção (se houver) é usada.
+
+	Dentro de um prazo (ver `modules.prazo`), a geração para quando ele acaba.
+	Se alguma seção não saiu, o último item é (CHAVE_FALTANDO, [seções]).
+	"""
+	emitidas = set()
+	for secao, valor in _gerar_secoes(processor, empresa, dados_coletados, entidade):
+		emitidas.add(secao)
+		yield secao, valor
+
+	faltando = [s for s in SECOES_RELATORIO if s not in emitidas]
+	if faltando:
+		yield CHAVE_FALTANDO, faltando
+
+def descrever_faltando(relatorio):
+	"""
+	Aviso legível das seções que faltam no relatório, ou None se ele estiver completo.
+	"""
+	faltando = (relatorio or {}).get(CHAVE_FALTANDO)
+	if not faltando:
+		return None
+	return "Relatório parcial, sem: " + ", ".join(NOMES_SECOES.get(s, s) for s in faltando)
+
+def _gerar_secoes(processor, empresa, dados_coletados, entidade=None):
+	yield from secoes_locais(empresa, dados_coletados, entidade).items()
+
+	validas, pendentes, antigas = planejar(empresa, dados_coletados, entidade)
+	yield from validas.items()
+	if not pendentes:
+		return
+
+	chave = _chave(empresa, dados_coletados, entidade)
+	impressoes = impressoes_secoes(dados_coletados)
+	preco = (dados_coletados.get("cotacao") or {}).get("preco_atual")
+
+	geradas = set()
+	# Sem prazo sobrando, nem chama o LLM; com prazo, para de esperar quando
+	# ele acaba (a geração termina em segundo plano e alimenta o cache do LLM)
+	if prazo_esgotado():
+		stream = ()
+	else:
+		stream = iterar_ate_prazo(processor.resumir_dados_em_stream(empresa, dados_coletados, entidade, pendentes))
+	for secao, valor in stream:
+		if secao not in pendentes or secao in geradas:
+			continue
+		geradas.add(secao)
+		_gravar(chave, secao, {"impressao": impressoes[secao], "preco": preco, "valor": valor})
+		yield secao, valor
+
+	for secao in pendentes:
+		if secao not in geradas and secao in antigas:
+			yield secao, antigas[secao]
+
+def _ler(chave, secao):
+	if not Config.CACHE_ATIVO:
+		return None
+	try:
+		return obter_cache().obter(TIPO_CACHE, f"{chave}:{secao}")
+	except sqlite3.Error as e:
+		print(f"[ERRO] Cache indisponível: {e}")
+		return None
+
+def _gravar(chave, secao, entrada):
+	if not Config.CACHE_ATIVO:
+		return
+	try:
+		obter_cache().gravar(TIPO_CACHE, f"{chave}:{secao}", entrada)
+	except sqlite3.Error as e:
+		print(f"[ERRO] Não foi possível gravar no cache: {e}")
@@ -0,0 +1,242 @@
+import asyncio
+import functools
+import json
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from aiohttp import web
+from config import Config
+from modules.disjuntor import estados_disjuntores
+from modules.indice_b3 import normalizar
+from modules.metricas import no_contexto, span, texto_prometheus
+
+_dumps = functools.partial(json.dumps, ensure_ascii=False, default=str)
+
+class Coalescedor:
+	"""
+	Junta pedidos idênticos em andamento (single-flight): quem chega com
+	a mesma chave enquanto a primeira execução não terminou recebe o mesmo
+	resultado, sem disparar outra. Usado só na thread do event loop.
+	"""
+
+	def __init__(self):
+		self._em_andamento = {}
+		self.execucoes = 0
+		self.coalescidos = 0
+
+	async def executar(self, chave, fabrica):
+		"""
+		Resultado de `fabrica()` (corrotina) para `chave`, compartilhado com
+		quem pedir a mesma chave antes de ele ficar pronto. Um cliente que
+		desiste não cancela a execução dos demais.
+		"""
+		tarefa = self._em_andamento.get(chave)
+		if tarefa is None:
+			self.execucoes += 1
+			tarefa = asyncio.ensure_future(fabrica())
+			self._em_andamento[chave] = tarefa
+			tarefa.add_done_callback(lambda _: self._em_andamento.pop(chave, None))
+		else:
+			self.coalescidos += 1
+		return await asyncio.shield(tarefa)
+
+	def em_andamento(self):
+		return len(self._em_andamento)
+
+class ServicoRelatorios:
+	"""
+	Serviço HTTP (aiohttp) de relatórios, cotações e notícias sobre os mesmos
+	módulos da CLI e do Streamlit. As etapas bloqueantes rodam em um pool de
+	Config.SERVICO_WORKERS threads; os limites por serviço externo
+	(Config.<SERVICO>_CONCORRENCIA, taxa e disjuntores) valem para todas elas.
+	"""
+
+	def __init__(self, workers=None):
+		self.executor = ThreadPoolExecutor(max_workers=workers or Config.SERVICO_WORKERS, thread_name_prefix="servico")
+		self.coalescedor = Coalescedor()
+		self.jobs = {}
+
+	def criar_app(self):
+		app = web.Application()
+		app.add_routes([
+			web.get("/relatorio/{empresa}", self.relatorio),
+			web.post("/jobs", self.criar_job),
+			web.get("/jobs/{id}", self.consultar_job),
+			web.get("/cotacao/{empresa}", self.cotacao),
+			web.get("/historico/{empresa}", self.historico),
+			web.get("/noticias/{empresa}", self.noticias),
+			web.get("/saude", self.saude),
+			web.get("/metrics", self.metricas)
+		])
+		app.on_startup.append(self._iniciar)
+		app.on_cleanup.append(self._encerrar)
+		return app
+
+	async def _iniciar(self, app):
+		from modules.ingestao import iniciar_ingestao
+		iniciar_ingestao()
+
+	async def _encerrar(self, app):
+		self.executor.shutdown(wait=False)
+
+	async def _em_thread(self, funcao, *args, **kwargs):
+		# Roda no pool levando o contexto atual (span e prazo)
+		loop = asyncio.get_running_loop()
+		return await loop.run_in_executor(self.executor, no_contexto(functools.partial(funcao, *args, **kwargs)))
+
+	async def _resolver(self, empresa):
+		from modules.entidade import resolver_entidade
+		chave = ("entidade", normalizar(empresa) or empresa.strip().lower())
+		return await self.coalescedor.executar(chave, lambda: self._em_thread(resolver_entidade, empresa))
+
+	async def _gerar_relatorio(self, empresa, prazo=None):
+		from modules.lote import processar_empresa
+		entidade = await self._resolver(empresa)
+		chave = ("relatorio", entidade.simbolo, prazo)
+		return await self.coalescedor.executar(chave, lambda: self._em_thread(processar_empresa, empresa, entidade, prazo))
+
+	async def relatorio(self, request):
+		"""
+		GET /relatorio/{empresa}: relatório dentro de Config.RELATORIO_PRAZO
+		(parcial, com `faltando`, se o prazo acabar).
+		"""
+		empresa = request.match_info["empresa"]
+		with span("servico", rota="relatorio", empresa=empresa):
+			resultado = await self._gerar_relatorio(empresa)
+		return _responder(resultado, 502 if resultado["status"] == "erro" else 200)
+
+	async def criar_job(self, request):
+		"""
+		POST /jobs {"empresa": ...}: gera o relatório em segundo plano, com
+		Config.SERVICO_PRAZO_JOB, e responde 202 com o id para consulta.
+		"""
+		try:
+			corpo = await request.json() if request.can_read_body else {}
+		except ValueError:
+			return _responder({"status": "erro", "mensagem": "Corpo JSON inválido"}, 400)
+		empresa = str(corpo.get("empresa") or request.query.get("empresa") or "").strip()
+		if not empresa:
+			return _responder({"status": "erro", "mensagem": "Informe a empresa"}, 400)
+
+		self._limpar_jobs()
+		if len(self.jobs) >= Config.SERVICO_MAX_JOBS:
+			return _responder({"status": "erro", "mensagem": "Muitos jobs em andamento, tente mais tarde"}, 503)
+
+		job = {
+			"id": uuid.uuid4().hex[:12],
+			"empresa": empresa,
+			"estado": "pendente",
+			"criado_em": datetime.now().isoformat(timespec="seconds")
+		}
+		self.jobs[job["id"]] = job
+		job["_tarefa"] = asyncio.ensure_future(self._executar_job(job))
+		return _responder({"id": job["id"], "estado": job["estado"], "url": f"/jobs/{job['id']}"}, 202)
+
+	async def _executar_job(self, job):
+		job["estado"] = "executando"
+		with span("servico", rota="job", empresa=job["empresa"]):
+			try:
+				job["resultado"] = await self._gerar_relatorio(job["empresa"], Config.SERVICO_PRAZO_JOB)
+			except Exception as e:
+				job["resultado"] = {"empresa": job["empresa"], "status": "erro", "mensagem": f"{type(e).__name__}: {e}"}
+		job["estado"] = "concluido"
+		job["concluido_em"] = datetime.now().isoformat(timespec="seconds")
+		job["_fim"] = time.monotonic()
+
+	def _limpar_jobs(self):
+		# Jobs concluídos ficam consultáveis por Config.SERVICO_JOBS_TTL segundos
+		limite = time.monotonic() - Config.SERVICO_JOBS_TTL
+		for id_job in [i for i, j in self.jobs.items() if j.get("_fim", limite + 1) <= limite]:
+			del self.jobs[id_job]
+
+	async def consultar_job(self, request):
+		"""
+		GET /jobs/{id}: estado do job ("pendente", "executando", "concluido")
+		e, quando concluído, o `resultado` no formato de /relatorio.
+		"""
+		job = self.jobs.get(request.match_info["id"])
+		if job is None:
+			return _responder({"status": "erro", "mensagem": "Job não encontrado"}, 404)
+		return _responder({k: v for k, v in job.items() if not k.startswith("_")})
+
+	async def cotacao(self, request):
+		"""
+		GET /cotacao/{empresa}: cotação atual (do cache enquanto válida).
+		"""
+		from modules.cotacao import obter_cotacao_atual
+		empresa = request.match_info["empresa"]
+		with span("servico", rota="cotacao", empresa=empresa):
+			entidade = await self._resolver(empresa)
+			cotacao = await self.coalescedor.executar(
+				("cotacao", entidade.simbolo),
+				lambda: self._em_thread(obter_cotacao_atual, entidade.nome, entidade=entidade)
+			)
+		return _responder(cotacao, 502 if cotacao.get("status") == "erro" else 200)
+
+	async def historico(self, request):
+		"""
+		GET /historico/{empresa}?inicio=AAAA-MM-DD&fim=AAAA-MM-DD: barras
+		diárias do histórico local, uma lista por coluna.
+		"""
+		from modules.cotacao import obter_historico
+		empresa = request.match_info["empresa"]
+		inicio, fim = request.query.get("inicio"), request.query.get("fim")
+		with span("servico", rota="historico", empresa=empresa):
+			entidade = await self._resolver(empresa)
+			try:
+				historico = await self.coalescedor.executar(
+					("historico", entidade.simbolo, inicio, fim),
+					lambda: self._em_thread(obter_historico, entidade.ticker, inicio, fim, entidade=entidade)
+				)
+			except ValueError as e:
+				return _responder({"status": "erro", "mensagem": f"Data inválida: {e}"}, 400)
+		if historico["status"] == "erro":
+			return _responder(historico, 502)
+		dados = {coluna: valores.tolist() for coluna, valores in historico["dados"].items()}
+		return _responder({"status": "sucesso", "ticker": historico["ticker"], "dados": dados})
+
+	async def noticias(self, request):
+		"""
+		GET /noticias/{empresa}: notícias recentes da empresa na base local.
+		"""
+		from modules.noticia import buscar_noticias_rss
+		empresa = request.match_info["empresa"]
+		with span("servico", rota="noticias", empresa=empresa):
+			entidade = await self._resolver(empresa)
+			try:
+				noticias = await self.coalescedor.executar(
+					("noticias", entidade.simbolo),
+					lambda: self._em_thread(buscar_noticias_rss, entidade.simbolo, entidade=entidade)
+				)
+			except Exception as e:
+				return _responder({"status": "erro", "mensagem": f"Erro ao buscar notícias: {e}"}, 502)
+		return _responder({"status": "sucesso", "ticker": entidade.simbolo, "noticias": noticias})
+
+	async def saude(self, request):
+		"""
+		GET /saude: disjuntores, jobs e pedidos em andamento e coalescidos.
+		"""
+		return _responder({
+			"status": "sucesso",
+			"disjuntores": estados_disjuntores(),
+			"em_andamento": self.coalescedor.em_andamento(),
+			"execucoes": self.coalescedor.execucoes,
+			"coalescidos": self.coalescedor.coalescidos,
+			"jobs": sum(1 for j in self.jobs.values() if j["estado"] != "concluido")
+		})
+
+	async def metricas(self, request):
+		return web.Response(text=texto_prometheus(), content_type="text/plain", charset="utf-8")
+
+def _responder(dados, status=200):
+	return web.json_response(dados, status=status, dumps=_dumps)
+
+def criar_app(workers=None):
+	return ServicoRelatorios(workers).criar_app()
+
+if __name__ == "__main__":
+	# Execução dedicada: python -m modules.servico [porta]
+	import sys
+	porta = int(sys.argv[1]) if len(sys.argv) > 1 else Config.SERVICO_PORTA
+	web.run_app(criar_app(), host=Config.SERVICO_HOST, port=porta)
@@ -0,0 +1,122 @@
+import math
+import threading
+from config import Config
+
+# Aproximação para português: ~4 caracteres por token nos modelos usados
+CARACTERES_POR_TOKEN = 4
+
+def estimar_tokens(texto):
+	"""
+	Estimativa rápida de tokens de um texto (sem tokenizer do provedor).
+	"""
+	return math.ceil(len(texto or "") / CARACTERES_POR_TOKEN)
+
+def truncar(texto, max_caracteres):
+	"""
+	Corta o texto no limite, sem quebrar a última palavra quando possível.
+	"""
+	texto = " ".join((texto or "").split())
+	if len(texto) <= max_caracteres:
+		return texto
+	corte = texto[:max_caracteres - 1].rsplit(" ", 1)[0]
+	return corte + "…"
+
+def compactar_noticias(noticias, orcamento_tokens, max_manchetes=None, max_titulo=None):
+	"""
+	Reduz as notícias ao que o modelo precisa para decidir: id curto, título e fonte.
+
+	Links, datas e demais campos ficam de fora; títulos longos são truncados e,
+	ao estourar o orçamento (ou `max_manchetes`), as manchetes restantes são
+	descartadas. Retorna (linhas compactas, {id: notícia original}).
+	"""
+	max_manchetes = max_manchetes or Config.TOKENS_MAX_MANCHETES
+	max_titulo = max_titulo or Config.TOKENS_MAX_TITULO
+
+	linhas, mapa, usado = [], {}, 0
+	for n in noticias[:max_manchetes]:
+		id_curto = f"n{len(linhas) + 1}"
+		linha = f"[{id_curto}] {truncar(n.get('titulo', ''), max_titulo)}"
+		if n.get("fonte"):
+			linha += f" ({n['fonte']})"
+
+		custo = estimar_tokens(linha) + 1
+		if linhas and usado + custo > orcamento_tokens:
+			break
+		linhas.append(linha)
+		mapa[id_curto] = n
+		usado += custo
+
+	return linhas, mapa
+
+def restaurar_noticias(ids, mapa):
+	"""
+	Converte os ids curtos devolvidos pelo modelo de volta nas notícias originais.
+	"""
+	vistos, noticias = set(), []
+	for id_curto in ids or []:
+		id_curto = str(id_curto).strip("[] ")
+		if id_curto in mapa and id_curto not in vistos:
+			vistos.add(id_curto)
+			noticias.append(mapa[id_curto])
+	return noticias
+
+class MetricasTokens:
+	"""
+	Contadores de tokens por etapa (ticker, filtro_noticias, relatorio, ...).
+
+	Usa a contagem informada pelo provedor quando disponível e a
+	estimativa local caso contrário.
+	"""
+
+	def __init__(self):
+		self._lock = threading.Lock()
+		self._etapas = {}
+
+	def registrar(self, etapa, tokens_prompt, tokens_resposta=0, estimado=False):
+		with self._lock:
+			m = self._etapas.setdefault(etapa, {
+				"chamadas": 0, "tokens_prompt": 0, "tokens_resposta": 0, "estimadas": 0
+			})
+			m["chamadas"] += 1
+			m["tokens_prompt"] += tokens_prompt
+			m["tokens_resposta"] += tokens_resposta
+			m["estimadas"] += int(estimado)
+			m["ultima"] = {"tokens_prompt": tokens_prompt, "tokens_resposta": tokens_resposta}
+
+	def resumo(self):
+		"""
+		Cópia dos contadores, com a média de tokens de prompt por chamada.
+		"""
+		with self._lock:
+			resumo = {}
+			for etapa, m in sorted(self._etapas.items()):
+				resumo[etapa] = dict(m, media_prompt=round(m["tokens_prompt"] / m["chamadas"], 1))
+			return resumo
+
+	def zerar(self):
+		with self._lock:
+			self._etapas.clear()
+
+_metricas = MetricasTokens()
+
+def registrar_tokens(etapa, prompt, resposta="", uso=None):
+	"""
+	Registra uma chamada de LLM. `uso` é o dicionário de uso do provedor, se houver
+	(chaves prompt_tokens/completion_tokens ou input_tokens/output_tokens).
+	"""
+	uso = uso or {}
+	tokens_prompt = uso.get("prompt_tokens", uso.get("input_tokens"))
+	tokens_resposta = uso.get("completion_tokens", uso.get("output_tokens"))
+
+	estimado = tokens_prompt is None
+	if estimado:
+		tokens_prompt = estimar_tokens(prompt)
+		tokens_resposta = estimar_tokens(resposta)
+
+	_metricas.registrar(etapa, tokens_prompt, tokens_resposta or 0, estimado)
+
+def metricas_tokens():
+	"""
+	Tokens consumidos por etapa desde o início do processo.
+	"""
+	return _metricas.resumo()
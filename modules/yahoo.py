@@ -0,0 +1,94 @@
+import threading
+import time
+from datetime import datetime
+from config import Config
+from modules.prazo import limitar_timeout
+
+# Acesso direto à API HTTP do Yahoo Finance (alternativa leve ao yfinance,
+# sem pandas), usado quando Config.YAHOO_FONTE == "http".
+
+_sessao = None
+_lock = threading.Lock()
+
+def obter_sessao():
+	"""
+	Sessão HTTP keep-alive compartilhada pelas consultas ao Yahoo.
+	"""
+	global _sessao
+	if _sessao is None:
+		with _lock:
+			if _sessao is None:
+				import requests
+				from requests.adapters import HTTPAdapter
+
+				sessao = requests.Session()
+				adapter = HTTPAdapter(pool_connections=Config.YAHOO_POOL_SIZE, pool_maxsize=Config.YAHOO_POOL_SIZE)
+				sessao.mount("https://", adapter)
+				sessao.mount("http://", adapter)
+				sessao.headers.update({"User-Agent": "Mozilla/5.0"})
+				_sessao = sessao
+	return _sessao
+
+def _obter_json(url, params):
+	resposta = obter_sessao().get(url, params=params, timeout=limitar_timeout(Config.YAHOO_TIMEOUT))
+	resposta.raise_for_status()
+	return resposta.json()
+
+def historico(simbolo, inicio=None):
+	"""
+	Barras diárias do símbolo pelo endpoint chart, desde a data `inicio`
+	(inclusive) ou, sem ela, dos últimos Config.HISTORICO_ANOS anos.
+	Retorna colunas {data, abertura, maxima, minima, fechamento, volume},
+	com `data` no calendário da B3; pregões sem fechamento são omitidos.
+	"""
+	from modules.pregao import FUSO_B3
+
+	params = {"interval": "1d"}
+	if inicio:
+		params["period1"] = int(datetime.combine(inicio, datetime.min.time(), tzinfo=FUSO_B3).timestamp())
+		params["period2"] = int(time.time())
+	else:
+		params["range"] = f"{Config.HISTORICO_ANOS}y"
+
+	dados = _obter_json(f"{Config.YAHOO_BASE_URL}{simbolo}", params)
+	resultado = (dados.get("chart") or {}).get("result") or []
+	colunas = {"data": [], "abertura": [], "maxima": [], "minima": [], "fechamento": [], "volume": []}
+	if not resultado:
+		return colunas
+
+	cotacoes = (resultado[0].get("indicators", {}).get("quote") or [{}])[0]
+	fechamentos = cotacoes.get("close") or []
+	for i, instante in enumerate(resultado[0].get("timestamp") or []):
+		fechamento = fechamentos[i] if i < len(fechamentos) else None
+		if fechamento is None:
+			continue
+		colunas["data"].append(datetime.fromtimestamp(instante, FUSO_B3).date())
+		colunas["abertura"].append(cotacoes["open"][i])
+		colunas["maxima"].append(cotacoes["high"][i])
+		colunas["minima"].append(cotacoes["low"][i])
+		colunas["fechamento"].append(fechamento)
+		colunas["volume"].append(cotacoes["volume"][i] or 0)
+	return colunas
+
+def info_empresa(simbolo):
+	"""
+	Perfil da empresa pelo endpoint quoteSummary, com as mesmas chaves
+	de `yf.Ticker(simbolo).info` (longName, sector, industry, ...).
+	"""
+	dados = _obter_json(f"{Config.YAHOO_RESUMO_URL}{simbolo}", {"modules": "assetProfile,price"})
+	resultado = (dados.get("quoteSummary") or {}).get("result") or []
+	if not resultado:
+		return {}
+
+	perfil = resultado[0].get("assetProfile") or {}
+	preco = resultado[0].get("price") or {}
+	info = {
+		"longName": preco.get("longName"),
+		"sector": perfil.get("sector"),
+		"industry": perfil.get("industry"),
+		"website": perfil.get("website"),
+		"longBusinessSummary": perfil.get("longBusinessSummary"),
+		"country": perfil.get("country"),
+		"fullTimeEmployees": perfil.get("fullTimeEmployees")
+	}
+	return {chave: valor for chave, valor in info.items() if valor is not None}
@@ -0,0 +1,76 @@
+import json
+
+class ParserJsonIncremental:
+	"""
+	Lê um objeto JSON recebido em pedaços (ex.: tokens de um LLM) e devolve
+	cada campo de primeiro nível assim que o valor dele termina.
+
+	Texto antes da primeira chave "{" (como cercas ```json) é ignorado.
+	"""
+
+	def __init__(self):
+		self.buffer = ""
+		self.posicao = 0
+		self.profundidade = 0
+		self.em_string = False
+		self.escape = False
+		self.inicio_string = None
+		self.chave = None
+		self.inicio_valor = None
+		self.campos = {}
+		self.terminado = False
+
+	def alimentar(self, pedaco):
+		"""
+		Acrescenta texto e retorna a lista de (chave, valor) concluídos nele.
+		"""
+		self.buffer += pedaco
+		concluidos = []
+
+		while self.posicao < len(self.buffer) and not self.terminado:
+			i = self.posicao
+			c = self.buffer[i]
+			self.posicao += 1
+
+			if self.em_string:
+				if self.escape:
+					self.escape = False
+				elif c == "\\":
+					self.escape = True
+				elif c == '"':
+					self.em_string = False
+					# Chave de primeiro nível: string fora de um valor
+					if self.profundidade == 1 and self.inicio_valor is None:
+						self.chave = json.loads(self.buffer[self.inicio_string:i + 1])
+				continue
+
+			if c == '"':
+				self.em_string = True
+				self.inicio_string = i
+			elif c in "{[":
+				self.profundidade += 1
+			elif c == ":" and self.profundidade == 1 and self.inicio_valor is None:
+				self.inicio_valor = i + 1
+			elif c in ",}" and self.profundidade == 1 and self.inicio_valor is not None:
+				concluidos.extend(self._emitir(i))
+				if c == "}":
+					self.profundidade = 0
+					self.terminado = True
+			elif c in "}]":
+				self.profundidade -= 1
+				if self.profundidade == 0:
+					self.terminado = True
+
+		return concluidos
+
+	def _emitir(self, fim):
+		trecho = self.buffer[self.inicio_valor:fim].strip()
+		chave, self.chave, self.inicio_valor = self.chave, None, None
+		if chave is None or not trecho:
+			return []
+		try:
+			valor = json.loads(trecho)
+		except json.JSONDecodeError:
+			return []
+		self.campos[chave] = valor
+		return [(chave, valor)]